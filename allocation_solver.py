@@ -0,0 +1,463 @@
+"""
+Integer allocation solver for the multi-product buying calculator.
+
+The portfolio annualized ROI is ROI × (365 ÷ weighted days at risk), that is
+365 × S × P ÷ (D × W) with S = Σ savings, D = Σ ΔInvestment, P = Σ positive
+ΔInvestment and W = Σ (days at risk × positive ΔInvestment). A product with
+a negative ΔInvestment (fewer bulk dollars tied up than the small deal)
+lowers D without touching P or W, which raises the ROI, so those
+allocations cannot be ignored.
+
+- When the bounds leave few enough allocations, every one of them is
+  evaluated, which is exact.
+- Otherwise, if no product can take a negative ΔInvestment, P = D and the
+  objective is the ratio 365 × S ÷ W. That ratio is maximized exactly with
+  Dinkelbach's method: each step solves max S − λ W over integer allocations
+  that sum to the deal size, using a dynamic program over (product, cases
+  used).
+- Otherwise the ratio optima with and without negative-ΔInvestment
+  quantities seed a local search on the full objective. That result is a
+  heuristic: it is reported with exact=False and no bound.
+"""
+
+import time
+import numpy as np
+import roi_engine
+
+# Dinkelbach stops once the parametric optimum is within this relative tolerance of zero
+TOLERANCE = 1e-9
+MAX_DINKELBACH_ITERATIONS = 50
+
+# Allocations are enumerated outright when there are at most this many
+ENUMERATION_LIMIT = 100_000
+# Cases moved between two products in one local search step, and the step limit per start
+MOVE_SIZES = (1, 2, 3)
+MAX_LOCAL_SEARCH_MOVES = 200
+
+# Largest DP (Σ allowed quantities per product × (deal size + 1)) solved within a request
+MAX_SOLVER_CELLS = 5_000_000
+
+
+class SolverLimitError(ValueError):
+    """The allocation problem is too large to solve within a request."""
+    pass
+
+
+def allocation_bounds(products, deal_size_cases):
+    """
+    Return the per-product (min, max) bulk case bounds.
+
+    Products may carry optional 'min_bulk_quantity' and 'max_bulk_quantity'
+    fields; otherwise a product can take anywhere from 0 to the full deal.
+
+    Args:
+        products (list): List of product dictionaries
+        deal_size_cases (int): Total cases in the deal
+
+    Returns:
+        tuple: (lower bounds array, upper bounds array)
+    """
+    lower = np.zeros(len(products), dtype=int)
+    upper = np.full(len(products), deal_size_cases, dtype=int)
+
+    for i, product in enumerate(products):
+        if product.get('min_bulk_quantity') is not None:
+            lower[i] = max(0, int(product['min_bulk_quantity']))
+        if product.get('max_bulk_quantity') is not None:
+            upper[i] = min(deal_size_cases, int(product['max_bulk_quantity']))
+        if lower[i] > upper[i]:
+            raise ValueError(
+                f"Minimum cases ({lower[i]}) exceed maximum cases ({upper[i]}) for {product.get('product_name', f'product {i + 1}')}"
+            )
+
+    if lower.sum() > deal_size_cases:
+        raise ValueError(f"Minimum cases ({int(lower.sum())}) exceed the deal size ({deal_size_cases})")
+    if upper.sum() < deal_size_cases:
+        raise ValueError(f"Maximum cases ({int(upper.sum())}) cannot fill the deal size ({deal_size_cases})")
+
+    return lower, upper
+
+
+def check_problem_size(lower, upper, deal_size_cases):
+    """
+    Raise SolverLimitError when the DP for these bounds would exceed MAX_SOLVER_CELLS.
+
+    Each DP pass costs the number of allowed quantities per product times the
+    number of deal totals, and a solve runs several passes.
+    """
+    cells = int((upper - lower + 1).sum()) * (deal_size_cases + 1)
+    if cells > MAX_SOLVER_CELLS:
+        raise SolverLimitError(
+            f"Allocation problem too large for the exact solver: {len(lower)} products x {deal_size_cases} cases "
+            f"needs {cells:,} DP cells (limit {MAX_SOLVER_CELLS:,}). Set max_bulk_quantity on products, "
+            f"lower the deal size, or use the iterative optimization mode."
+        )
+
+
+def contribution_tables(arrays, numeric, params, lower, upper, deal_size_cases, evaluate_fallback=None):
+    """
+    Evaluate every product at every bulk quantity within its bounds.
+
+    Args:
+        arrays (dict): Product input arrays from products_to_arrays
+        numeric (ndarray): Rows the vectorized path can evaluate
+        params (dict): Calculation parameters
+        lower (ndarray): Minimum cases per product
+        upper (ndarray): Maximum cases per product
+        deal_size_cases (int): Total cases in the deal
+        evaluate_fallback (callable): (row index, bulk quantity) -> scalar
+            result dict for rows the vectorized path cannot handle
+
+    Returns:
+        dict: CONTRIBUTION_COLUMNS name -> (products × 0..deal size) array, plus
+              'negativeInvestment' flagging quantities with ΔInvestment < 0.
+              Quantities outside a product's bounds are never evaluated and
+              are left at zero.
+    """
+    count = len(arrays['bulk_quantity'])
+    capacity = deal_size_cases + 1
+
+    # One row per (product, allowed quantity) pair
+    sizes = upper - lower + 1
+    product_rows = np.repeat(np.arange(count), sizes)
+    quantities = np.arange(int(sizes.sum())) - np.repeat(np.cumsum(sizes) - sizes, sizes) + np.repeat(lower, sizes)
+    grid = {name: values[product_rows] for name, values in arrays.items()}
+    grid['bulk_quantity'] = quantities.astype(float)
+
+    vectorized = roi_engine.params_are_numeric(params)
+    if vectorized:
+        columns = roi_engine.compute_roi_arrays(grid, params)
+    else:
+        columns = roi_engine.empty_roi_columns(len(quantities))
+
+    for row, (i, q) in enumerate(zip(product_rows, quantities)):
+        if vectorized and numeric[i]:
+            continue
+        status, values, warning = roi_engine.scalar_result_row(evaluate_fallback(int(i), int(q)))
+        columns['status'][row] = status
+        for name in roi_engine.METRIC_COLUMNS:
+            columns[name][row] = values[name]
+        columns['warning'][row] = warning
+
+    contributions = roi_engine.row_contributions(grid, columns)
+    tables = {}
+    for name, values in contributions.items():
+        tables[name] = np.zeros((count, capacity))
+        tables[name][product_rows, quantities] = values
+    tables['negativeInvestment'] = tables['deltaInvestment'] < 0
+    return tables
+
+
+def _best_choices(dp, values, options):
+    """
+    For every cases-used total t, the best dp[t - q] + values[q] over the given options.
+
+    Returns:
+        tuple: (best values, chosen quantities) over totals 0..deal size
+    """
+    capacity = len(dp)
+    if len(options) == 0 or not np.isfinite(dp).any():
+        return np.full(capacity, -np.inf), np.zeros(capacity, dtype=int)
+    # Totals below q read the -inf padding instead of wrapping around
+    padded = np.concatenate((np.full(capacity, -np.inf), dp))
+    candidates = padded[np.arange(capacity, 2 * capacity)[:, None] - options[None, :]] + values[options][None, :]
+    best = np.argmax(candidates, axis=1)
+    return candidates[np.arange(capacity), best], options[best]
+
+
+def _solve_parametric(values, at_risk, lower, upper, deal_size_cases):
+    """
+    Maximize Σ values[i, q_i] subject to Σ q_i = deal size and bounds.
+
+    Quantities with a value of -inf are not allowed.
+
+    The DP tracks whether any chosen quantity puts capital at risk, because
+    allocations with nothing at risk have a zero annualized multiplier. Each
+    product costs O(deal size × its allowed quantities).
+
+    Returns:
+        tuple: (best value with capital at risk, allocation) or (None, None)
+    """
+    capacity = deal_size_cases + 1
+    # safe[t]: best with t cases used and nothing at risk yet; risky[t]: something at risk
+    safe = np.full(capacity, -np.inf)
+    safe[0] = 0.0
+    risky = np.full(capacity, -np.inf)
+    choices = []
+
+    for i in range(values.shape[0]):
+        options = np.arange(lower[i], upper[i] + 1)
+        options = options[np.isfinite(values[i, options])]
+        risk = at_risk[i, options]
+
+        new_safe, safe_choice = _best_choices(safe, values[i], options[~risk])
+        from_safe, from_safe_choice = _best_choices(safe, values[i], options[risk])
+        from_risky, from_risky_choice = _best_choices(risky, values[i], options)
+        take_safe = from_safe >= from_risky
+        new_risky = np.where(take_safe, from_safe, from_risky)
+        risky_choice = np.where(take_safe, from_safe_choice, from_risky_choice)
+
+        choices.append((safe_choice, risky_choice, take_safe))
+        safe, risky = new_safe, new_risky
+
+    if not np.isfinite(risky[deal_size_cases]):
+        return None, None
+
+    # Walk the choices back from the full deal
+    allocation = np.zeros(values.shape[0], dtype=int)
+    was_risky, remaining = True, deal_size_cases
+    for i in range(values.shape[0] - 1, -1, -1):
+        safe_choice, risky_choice, take_safe = choices[i]
+        if was_risky:
+            q = risky_choice[remaining]
+            was_risky = not take_safe[remaining]
+        else:
+            q = safe_choice[remaining]
+        allocation[i] = q
+        remaining -= q
+    return risky[deal_size_cases], allocation
+
+
+def _totals(tables, allocation):
+    """Portfolio sums for an allocation."""
+    rows = np.arange(len(allocation))
+    return {name: roi_engine.sequential_sum(tables[name][rows, allocation]) for name in roi_engine.CONTRIBUTION_COLUMNS}
+
+
+def annualized_roi(tables, allocation):
+    """Portfolio annualized ROI of an allocation, as calculate_portfolio_roi reports it."""
+    metrics = roi_engine.portfolio_metrics(_totals(tables, allocation))
+    return metrics['roi'] * metrics['annualROIMultiplier']
+
+
+def allocation_count(lower, upper, deal_size_cases, limit=ENUMERATION_LIMIT):
+    """
+    Count the allocations that fill the deal within the bounds.
+
+    Counts above limit are reported as limit + 1.
+    """
+    ways = np.zeros(deal_size_cases + 1, dtype=np.int64)
+    ways[0] = 1
+    for lo, hi in zip(lower, upper):
+        # ways'[t] = Σ ways[t - q] for q in [lo, hi], as a difference of prefix sums
+        prefix = np.concatenate(([0], np.cumsum(ways)))
+        totals = np.arange(deal_size_cases + 1)
+        ways = prefix[np.clip(totals - lo + 1, 0, None)] - prefix[np.clip(totals - hi, 0, None)]
+        ways = np.minimum(ways, limit + 1)
+    return int(ways[deal_size_cases])
+
+
+def _enumerate(tables, lower, upper, deal_size_cases):
+    """Evaluate every allocation; returns the best one (the first in product order on ties)."""
+    count = len(lower)
+    rest_min = np.concatenate((np.cumsum(lower[::-1])[::-1], [0]))
+    rest_max = np.concatenate((np.cumsum(upper[::-1])[::-1], [0]))
+
+    # Extend feasible prefixes one product at a time, so no more than the final count is ever held
+    allocations = np.zeros((1, 0), dtype=int)
+    used = np.zeros(1, dtype=int)
+    for i in range(count):
+        options = np.arange(lower[i], upper[i] + 1)
+        new_used = used[:, None] + options[None, :]
+        keep = (new_used + rest_min[i + 1] <= deal_size_cases) & (new_used + rest_max[i + 1] >= deal_size_cases)
+        prefix, option = np.nonzero(keep)
+        allocations = np.column_stack((allocations[prefix], options[option]))
+        used = new_used[prefix, option]
+
+    rows = np.arange(count)[None, :]
+    totals = {name: roi_engine.sequential_sum_rows(tables[name][rows, allocations])
+              for name in roi_engine.CONTRIBUTION_COLUMNS}
+    values = roi_engine.portfolio_metric_arrays(totals)['annualizedRoi']
+    return allocations[int(np.argmax(values))]
+
+
+def _local_search(tables, allocation, lower, upper):
+    """
+    Move cases between products while that raises the full objective.
+
+    Every (source, target) pair is scored at once from the running sums for
+    each move size in MOVE_SIZES, and the best improving move is applied.
+    """
+    rows = np.arange(len(allocation))
+    allocation = allocation.copy()
+    best = annualized_roi(tables, allocation)
+
+    for _ in range(MAX_LOCAL_SEARCH_MOVES):
+        move = None
+        current = {name: tables[name][rows, allocation] for name in roi_engine.CONTRIBUTION_COLUMNS}
+        totals = {name: roi_engine.sequential_sum(values) for name, values in current.items()}
+        for cases in MOVE_SIZES:
+            can_give = allocation - cases >= lower
+            can_take = allocation + cases <= upper
+            if not can_give.any() or not can_take.any():
+                continue
+
+            down = np.maximum(allocation - cases, 0)
+            up = np.minimum(allocation + cases, tables['savings'].shape[1] - 1)
+            trial = {name: totals[name] + (tables[name][rows, down] - current[name])[:, None]
+                     + (tables[name][rows, up] - current[name])[None, :]
+                     for name in roi_engine.CONTRIBUTION_COLUMNS}
+            values = roi_engine.portfolio_metric_arrays(trial)['annualizedRoi']
+            values[~can_give, :] = -np.inf
+            values[:, ~can_take] = -np.inf
+            np.fill_diagonal(values, -np.inf)
+
+            source, target = np.unravel_index(int(np.argmax(values)), values.shape)
+            if values[source, target] > best + TOLERANCE * max(1.0, abs(best)):
+                best = values[source, target]
+                move = (source, target, cases)
+
+        if move is None:
+            break
+        source, target, cases = move
+        allocation[source] -= cases
+        allocation[target] += cases
+        best = annualized_roi(tables, allocation)
+
+    return allocation
+
+
+def _solve_ratio(tables, excluded, lower, upper, deal_size_cases):
+    """
+    Maximize 365 × S ÷ W with Dinkelbach's method, never choosing an excluded quantity.
+
+    Returns:
+        tuple: (allocation or None when nothing can put capital at risk, ratio,
+                upper bound on the ratio or None, iterations)
+    """
+    weighted_days = tables['weightedDaysAtRisk']
+    at_risk = weighted_days > 0
+    savings = np.where(excluded, -np.inf, tables['savings'])
+
+    # λ = 0: the highest-savings allocation that puts any capital at risk
+    ratio = 0.0
+    bound_ratio = 0.0
+    allocation = None
+    residual = np.inf
+    iterations = 0
+
+    while iterations < MAX_DINKELBACH_ITERATIONS:
+        iterations += 1
+        value, candidate = _solve_parametric(savings - ratio * weighted_days, at_risk, lower, upper, deal_size_cases)
+        if candidate is None:
+            break
+
+        totals = _totals(tables, candidate)
+        bound_ratio, residual = ratio, value
+        if allocation is not None and value <= TOLERANCE * max(1.0, abs(totals['savings'])):
+            break
+        allocation = candidate
+        ratio = totals['savings'] / totals['weightedDaysAtRisk']
+
+    if allocation is None:
+        return None, 0.0, 0.0, iterations
+
+    # Any allocation x with capital at risk satisfies S(x)/W(x) <= λ + residual / W(x)
+    # for the last λ solved, so the smallest achievable W bounds the optimality gap
+    upper_bound = max(ratio, bound_ratio)
+    if residual > 0:
+        min_weighted, _ = _solve_parametric(np.where(excluded, -np.inf, -weighted_days), at_risk, lower, upper, deal_size_cases)
+        min_weighted = -min_weighted if min_weighted is not None else 0.0
+        upper_bound = max(ratio, bound_ratio + residual / min_weighted) if min_weighted > 0 else None
+
+    return allocation, ratio, upper_bound, iterations
+
+
+def _zero_allocation(tables, lower, upper, deal_size_cases):
+    """An allocation with an annualized ROI of exactly zero (ΔInvestment <= 0 or nothing weighted), if any."""
+    anything = np.ones_like(tables['savings'], dtype=bool)
+    value, allocation = _solve_parametric(-tables['deltaInvestment'], anything, lower, upper, deal_size_cases)
+    if allocation is not None and value >= 0:
+        return allocation
+    unweighted = np.where(tables['investmentForWeighting'] > 0, -np.inf, 0.0)
+    return _solve_parametric(unweighted, anything, lower, upper, deal_size_cases)[1]
+
+
+def solve_allocation(tables, lower, upper, deal_size_cases):
+    """
+    Find the integer allocation with the highest portfolio annualized ROI.
+
+    Args:
+        tables (dict): Contribution tables from contribution_tables
+        lower (ndarray): Minimum cases per product
+        upper (ndarray): Maximum cases per product
+        deal_size_cases (int): Total cases in the deal
+
+    Returns:
+        dict: allocation, annualizedRoi, upperBound, optimalityGap,
+              iterations, solveTimeMs and exact (True only when the
+              allocation is proven optimal). The bound and gap are None when
+              they cannot be established.
+
+    Raises:
+        SolverLimitError: If the problem exceeds MAX_SOLVER_CELLS
+    """
+    check_problem_size(lower, upper, deal_size_cases)
+    start_time = time.perf_counter()
+
+    if allocation_count(lower, upper, deal_size_cases) <= ENUMERATION_LIMIT:
+        allocation = _enumerate(tables, lower, upper, deal_size_cases)
+        value = annualized_roi(tables, allocation)
+        return {
+            'allocation': allocation,
+            'annualizedRoi': value,
+            'upperBound': value,
+            'optimalityGap': 0.0,
+            'iterations': 1,
+            'solveTimeMs': (time.perf_counter() - start_time) * 1000,
+            'exact': True
+        }
+
+    quantities = np.arange(deal_size_cases + 1)[None, :]
+    in_bounds = (quantities >= lower[:, None]) & (quantities <= upper[:, None])
+    negative = tables['negativeInvestment'] & in_bounds
+
+    if not negative.any():
+        # P = D for every allocation, so the ratio model is the objective itself
+        allocation, ratio, upper_bound, iterations = _solve_ratio(tables, negative, lower, upper, deal_size_cases)
+        if allocation is None or ratio < 0:
+            # Allocations with nothing at risk have a zero annualized ROI, which beats a loss
+            zero = _zero_allocation(tables, lower, upper, deal_size_cases)
+            if zero is not None:
+                if allocation is None:
+                    upper_bound = 0.0
+                elif upper_bound is not None:
+                    upper_bound = max(upper_bound, 0.0)
+                allocation, ratio = zero, 0.0
+        return {
+            'allocation': allocation,
+            'annualizedRoi': 365 * ratio,
+            'upperBound': 365 * upper_bound if upper_bound is not None else None,
+            'optimalityGap': 365 * (upper_bound - ratio) if upper_bound is not None else None,
+            'iterations': iterations,
+            'solveTimeMs': (time.perf_counter() - start_time) * 1000,
+            'exact': upper_bound is not None
+        }
+
+    # Seed a local search on the full objective with both ratio optima and a zero-ROI fallback
+    iterations = 0
+    starts = []
+    for excluded in (negative, np.zeros_like(negative)):
+        allocation, _, _, steps = _solve_ratio(tables, excluded, lower, upper, deal_size_cases)
+        iterations += steps
+        if allocation is not None:
+            starts.append(allocation)
+    zero = _zero_allocation(tables, lower, upper, deal_size_cases)
+    if zero is not None:
+        starts.append(zero)
+    if not starts:
+        # Every allocation puts capital at risk at a negative return; take any feasible one
+        starts.append(_solve_parametric(np.zeros_like(tables['savings']), np.ones_like(negative), lower, upper, deal_size_cases)[1])
+
+    candidates = [_local_search(tables, start, lower, upper) for start in starts]
+    values = [annualized_roi(tables, candidate) for candidate in candidates]
+    best = int(np.argmax(values))
+    return {
+        'allocation': candidates[best],
+        'annualizedRoi': values[best],
+        'upperBound': None,
+        'optimalityGap': None,
+        'iterations': iterations,
+        'solveTimeMs': (time.perf_counter() - start_time) * 1000,
+        'exact': False
+    }
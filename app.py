@@ -1,16 +1,22 @@
+import io
 import os
+import time
+import uuid
 from logging_utils import setup_logging
 from datetime import datetime, timedelta
-from flask import Flask, render_template, request, redirect, url_for, flash, send_file, jsonify
+from flask import Flask, Response, render_template, request, redirect, url_for, flash, send_file, jsonify
 from werkzeug.utils import secure_filename
 from report_processor import APReportProcessor
+from report_jobs import ReportJobQueue
+from report_cache import ReportCache
+from backup_store import BackupStore
 from deal_split_processor import DealSplitCalculator
 from single_deal_calculator import SingleDealCalculator
 from sales_tax_calculator import SalesTaxCalculator
 from multi_product_calculator import MultiProductBuyingCalculator
+from allocation_solver import SolverLimitError
 from margin_calculator import MarginCalculator
 import json
-import shutil
 from pathlib import Path
 import traceback
 from validator import validate_product, validate_calculator_params, ValidationError
@@ -33,6 +39,13 @@ single_deal_calculator = SingleDealCalculator()
 sales_tax_calculator = SalesTaxCalculator()
 margin_calculator = MarginCalculator()
 
+# AP reports are generated in the background; /jobs/<id> reports their progress
+report_jobs = ReportJobQueue()
+# Finished AP reports, reused when the same file is processed with the same options
+report_cache = ReportCache(os.path.join(app.config['REPORT_FOLDER'], 'cache'))
+# Deduplicated, retention-limited backups of uploaded files
+backup_store = BackupStore(os.path.join(app.config['UPLOAD_FOLDER'], 'backups'))
+
 # Initialize the multi-product calculator instance
 multi_product_calculator_instance = MultiProductBuyingCalculator()
 
@@ -72,23 +85,41 @@ def upload_file():
 
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        # Every upload gets its own file, so two users uploading the same name never
+        # race, and a file that a backup may be hardlinked to is never rewritten.
+        # The job deletes it when it finishes; the backup store keeps the copy.
+        file_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex}_{filename}")
         file.save(file_path)
 
         try:
-            # Process the AP report
-            processor = APReportProcessor(file_path)
-            output_file = processor.generate_report()
-
-            # Pass the generated file path to the template
-            return render_template('success.html', filename=os.path.basename(output_file))
+            # Queue the AP report, optionally with a longer forecast horizon
+            forward_weeks = request.form.get('forward_weeks', type=int)
+            processor = APReportProcessor(file_path, forward_weeks=forward_weeks, cache=report_cache,
+                                          backup_store=backup_store, remove_source=True)
+            job_id = report_jobs.submit(processor)
+
+            # The success page polls the job until the report is ready
+            return render_template('success.html', job_id=job_id)
         except Exception as e:
+            if os.path.exists(file_path):
+                os.remove(file_path)
             flash(f'Error processing file: {str(e)}')
             return redirect(url_for('index'))
     else:
         flash('Invalid file type. Please upload an Excel file (.xlsx, .xls)')
         return redirect(url_for('index'))
 
+@app.route('/jobs/<job_id>')
+def get_report_job(job_id):
+    """Return the status, current stage and stage timings of a report job."""
+    job = report_jobs.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+
+    if job['filename']:
+        job['downloadUrl'] = url_for('download_file', filename=job['filename'])
+    return jsonify({"success": True, "job": job})
+
 @app.route('/download/<filename>')
 def download_file(filename):
     return send_file(os.path.join(app.config['REPORT_FOLDER'], filename), as_attachment=True)
@@ -96,7 +127,7 @@ def download_file(filename):
 # Deal Split Calculator routes
 @app.route('/deal-calculator')
 def deal_calculator_page():
-    scenarios = deal_calculator.get_all_scenarios()
+    scenarios = deal_calculator.list_scenarios()
     return render_template('deal_calculator.html', scenarios=scenarios)
 
 @app.route('/api/calculate-deal', methods=['POST'])
@@ -123,6 +154,31 @@ def calculate_deal():
                     raise ValueError
             except Exception:
                 return jsonify({"success": False, "error": f"Inventory on hand must be a non-negative integer in row {idx+1}"}), 400
+        # Optionally split every candidate order size in one call
+        if 'desired_totals' in data:
+            try:
+                desired_totals = [int(total) for total in data['desired_totals']]
+            except (TypeError, ValueError):
+                return jsonify({"success": False, "error": "Desired totals must be a list of integers"}), 400
+            if not desired_totals or min(desired_totals) <= 0:
+                return jsonify({"success": False, "error": "Desired totals must be greater than 0"}), 400
+
+            splits_df = deal_calculator.calculate_splits(varieties_data, desired_totals)
+            rows_per_total = len(varieties_data)
+            splits = []
+            for i, total in enumerate(desired_totals):
+                block = splits_df.iloc[i * rows_per_total:(i + 1) * rows_per_total].drop('desired_total', axis=1)
+                splits.append({
+                    "desired_total": total,
+                    "results": block.to_dict('records'),
+                    "total_rounded_split": int(block['rounded_split'].sum())
+                })
+            return jsonify({
+                "success": True,
+                "splits": splits,
+                "total_annual_sales": int(splits_df['annual_sales'].iloc[:rows_per_total].sum()),
+                "total_inventory_on_hand": int(splits_df['inventory_on_hand'].iloc[:rows_per_total].sum())
+            })
         if desired_total <= 0:
             return jsonify({"success": False, "error": "Desired total must be greater than 0"}), 400
         # Calculate the split
@@ -165,7 +221,8 @@ def save_scenario():
         ]
 
         # Save the scenario
-        deal_calculator.save_scenario(scenario_name, filtered_data)
+        tags = data.get('tags')
+        deal_calculator.save_scenario(scenario_name, filtered_data, tags if isinstance(tags, list) else None)
 
         return jsonify({"success": True})
     except Exception as e:
@@ -404,6 +461,35 @@ def generate_sales_tax_report():
         traceback.print_exc()
         return jsonify({"success": False, "error": str(e)})
 
+@app.route('/api/generate-sales-tax-reports', methods=['POST'])
+def generate_sales_tax_reports():
+    """Generate reports for many filing periods at once, returned as one zip file."""
+    try:
+        data = request.json
+        filings = data.get('filings', [])
+
+        if not filings:
+            return jsonify({"success": False, "error": "No filings provided"}), 400
+        for idx, filing in enumerate(filings):
+            if not filing.get('period'):
+                return jsonify({"success": False, "error": f"Missing period in filing {idx+1}"}), 400
+            if not filing.get('tax_data'):
+                return jsonify({"success": False, "error": f"No tax data provided in filing {idx+1}"}), 400
+
+        batch = sales_tax_calculator.generate_reports(filings, app.config['REPORT_FOLDER'])
+        filename = os.path.basename(batch['zip_path'])
+
+        return jsonify({
+            "success": True,
+            "filename": filename,
+            "download_url": url_for('download_file', filename=filename),
+            "files": batch['files'],
+            "timings": batch['timings']
+        })
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"success": False, "error": str(e)})
+
 @app.route('/view-sample-report')
 def view_sample_report():
     """Generate a report using sample data for demonstration purposes."""
@@ -416,13 +502,9 @@ def view_sample_report():
             flash('Sample data file not found. Please contact the administrator.')
             return redirect(url_for('index'))
 
-        # Create a temporary copy of the source file to process
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        temp_file_path = os.path.join(app.config['UPLOAD_FOLDER'], f'sample_temp_{timestamp}.xlsx')
-        shutil.copy2(sample_file_path, temp_file_path)
-
-        # Process the report
-        processor = APReportProcessor(temp_file_path)
+        # Process the report. The processor only reads the sample, and its backup
+        # goes to the shared backup store, so no working copy is needed.
+        processor = APReportProcessor(sample_file_path, cache=report_cache, backup_store=backup_store)
         output_file = processor.generate_report()
 
         # Pass the generated file path to the template
@@ -501,6 +583,8 @@ def optimize_multi_product_deal():
             "results": results
         })
 
+    except SolverLimitError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
         print(f"Error optimizing multi-product deal: {str(e)}")
         print(traceback.format_exc())
@@ -509,6 +593,27 @@ def optimize_multi_product_deal():
             "error": str(e)
         })
 
+@app.route('/api/evaluate-multi-product-grid', methods=['POST'])
+def evaluate_multi_product_grid():
+    """Evaluate portfolio ROI over a grid of deal parameters in one request."""
+    try:
+        data = request.json
+        # Validate input structure
+        if not data or 'products' not in data or 'grid' not in data:
+            return jsonify({"success": False, "error": "Missing required fields: products, grid"}), 400
+        try:
+            # Validate each product
+            validated_products = [validate_product(p) for p in data['products']]
+        except ValidationError as ve:
+            return jsonify({"success": False, "error": str(ve)}), 400
+
+        results = multi_product_calculator_instance.evaluate_grid(dict(data, products=validated_products))
+        return jsonify({"success": True, "results": results})
+    except Exception as e:
+        print(f"Error evaluating multi-product grid: {str(e)}")
+        print(traceback.format_exc())
+        return jsonify({"success": False, "error": str(e)})
+
 @app.route('/api/generate-multi-product-report', methods=['POST'])
 def generate_multi_product_report():
     """Generate an Excel report for the Multi-Product Buying Calculator."""
@@ -618,6 +723,40 @@ def get_multi_product_scenario(scenario_name):
             "error": str(e)
         })
 
+@app.route('/api/search-scenarios')
+def search_scenarios():
+    """Search saved scenarios by name prefix and/or tag without loading their data."""
+    try:
+        stores = {
+            'deal_split': deal_calculator.scenario_store,
+            'multi_product': multi_product_calculator_instance.scenario_store,
+        }
+        kind = request.args.get('kind', 'multi_product')
+        if kind not in stores:
+            return jsonify({"success": False, "error": f"kind must be one of {', '.join(stores)}"}), 400
+        order = request.args.get('order', 'updated')
+        if order not in ('updated', 'name'):
+            return jsonify({"success": False, "error": "order must be updated or name"}), 400
+        try:
+            offset = int(request.args.get('offset', 0))
+            limit = int(request.args.get('limit', 100))
+            if offset < 0 or not 0 < limit <= 1000:
+                raise ValueError
+        except ValueError:
+            return jsonify({"success": False, "error": "offset must be 0 or more and limit between 1 and 1000"}), 400
+
+        scenarios = stores[kind].search(prefix=request.args.get('q') or None, tag=request.args.get('tag') or None,
+                                        order=order, limit=limit, offset=offset)
+        return jsonify({"success": True, "scenarios": scenarios})
+
+    except Exception as e:
+        print(f"Error searching scenarios: {str(e)}")
+        print(traceback.format_exc())
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        })
+
 # Margin/Markup Calculator routes
 @app.route('/margin-calculator')
 def margin_calculator_page():
@@ -650,6 +789,113 @@ def get_margin_feedback():
         traceback.print_exc()
         return jsonify({"success": False, "error": str(e)})
 
+@app.route('/api/margin-feedback/bulk', methods=['POST'])
+def bulk_margin_feedback():
+    """Classify a whole price list and stream one page of it back as NDJSON."""
+    try:
+        # Products come as an uploaded CSV/Excel price list or as a JSON list
+        file = request.files.get('file')
+        if file is not None and file.filename:
+            options = request.form
+            products = margin_calculator.load_products(file.stream, file.filename)
+        else:
+            options = request.json or {}
+            products = options.get('products', [])
+        if len(products) == 0:
+            return jsonify({"success": False, "error": "No products provided"}), 400
+
+        try:
+            offset = int(options.get('offset', 0))
+            limit = int(options.get('limit', 500))
+            if offset < 0 or not 0 < limit <= 5000:
+                raise ValueError
+        except (TypeError, ValueError):
+            return jsonify({"success": False, "error": "offset must be 0 or more and limit between 1 and 5000"}), 400
+        feedback_type = options.get('feedback_type') or None
+        include_text = str(options.get('include_text', 'true')).lower() in ('true', '1', 'yes')
+
+        try:
+            feedback = margin_calculator.bulk_pricing_feedback(products, options.get('target_margin') or None)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
+        types = feedback['feedback_type']
+        selected = feedback if feedback_type is None else feedback[types.fillna('invalid') == feedback_type]
+        page = selected.iloc[offset:offset + limit]
+        summary = {
+            "type": "summary",
+            "total": len(feedback),
+            "counts": {name: int(count) for name, count in types.fillna('invalid').value_counts().items()},
+            "matched": len(selected),
+            "offset": offset,
+            "limit": limit,
+            "next_offset": offset + limit if offset + limit < len(selected) else None
+        }
+
+        def generate():
+            yield json.dumps(summary) + "\n"
+            for row_id, row in zip(page.index, page.to_dict('records')):
+                row_type = row.pop('feedback_type')
+                line = {
+                    "type": "row",
+                    "row": int(row_id),
+                    "name": row.pop('name'),
+                    "feedback_type": row_type,
+                    "metrics": row if row_type else None
+                }
+                # Text is only built for the rows on this page
+                if include_text and row_type:
+                    line['summary'], line['recommendations'] = margin_calculator.feedback_messages(row_type, row)
+                yield json.dumps(line) + "\n"
+
+        return Response(generate(), mimetype='application/x-ndjson')
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"success": False, "error": str(e)})
+
+@app.route('/api/margin-batch-analysis', methods=['POST'])
+def margin_batch_analysis():
+    """Price every product in an uploaded CSV/Excel file at a set of margins."""
+    try:
+        started = time.perf_counter()
+        file = request.files.get('file')
+        if file is None or file.filename == '':
+            return jsonify({"success": False, "error": "No products file provided"}), 400
+
+        # Optional comma-separated margins as fractions, e.g. "0.25,0.30,0.35"
+        margins = None
+        if request.form.get('margins'):
+            try:
+                margins = [float(margin) for margin in request.form['margins'].split(',')]
+            except ValueError:
+                return jsonify({"success": False, "error": "Margins must be comma-separated numbers"}), 400
+        form = request.form.get('form', 'wide')
+        output = request.form.get('output', 'json')
+
+        try:
+            products = margin_calculator.load_products(file.stream, file.filename)
+            results = margin_calculator.perform_batch_analysis(products, margins=margins, form=form)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
+        if output == 'csv':
+            stem = os.path.splitext(secure_filename(file.filename))[0] or 'products'
+            return send_file(io.BytesIO(results.to_csv(index=False).encode('utf-8')), mimetype='text/csv',
+                             as_attachment=True, download_name=f"{stem}_margins.csv")
+
+        # NaN (no current price) becomes null in the JSON
+        records = results.astype(object).where(results.notna(), None).to_dict('records')
+        return jsonify({
+            "success": True,
+            "count": len(products),
+            "columns": list(results.columns),
+            "results": records,
+            "elapsed_ms": (time.perf_counter() - started) * 1000
+        })
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"success": False, "error": str(e)})
+
 @app.route('/api/generate-margin-report', methods=['POST'])
 def generate_margin_report():
     """Generate a margin analysis report."""
@@ -0,0 +1,104 @@
+"""
+Retention-aware backup store for uploaded AP aging files.
+
+Every processed upload used to be copied next to itself, doubling the write
+cost of large files and growing uploads/ without limit. Backups now go to a
+dedicated folder where:
+
+- each distinct file is kept once, identified by a SHA-256 of its bytes
+  (re-uploading the same export only refreshes its backup's timestamp)
+- new backups are copy-on-write clones or hardlinks where the filesystem
+  supports them, and plain copies otherwise
+- backups older than max_age_days, or beyond the newest max_count, are removed
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from report_cache import file_digest, link_or_copy
+
+DEFAULT_MAX_AGE_DAYS = 30
+DEFAULT_MAX_COUNT = 100
+# Digest characters kept in backup filenames
+DIGEST_LENGTH = 16
+
+
+class BackupStore:
+    """Deduplicated backups with age and count limits."""
+
+    def __init__(self, directory, max_age_days=DEFAULT_MAX_AGE_DAYS, max_count=DEFAULT_MAX_COUNT):
+        """
+        Args:
+            directory (str): Folder holding the backups
+            max_age_days (float): Backups not refreshed for this long are removed (None keeps them)
+            max_count (int): Most backups kept (None for no limit)
+        """
+        self.directory = directory
+        self.max_age_days = max_age_days
+        self.max_count = max_count
+        self._lock = threading.Lock()
+
+    def _backups(self):
+        """Return (path, mtime) for every backup, newest first."""
+        os.makedirs(self.directory, exist_ok=True)
+        backups = [(entry.path, entry.stat().st_mtime) for entry in os.scandir(self.directory)
+                   if entry.is_file() and not entry.name.startswith('.')]
+        return sorted(backups, key=lambda backup: backup[1], reverse=True)
+
+    def store(self, file_path, digest=None):
+        """
+        Back up a file, reusing an existing backup of the same bytes.
+
+        Args:
+            file_path (str): File to back up
+            digest (str): The file's file_digest, if already computed
+
+        Returns:
+            dict: path, method ('existing', 'reflink', 'hardlink' or 'copy'),
+                  bytes and elapsedMs
+        """
+        started = time.perf_counter()
+        if digest is None:
+            digest = file_digest(file_path)
+        source = Path(file_path)
+        tag = f"_{digest[:DIGEST_LENGTH]}{source.suffix}"
+
+        with self._lock:
+            existing = next((path for path, _ in self._backups() if path.endswith(tag)), None)
+            if existing is not None:
+                # Same bytes already backed up: refresh it so retention counts from this upload
+                now = time.time()
+                os.utime(existing, (now, now))
+                path, method = existing, 'existing'
+            else:
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                path = os.path.join(self.directory, f"{source.stem}_Backup_{timestamp}{tag}")
+                method = link_or_copy(file_path, path, reflink=True)
+                # Links share the upload's mtime; restamp so retention counts from now
+                now = time.time()
+                os.utime(path, (now, now))
+            self._prune()
+
+        return {
+            'path': path,
+            'method': method,
+            'bytes': os.path.getsize(path),
+            'elapsedMs': (time.perf_counter() - started) * 1000
+        }
+
+    def _prune(self):
+        """Remove expired backups and those beyond max_count. Caller holds the lock."""
+        cutoff = None
+        if self.max_age_days is not None:
+            cutoff = time.time() - self.max_age_days * 86400
+
+        for index, (path, mtime) in enumerate(self._backups()):
+            too_many = self.max_count is not None and index >= self.max_count
+            too_old = cutoff is not None and mtime < cutoff
+            if too_many or too_old:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,86 @@
+"""
+Indexed binary heap used by the multi-product optimizer to pick swap candidates.
+
+Entries are keyed by a stable product ID, so the priority of a single product
+can be changed or removed in O(log n) without rescanning the portfolio.
+"""
+
+
+class IndexedHeap:
+    """
+    Min-heap of (priority, key) entries with O(log n) update and removal by key.
+
+    For a max-heap, push negated priorities.
+    """
+
+    def __init__(self):
+        self._entries = []     # Heap-ordered list of (priority, key)
+        self._positions = {}   # key -> index into self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._positions
+
+    def peek(self):
+        """
+        Return the (priority, key) entry with the smallest priority.
+
+        Returns:
+            tuple: (priority, key), or None if the heap is empty
+        """
+        return self._entries[0] if self._entries else None
+
+    def update(self, key, priority):
+        """Insert key with the given priority, or change its priority if present."""
+        if key in self._positions:
+            index = self._positions[key]
+            old_priority = self._entries[index][0]
+            self._entries[index] = (priority, key)
+            if priority < old_priority:
+                self._sift_up(index)
+            else:
+                self._sift_down(index)
+        else:
+            self._entries.append((priority, key))
+            self._positions[key] = len(self._entries) - 1
+            self._sift_up(len(self._entries) - 1)
+
+    def remove(self, key):
+        """Remove key from the heap if present."""
+        index = self._positions.pop(key, None)
+        if index is None:
+            return
+
+        last = self._entries.pop()
+        if index < len(self._entries):
+            self._entries[index] = last
+            self._positions[last[1]] = index
+            self._sift_up(index)
+            self._sift_down(self._positions[last[1]])
+
+    def _swap(self, i, j):
+        self._entries[i], self._entries[j] = self._entries[j], self._entries[i]
+        self._positions[self._entries[i][1]] = i
+        self._positions[self._entries[j][1]] = j
+
+    def _sift_up(self, index):
+        while index > 0:
+            parent = (index - 1) // 2
+            if self._entries[index][0] >= self._entries[parent][0]:
+                break
+            self._swap(index, parent)
+            index = parent
+
+    def _sift_down(self, index):
+        size = len(self._entries)
+        while True:
+            smallest = index
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < size and self._entries[child][0] < self._entries[smallest][0]:
+                    smallest = child
+            if smallest == index:
+                break
+            self._swap(index, smallest)
+            index = smallest
@@ -1,39 +1,73 @@
+import numpy as np
 import pandas as pd
 import openpyxl
 from openpyxl.utils.dataframe import dataframe_to_rows
 from openpyxl.formatting.rule import CellIsRule
 import os
 from datetime import datetime
-from scenario_utils import load_all_scenarios, save_all_scenarios
+from scenario_store import ScenarioStore, DEFAULT_DB_PATH, SCENARIOS_DB, deal_split_records
 from logging_utils import setup_logging
 from excel_utils import get_title_font, get_header_font, get_header_fill, get_money_format, get_percent_format, apply_header_styles
 
 setup_logging('logs/deal_split.log')
 
 class DealSplitCalculator:
-    def __init__(self):
-        self.scenarios = {}
-        self.scenarios_file = os.path.join(os.path.dirname(__file__), 'scenarios.json')
-        self.load_scenarios()
+    def __init__(self, scenarios_db=DEFAULT_DB_PATH, scenarios_file=None, legacy_db=None):
+        # The first database next to this file, or before it the single-file scenarios.json,
+        # seeds the shared database the first time
+        self.scenarios_file = scenarios_file or os.path.join(os.path.dirname(__file__), 'scenarios.json')
+        self.legacy_db = legacy_db or os.path.join(os.path.dirname(__file__), SCENARIOS_DB)
+        self.scenarios_db = scenarios_db
+        self.scenario_store = ScenarioStore(self.scenarios_db, kind='deal_split',
+                                            legacy=lambda: deal_split_records(self.legacy_db, self.scenarios_file))
+
+    def apportion(self, annual_sales, desired_totals):
+        """
+        Split each desired total across varieties in proportion to annual sales,
+        using largest-remainder rounding
 
-    def load_scenarios(self):
-        """Load existing scenarios from a JSON file if it exists"""
-        self.scenarios = load_all_scenarios(self.scenarios_file)
+        Every split is floored, then the units still missing go one each to the
+        varieties with the largest fractional parts (earlier varieties win ties).
 
-    def save_scenarios(self):
-        """Save scenarios to a JSON file"""
-        save_all_scenarios(self.scenarios_file, self.scenarios)
+        Args:
+            annual_sales: Array of annual sales per variety (N)
+            desired_totals: Array of desired total order quantities (K)
 
-    def calculate_split(self, data, desired_total):
+        Returns:
+            Tuple of (calculated_split, rounded_split), each a K x N array
         """
-        Calculate deal splits based on annual sales proportions
+        annual_sales = np.asarray(annual_sales)
+        desired_totals = np.asarray(desired_totals)
+        total_annual_sales = annual_sales.sum()
+        if total_annual_sales <= 0:
+            zeros = np.zeros((len(desired_totals), len(annual_sales)))
+            return zeros, zeros.astype(int)
+
+        calculated = annual_sales[np.newaxis, :] * desired_totals[:, np.newaxis] / total_annual_sales
+        rounded = np.trunc(calculated).astype(int)
+
+        # Rank varieties by fractional part, largest first
+        order = np.argsort(-(calculated - rounded), axis=1, kind='stable')
+        rank = np.empty_like(order)
+        np.put_along_axis(rank, order, np.arange(len(annual_sales))[np.newaxis, :], axis=1)
+
+        difference = (desired_totals - rounded.sum(axis=1))[:, np.newaxis]
+        # Add units to the largest remainders, or take them from the smallest (never below zero)
+        rounded += rank < difference
+        rounded -= (rank >= len(annual_sales) + difference) & (rounded > 0)
+        return calculated, rounded
+
+    def calculate_splits(self, data, desired_totals):
+        """
+        Calculate deal splits for several desired totals at once
 
         Args:
             data: List of dictionaries with 'variety', 'annual_sales', and 'inventory_on_hand' keys
-            desired_total: The desired total order quantity
+            desired_totals: List of desired total order quantities
 
         Returns:
-            DataFrame with calculation results
+            DataFrame with a desired_total column and one block of calculate_split
+            rows per desired total
         """
         # Create DataFrame from input data
         df = pd.DataFrame(data)
@@ -42,95 +76,50 @@ class DealSplitCalculator:
         if 'inventory_on_hand' not in df.columns:
             df['inventory_on_hand'] = 0
 
-        # Calculate totals
-        total_annual_sales = df['annual_sales'].sum()
-
-        # Calculate proportions and splits
-        if total_annual_sales > 0:
-            df['calculated_split'] = df['annual_sales'] * desired_total / total_annual_sales
-            df['rounded_split'] = df['calculated_split'].apply(lambda x: int(x))
-
-            # Calculate days to sell for each variety
-            # Daily sales rate = annual sales / 365
-            # Days to sell = rounded split / daily sales rate
-            df['daily_sales_rate'] = df['annual_sales'] / 365
-            df['days_to_sell'] = df.apply(
-                lambda row: round(row['rounded_split'] / row['daily_sales_rate']) if row['daily_sales_rate'] > 0 else 0,
-                axis=1
-            )
-
-            # If the sum of rounded_split doesn't match the desired total,
-            # adjust values with the largest difference between calculated and rounded
-            rounded_total = df['rounded_split'].sum()
-
-            if rounded_total != desired_total:
-                # Calculate difference
-                df['diff'] = df['calculated_split'] - df['rounded_split']
-
-                # Sort by difference
-                df = df.sort_values('diff', ascending=False)
-
-                # Adjust values
-                difference = desired_total - rounded_total
-
-                if difference > 0:
-                    # Need to add units
-                    for i in range(int(difference)):
-                        if i < len(df):
-                            df.iloc[i, df.columns.get_loc('rounded_split')] += 1
-
-                            # Recalculate days to sell for this row
-                            daily_rate = df.iloc[i]['daily_sales_rate']
-                            if daily_rate > 0:
-                                df.iloc[i, df.columns.get_loc('days_to_sell')] = round(df.iloc[i]['rounded_split'] / daily_rate)
-                else:
-                    # Need to remove units
-                    for i in range(int(abs(difference))):
-                        if i < len(df):
-                            idx = len(df) - 1 - i  # Start from bottom
-                            if df.iloc[idx]['rounded_split'] > 0:  # Don't go below zero
-                                df.iloc[idx, df.columns.get_loc('rounded_split')] -= 1
-
-                                # Recalculate days to sell for this row
-                                daily_rate = df.iloc[idx]['daily_sales_rate']
-                                if daily_rate > 0:
-                                    df.iloc[idx, df.columns.get_loc('days_to_sell')] = round(df.iloc[idx]['rounded_split'] / daily_rate)
-
-                # Reset index and sort
-                df = df.sort_index()
-
-                # Remove diff column
-                df = df.drop('diff', axis=1)
-        else:
-            # Handle case where there are no annual sales
-            df['calculated_split'] = 0
-            df['rounded_split'] = 0
-            df['daily_sales_rate'] = 0
-            df['days_to_sell'] = 0
+        annual_sales = df['annual_sales'].to_numpy()
+        desired_totals = np.asarray(desired_totals)
+        calculated, rounded = self.apportion(annual_sales, desired_totals)
+
+        # Days to sell = rounded split / daily sales rate (annual sales / 365)
+        daily_sales_rate = annual_sales / 365
+        with np.errstate(divide='ignore', invalid='ignore'):
+            days_to_sell = np.where(daily_sales_rate > 0, np.round(rounded / daily_sales_rate), 0)
+
+        df = df.loc[np.tile(df.index, len(desired_totals))].reset_index(drop=True)
+        df.insert(0, 'desired_total', np.repeat(desired_totals, len(annual_sales)))
 
         # Convert NumPy types to Python native types for JSON serialization
         df['annual_sales'] = df['annual_sales'].astype(int)
         df['inventory_on_hand'] = df['inventory_on_hand'].astype(int)
-        df['calculated_split'] = df['calculated_split'].astype(float)
-        df['rounded_split'] = df['rounded_split'].astype(int)
-        df['days_to_sell'] = df['days_to_sell'].astype(int)
-
-        # Drop the daily_sales_rate column as it's only needed for calculation
-        if 'daily_sales_rate' in df.columns:
-            df = df.drop('daily_sales_rate', axis=1)
+        df['calculated_split'] = calculated.ravel().astype(float)
+        df['rounded_split'] = rounded.ravel().astype(int)
+        df['days_to_sell'] = days_to_sell.ravel().astype(int)
 
         return df
 
-    def save_scenario(self, name, data):
+    def calculate_split(self, data, desired_total):
+        """
+        Calculate deal splits based on annual sales proportions
+
+        Args:
+            data: List of dictionaries with 'variety', 'annual_sales', and 'inventory_on_hand' keys
+            desired_total: The desired total order quantity
+
+        Returns:
+            DataFrame with calculation results
+        """
+        return self.calculate_splits(data, [desired_total]).drop('desired_total', axis=1)
+
+    def save_scenario(self, name, data, tags=None):
         """
         Save a scenario for future use
 
         Args:
             name: Name of the scenario
             data: List of dictionaries with variety and annual_sales
+            tags: Optional list of tags (None keeps the scenario's current tags)
         """
-        self.scenarios[name] = data
-        self.save_scenarios()
+        self.scenario_store.save(name, data, tags)
 
     def get_scenario(self, name):
         """
@@ -142,25 +131,19 @@ class DealSplitCalculator:
         Returns:
             List of dictionaries or None if scenario doesn't exist
         """
-        key = name.strip().lower()
-        for scenario_name in self.scenarios:
-            if scenario_name.strip().lower() == key:
-                return self.scenarios[scenario_name]
-        return None
+        return self.scenario_store.get(name)
 
     def delete_scenario(self, name):
         """Delete a scenario by name (case-insensitive, trimmed)"""
-        key = name.strip().lower()
-        for scenario_name in list(self.scenarios.keys()):
-            if scenario_name.strip().lower() == key:
-                del self.scenarios[scenario_name]
-                self.save_scenarios()
-                return True
-        return False
+        return self.scenario_store.delete(name)
+
+    def list_scenarios(self):
+        """Return the names of all saved scenarios"""
+        return self.scenario_store.names()
 
     def get_all_scenarios(self):
         """Return all saved scenarios"""
-        return self.scenarios
+        return self.scenario_store.all()
 
     def generate_report(self, data, desired_total, file_path):
         """
@@ -14,6 +14,9 @@ class MarginCalculator:
     Calculator for determining pricing, margins, and markups for retail products.
     Includes sensitivity analysis for different margin levels.
     """
+    # Pricing within this margin of the target counts as optimal
+    OPTIMAL_TOLERANCE = 0.02
+
     def __init__(self):
         # Default margin range for sensitivity analysis
         self.min_margin = 0.23  # 23%
@@ -83,58 +86,129 @@ class MarginCalculator:
             profit_diff = current_profit - target_profit
             
             # Determine feedback type and recommendations
-            feedback_type = 'optimal'
-            summary = ''
-            recommendations = []
-            
-            if abs(margin_diff) < 0.02:  # Within 2% of target
+            if abs(margin_diff) < self.OPTIMAL_TOLERANCE:  # Within 2% of target
                 feedback_type = 'optimal'
-                summary = 'Your current pricing is well-aligned with your target margin!'
-                recommendations = [
-                    'Current pricing strategy is optimal',
-                    'Monitor competitor pricing to maintain position',
-                    'Consider small price adjustments for seasonal demand'
-                ]
             elif current_margin < target_margin:
                 feedback_type = 'increase_needed'
-                increase_pct = ((target_price / current_price - 1) * 100)
-                summary = f'Current pricing is below target. Consider increasing price by {increase_pct:.1f}% (${abs(price_diff):.2f})'
-                recommendations = [
-                    f'Increase price to ${target_price:.2f} to reach target margin',
-                    f'This would improve profit by ${abs(profit_diff):.2f} per unit',
-                    'Test price increase gradually to gauge customer response',
-                    'Highlight value proposition to justify higher price'
-                ]
             else:
                 feedback_type = 'above_target'
-                summary = f'Current pricing exceeds target margin by {(margin_diff * 100):.1f}%'
-                recommendations = [
-                    'Current pricing generates strong margins',
-                    'Monitor for customer price sensitivity',
-                    'Consider competitive positioning - are you pricing yourself out?',
-                    f'Could reduce price by ${abs(price_diff):.2f} and still meet target'
-                ]
-                
+
+            metrics = {
+                'margin_diff': margin_diff,
+                'price_diff': price_diff,
+                'profit_diff': profit_diff,
+                'current_margin': current_margin,
+                'target_margin': target_margin,
+                'current_price': current_price,
+                'target_price': target_price,
+                'current_profit': current_profit,
+                'target_profit': target_profit
+            }
+            summary, recommendations = self.feedback_messages(feedback_type, metrics)
+
             return {
                 'feedback_type': feedback_type,
                 'summary': summary,
                 'recommendations': recommendations,
-                'metrics': {
-                    'margin_diff': margin_diff,
-                    'price_diff': price_diff,
-                    'profit_diff': profit_diff,
-                    'current_margin': current_margin,
-                    'target_margin': target_margin,
-                    'current_price': current_price,
-                    'target_price': target_price,
-                    'current_profit': current_profit,
-                    'target_profit': target_profit
-                }
+                'metrics': metrics
             }
             
         except (ValueError, TypeError):
             return None
 
+    def feedback_messages(self, feedback_type, metrics):
+        """
+        Build the summary and recommendations for a feedback type
+        metrics: Dict with the metrics returned by generate_pricing_feedback
+        Returns (summary, recommendations)
+        """
+        if feedback_type == 'optimal':
+            return 'Your current pricing is well-aligned with your target margin!', [
+                'Current pricing strategy is optimal',
+                'Monitor competitor pricing to maintain position',
+                'Consider small price adjustments for seasonal demand'
+            ]
+        if feedback_type == 'increase_needed':
+            increase_pct = ((metrics['target_price'] / metrics['current_price'] - 1) * 100)
+            return f'Current pricing is below target. Consider increasing price by {increase_pct:.1f}% (${abs(metrics["price_diff"]):.2f})', [
+                f'Increase price to ${metrics["target_price"]:.2f} to reach target margin',
+                f'This would improve profit by ${abs(metrics["profit_diff"]):.2f} per unit',
+                'Test price increase gradually to gauge customer response',
+                'Highlight value proposition to justify higher price'
+            ]
+        return f'Current pricing exceeds target margin by {(metrics["margin_diff"] * 100):.1f}%', [
+            'Current pricing generates strong margins',
+            'Monitor for customer price sensitivity',
+            'Consider competitive positioning - are you pricing yourself out?',
+            f'Could reduce price by ${abs(metrics["price_diff"]):.2f} and still meet target'
+        ]
+
+    def classify_pricing(self, costs, current_prices, target_margins):
+        """
+        Classify many products' pricing against their target margins at once
+        Uses the same rules as generate_pricing_feedback, without building any text
+        (see feedback_messages for that)
+        Returns a DataFrame with feedback_type and the feedback metrics per product;
+        feedback_type is None (and the metrics NaN) where no feedback can be given
+        """
+        costs = np.asarray(costs, dtype=float)
+        current_prices = np.asarray(current_prices, dtype=float)
+        target_margins = np.broadcast_to(np.asarray(target_margins, dtype=float), costs.shape)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            current_margins = np.where(current_prices > 0, (current_prices - costs) / current_prices, np.nan)
+            target_prices = np.where(target_margins < 1, costs / (1 - target_margins), np.nan)
+        # A zero margin or target price gives no feedback, as in generate_pricing_feedback
+        valid = (np.nan_to_num(current_margins) != 0) & (np.nan_to_num(target_prices) != 0)
+
+        metrics = pd.DataFrame({
+            'margin_diff': current_margins - target_margins,
+            'price_diff': current_prices - target_prices,
+            'profit_diff': (current_prices - costs) - (target_prices - costs),
+            'current_margin': current_margins,
+            'target_margin': target_margins,
+            'current_price': current_prices,
+            'target_price': target_prices,
+            'current_profit': current_prices - costs,
+            'target_profit': target_prices - costs
+        })
+        metrics.loc[~valid] = np.nan
+
+        margin_diff = metrics['margin_diff'].to_numpy()
+        feedback_types = np.select(
+            [~valid, np.abs(margin_diff) < self.OPTIMAL_TOLERANCE, margin_diff < 0],
+            [None, 'optimal', 'increase_needed'],
+            'above_target'
+        )
+        metrics.insert(0, 'feedback_type', feedback_types)
+        return metrics
+
+    def bulk_pricing_feedback(self, products_data, target_margin=None):
+        """
+        Classify a whole price list against target margins
+        products_data: List of dicts or a DataFrame with 'cost' and 'current_price', and
+        optionally 'name' and a per-product 'target_margin' (default target_margin)
+        Values that are missing or not numbers give no feedback rather than an error
+        Returns the classify_pricing DataFrame with the product names in front
+        """
+        products = pd.DataFrame(products_data).reset_index(drop=True)
+        if target_margin is None and 'target_margin' not in products:
+            raise ValueError("target_margin is required")
+
+        def column(name, default=np.nan):
+            if name not in products:
+                return np.full(len(products), default, dtype=float)
+            return pd.to_numeric(products[name], errors='coerce').to_numpy(dtype=float)
+
+        target_margins = column('target_margin')
+        if target_margin is not None:
+            target_margins = np.where(np.isnan(target_margins), float(target_margin), target_margins)
+
+        feedback = self.classify_pricing(column('cost'), column('current_price'), target_margins)
+        names = products['name'].fillna('Unnamed') if 'name' in products else 'Unnamed'
+        feedback.insert(0, 'name', names)
+        return feedback
+
     def calculate_margin_from_price(self, cost, price):
         """
         Calculate margin given cost and price
@@ -169,6 +243,70 @@ class MarginCalculator:
         except (ValueError, ZeroDivisionError):
             return None
 
+    def sensitivity_grid(self, costs, current_prices=None, intelligent_range=True):
+        """
+        Perform sensitivity analysis for many products in one pass
+        costs: Array of product costs
+        current_prices: Optional array of current prices (0 or NaN where there is none)
+        Returns a long DataFrame with one block of rows per product, identified by
+        its position in costs, each with pricing at every margin level in the
+        product's range plus its current price row, sorted by margin.
+        Each product's range is adjusted as in perform_sensitivity_analysis.
+        """
+        costs = np.asarray(costs, dtype=float)
+        if current_prices is None:
+            current_prices = np.full(len(costs), np.nan)
+        current_prices = np.asarray(current_prices, dtype=float)
+        has_price = np.nan_to_num(current_prices) > 0
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            current_margins = np.where(has_price, (current_prices - costs) / current_prices, np.nan)
+
+            # Intelligent range adjustment: current margin plus a 5% buffer, within 5%-70%
+            min_margins = np.full(len(costs), self.min_margin)
+            max_margins = np.full(len(costs), self.max_margin)
+            if intelligent_range:
+                adjust = has_price & (current_margins != 0)
+                buffer = 0.05
+                min_margins = np.where(adjust, np.maximum(0.05, np.minimum(min_margins, current_margins - buffer)),
+                                       min_margins)
+                max_margins = np.where(adjust, np.minimum(0.70, np.maximum(max_margins, current_margins + buffer)),
+                                       max_margins)
+
+            # Margin ranges, laid end to end; the same values np.arange gives for each product
+            stops = max_margins + self.step_margin
+            counts = np.maximum(np.ceil((stops - min_margins) / self.step_margin), 0).astype(int)
+            steps = (min_margins + self.step_margin) - min_margins
+            products = np.repeat(np.arange(len(costs)), counts)
+            offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            margins = np.repeat(min_margins, counts) + offsets * np.repeat(steps, counts)
+
+            # Price = Cost / (1 - Margin), Markup = (Price - Cost) / Cost
+            cost = costs[products]
+            prices = np.where(margins < 1, cost / (1 - margins), np.nan)
+            markups = np.where(cost > 0, (prices - cost) / cost, np.nan)
+            is_current = has_price[products] & np.isclose(prices, current_prices[products], rtol=1e-3)
+
+            # Insert each current price row at its place in the product's margins
+            priced = np.flatnonzero(has_price)
+            current_markups = np.where(costs[priced] > 0,
+                                       (current_prices[priced] - costs[priced]) / costs[priced], np.nan)
+        key = np.dtype([('product', np.int64), ('margin', np.float64)])
+        grid_keys = np.rec.fromarrays([products, margins], dtype=key)
+        current_keys = np.rec.fromarrays([priced, current_margins[priced]], dtype=key)
+        positions = np.searchsorted(grid_keys, current_keys, side='right')
+
+        margins = np.insert(margins, positions, current_margins[priced])
+        prices = np.insert(prices, positions, current_prices[priced])
+        return pd.DataFrame({
+            'product': np.insert(products, positions, priced),
+            'margin': margins,
+            'markup': np.insert(markups, positions, current_markups),
+            'price': prices,
+            'profit': prices - np.insert(cost, positions, costs[priced]),
+            'is_current': np.insert(is_current, positions, True)
+        })
+
     def perform_sensitivity_analysis(self, cost, current_price=None, intelligent_range=True):
         """
         Perform sensitivity analysis across a range of margins
@@ -178,111 +316,100 @@ class MarginCalculator:
         """
         try:
             cost = float(cost)
+            current_prices = None
             if current_price:
-                current_price = float(current_price)
-
-            # Intelligent range adjustment
-            min_margin = self.min_margin
-            max_margin = self.max_margin
-            
-            if intelligent_range and current_price:
-                current_margin = self.calculate_margin_from_price(cost, current_price)
-                if current_margin:
-                    buffer = 0.05  # 5% buffer
-                    min_margin = min(min_margin, current_margin - buffer)
-                    max_margin = max(max_margin, current_margin + buffer)
-                    
-                    # Ensure reasonable bounds
-                    min_margin = max(0.05, min_margin)  # Minimum 5% margin
-                    max_margin = min(0.70, max_margin)  # Maximum 70% margin
-
-            # Generate margin range
-            margins = np.arange(min_margin, max_margin + self.step_margin, self.step_margin)
-
-            # Calculate for each margin
-            results = []
-            for margin in margins:
-                price = self.calculate_price_from_margin(cost, margin)
-                markup = self.calculate_markup_from_price(cost, price)
-                profit = price - cost
-
-                results.append({
-                    'margin': margin,
-                    'markup': markup,
-                    'price': price,
-                    'profit': profit,
-                    'is_current': False if current_price is None else
-                                 np.isclose(price, current_price, rtol=1e-3)
-                })
-
-            # Create DataFrame
-            df = pd.DataFrame(results)
-
-            # Add current price analysis if provided
-            if current_price:
-                current_margin = self.calculate_margin_from_price(cost, current_price)
-                current_markup = self.calculate_markup_from_price(cost, current_price)
-                current_profit = current_price - cost
-
-                current_row = pd.DataFrame([{
-                    'margin': current_margin,
-                    'markup': current_markup,
-                    'price': current_price,
-                    'profit': current_profit,
-                    'is_current': True
-                }])
+                current_prices = [float(current_price)]
 
-                df = pd.concat([df, current_row], ignore_index=True)
-
-                # Sort by margin
-                df = df.sort_values('margin')
-
-            return df
+            df = self.sensitivity_grid([cost], current_prices, intelligent_range)
+            return df.drop(columns='product')
         except ValueError:
             return None
 
-    def perform_batch_analysis(self, products_data):
+    # Margins priced by perform_batch_analysis unless others are given: 20%, 25%, 30%, 35%, 40%
+    BATCH_MARGINS = np.arange(0.20, 0.41, 0.05)
+
+    def price_matrix(self, costs, margins):
         """
-        Analyze multiple products at once
-        products_data: List of dicts with 'name', 'cost', and optionally 'current_price'
-        target_margin: Target margin to apply
+        Price and profit for N costs at M margins, by broadcasting
+        Price = Cost / (1 - Margin); margins of 100% or more give NaN
+        Returns (prices, profits) as N x M arrays
         """
-        results = []
+        costs = np.asarray(costs, dtype=float)[:, np.newaxis]
+        margins = np.asarray(margins, dtype=float)[np.newaxis, :]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            prices = np.where(margins < 1, costs / (1 - margins), np.nan)
+        return prices, prices - costs
 
-        for product in products_data:
-            name = product.get('name', 'Unnamed')
-            cost = float(product.get('cost', 0))
-            current_price = product.get('current_price')
+    def load_products(self, source, filename):
+        """
+        Read a product list from a CSV or Excel file for perform_batch_analysis
+        Column names are matched case-insensitively, with spaces as underscores;
+        'cost' is required, 'name' and 'current_price' (or 'price') are optional
+        """
+        if filename.lower().endswith('.csv'):
+            products = pd.read_csv(source)
+        elif filename.lower().endswith(('.xlsx', '.xls')):
+            products = pd.read_excel(source)
+        else:
+            raise ValueError("Products file must be a .csv, .xlsx or .xls file")
 
-            if current_price:
-                current_price = float(current_price)
-                current_margin = self.calculate_margin_from_price(cost, current_price)
-                current_markup = self.calculate_markup_from_price(cost, current_price)
-                current_profit = current_price - cost
-            else:
-                current_margin = None
-                current_markup = None
-                current_profit = None
-
-            # Target pricing at different margins
-            pricing_options = {}
-            for margin in np.arange(0.20, 0.41, 0.05):  # 20%, 25%, 30%, 35%, 40%
-                price = self.calculate_price_from_margin(cost, margin)
-                pricing_options[f"price_at_{int(margin*100)}pct"] = price
-                pricing_options[f"profit_at_{int(margin*100)}pct"] = price - cost
-
-            results.append({
-                'name': name,
-                'cost': cost,
-                'current_price': current_price,
-                'current_margin': current_margin,
-                'current_markup': current_markup,
-                'current_profit': current_profit,
-                **pricing_options
-            })
+        products.columns = [str(column).strip().lower().replace(' ', '_') for column in products.columns]
+        if 'current_price' not in products and 'price' in products:
+            products = products.rename(columns={'price': 'current_price'})
+        if 'cost' not in products:
+            raise ValueError("Products file must have a 'cost' column")
+        return products
 
-        # Convert to DataFrame
-        return pd.DataFrame(results)
+    def perform_batch_analysis(self, products_data, margins=None, form='wide'):
+        """
+        Analyze multiple products at once
+        products_data: List of dicts or a DataFrame with 'name', 'cost', and optionally 'current_price'
+        margins: Margins to price every product at (default BATCH_MARGINS)
+        form: 'wide' for one row per product with price_at_<n>pct and profit_at_<n>pct
+              columns, or 'long' for one row per product and margin
+        """
+        if form not in ('wide', 'long'):
+            raise ValueError("form must be 'wide' or 'long'")
+        margins = self.BATCH_MARGINS if margins is None else np.asarray(margins, dtype=float)
+
+        products = pd.DataFrame(products_data).reset_index(drop=True)
+        names = products['name'].fillna('Unnamed') if 'name' in products else pd.Series('Unnamed', index=products.index)
+        costs = pd.to_numeric(products['cost'] if 'cost' in products else pd.Series(0, index=products.index))
+        if costs.isna().any():
+            rows = ', '.join(str(row + 1) for row in np.flatnonzero(costs.isna())[:10])
+            raise ValueError(f"Missing or invalid cost in row(s) {rows}")
+        costs = costs.to_numpy(dtype=float)
+
+        # Current pricing, where a current price is given
+        current_prices = np.full(len(products), np.nan)
+        if 'current_price' in products:
+            given = products['current_price'].where(products['current_price'].astype(bool), np.nan)
+            current_prices = pd.to_numeric(given).to_numpy(dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            current_margins = np.where(current_prices > 0, (current_prices - costs) / current_prices, np.nan)
+            current_markups = np.where(costs > 0, (current_prices - costs) / costs, np.nan)
+
+        prices, profits = self.price_matrix(costs, margins)
+        result = pd.DataFrame({
+            'name': names.to_numpy(),
+            'cost': costs,
+            'current_price': current_prices,
+            'current_margin': current_margins,
+            'current_markup': current_markups,
+            'current_profit': current_prices - costs
+        })
+
+        if form == 'long':
+            result = result.loc[result.index.repeat(len(margins))].reset_index(drop=True)
+            return result.assign(margin=np.tile(margins, len(costs)),
+                                 price=prices.ravel(), profit=profits.ravel())
+
+        labels = [f"{round(margin * 100, 4):g}" for margin in margins]
+        columns = {}
+        for j, label in enumerate(labels):
+            columns[f"price_at_{label}pct"] = prices[:, j]
+            columns[f"profit_at_{label}pct"] = profits[:, j]
+        return pd.concat([result, pd.DataFrame(columns)], axis=1)
 
     def generate_report(self, data, file_path):
         """
@@ -0,0 +1,35 @@
+import os
+import sys
+
+from scenario_store import ScenarioStore, SCENARIOS_DB, deal_split_records, directory_records, multi_product_records
+
+# Legacy scenario files and the kind each one becomes in the scenario database
+SCENARIOS_FILE = "scenarios.json"
+DEAL_SPLIT_DB = SCENARIOS_DB
+SCENARIO_DIR = "scenarios"
+MULTI_PRODUCT_DIR = "scenarios/multi_product"
+DB_PATH = os.path.join(SCENARIO_DIR, SCENARIOS_DB)
+
+
+# Scenarios already in the database were saved or edited after these files were retired, so a
+# migration never overwrites them, and a kind that was already seeded is skipped so that
+# scenarios deleted since are not brought back (--force adds whatever is missing regardless)
+SOURCES = [
+    ("deal_split", lambda: deal_split_records(DEAL_SPLIT_DB, SCENARIOS_FILE)),
+    ("portfolio", lambda: directory_records(SCENARIO_DIR)),
+    ("multi_product", lambda: multi_product_records(MULTI_PRODUCT_DIR)),
+]
+
+
+def migrate_kind(db_path, kind, load, force=False):
+    count = ScenarioStore(db_path, kind=kind).seed(load, force=force)
+    print(f"Migrated {count} new {kind} scenarios into {db_path}")
+    return count
+
+
+def main(db_path=DB_PATH, force=False):
+    return {kind: migrate_kind(db_path, kind, load, force) for kind, load in SOURCES}
+
+
+if __name__ == "__main__":
+    main(force="--force" in sys.argv[1:])
@@ -5,8 +5,12 @@ Core backend implementation for the Python Flask app.
 """
 
 import os
-import json
+import time
 import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import numpy as np
 import pandas as pd
 from datetime import datetime
@@ -14,28 +18,118 @@ from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
 from openpyxl.chart import LineChart, Reference
-from scenario_utils import load_scenario_file, save_scenario_file, delete_scenario_file, list_scenario_files
+from scenario_store import ScenarioStore, SCENARIOS_DB, multi_product_records
 from logging_utils import setup_logging
 from excel_utils import get_title_font, get_header_font, get_header_fill, get_money_format, get_percent_format, apply_header_styles
 from api_utils import validate_numeric
+import roi_engine
+import allocation_solver
+from candidate_heap import IndexedHeap
+from optimization_history import HistoryRecorder, DEFAULT_CHECKPOINT_INTERVAL
+from roi_cache import LineItemCache
 import math
 
 # Set up logging
 setup_logging('logs/calculator.log')
 
+# Randomized starting allocations used by the multi-start optimizer by default, and at most
+DEFAULT_RANDOM_STARTS = 4
+MAX_RANDOM_STARTS = 32
+
+# Worker processes running multi-start seeds, shared by every request in the process
+MAX_MULTI_START_WORKERS = min(4, os.cpu_count() or 1)
+
+_seed_pool = None
+_seed_pool_lock = threading.Lock()
+
+
+def _get_seed_pool():
+    """
+    Return the shared multi-start pool, starting it on first use.
+
+    Workers are spawned rather than forked, because forking a multithreaded
+    web server can copy a lock that another thread is holding.
+    """
+    global _seed_pool
+    with _seed_pool_lock:
+        if _seed_pool is None:
+            _seed_pool = ProcessPoolExecutor(max_workers=MAX_MULTI_START_WORKERS,
+                                             mp_context=multiprocessing.get_context('spawn'))
+        return _seed_pool
+
+
+def _discard_seed_pool(pool):
+    """Forget a pool whose worker died, so the next request starts a fresh one."""
+    global _seed_pool
+    with _seed_pool_lock:
+        if _seed_pool is pool:
+            _seed_pool = None
+    pool.shutdown(wait=False)
+
+
+def _run_optimization_seed(seed_name, products, params):
+    """
+    Hill-climb from one starting allocation (runs in a worker process).
+
+    Args:
+        seed_name (str): Name of the starting allocation
+        products (list): Product dictionaries with the seed's bulk quantities
+        params (dict): Calculation parameters
+
+    Returns:
+        tuple: (seed name, run_iterations result, elapsed milliseconds)
+    """
+    start_time = time.perf_counter()
+    result = MultiProductBuyingCalculator().run_iterations(products, params)
+    return seed_name, result, (time.perf_counter() - start_time) * 1000
+
 class MultiProductBuyingCalculator:
     """
     Multi-Product Buying Calculator.
     Analyzes the ROI of purchasing multiple related products at bulk discount pricing.
     """
 
+    # Upper bounds on grid points x products evaluated by evaluate_grid, and on the
+    # grid points returned (every point carries one value per GRID_METRICS entry)
+    MAX_GRID_CELLS = 2_000_000
+    MAX_GRID_POINTS = 100_000
+
+    # Line item results shared by every calculator in this process
+    line_item_cache = LineItemCache()
+
     def __init__(self):
         """Initialize the calculator with default parameters."""
+        # Scenarios live in the shared scenario database; the old per-file directory seeds it
         self.scenarios_dir = "scenarios/multi_product"
-        os.makedirs(self.scenarios_dir, exist_ok=True)
+        legacy_dir = os.path.abspath(self.scenarios_dir)
+        self.scenario_store = ScenarioStore(os.path.join(os.path.dirname(legacy_dir), SCENARIOS_DB),
+                                            kind='multi_product', legacy=lambda: multi_product_records(legacy_dir))
         self.logger = logging.getLogger(__name__)
 
     def compute_line_item_roi(self, product, params):
+        """
+        Compute ROI metrics for a single product line item, memoized per process.
+
+        Results are cached in line_item_cache keyed by the product fields and
+        parameters the ROI model reads; see _compute_line_item_roi for the model.
+
+        Args:
+            product (dict): Product data
+            params (dict): Calculation parameters
+
+        Returns:
+            dict: ROI metrics
+        """
+        key = LineItemCache.make_key(
+            [product.get(field, 0) for field in roi_engine.ROI_INPUT_FIELDS] + list(roi_engine.roi_params(params))
+        )
+        return self.line_item_cache.get_or_compute(key, lambda: self._compute_line_item_roi(product, params))
+
+    def roi_cache_stats(self):
+        """Return hit/miss counters for the shared line item ROI cache."""
+        return self.line_item_cache.stats()
+
+    def _compute_line_item_roi(self, product, params):
         """
         Compute ROI metrics for a single product line item using linear depletion model.
 
@@ -71,31 +165,11 @@ class MultiProductBuyingCalculator:
 
             # Edge case: No velocity
             if annual_cases <= 0:
-                return {
-                    "avgInvSmall": 0,
-                    "avgInvBulk": 0,
-                    "deltaInvestment": 0,
-                    "savings": 0,
-                    "roi": 0,
-                    "annualizedRoi": 0,
-                    "dealCyclesPerYear": 0,
-                    "annualROIMultiplier": 0,
-                    "error": "Zero velocity"
-                }
+                return self._zero_velocity_metrics()
 
             # Edge case: No bulk cases
             if bulk_cases <= 0:
-                return {
-                    "avgInvSmall": 0,
-                    "avgInvBulk": 0,
-                    "deltaInvestment": 0,
-                    "savings": 0,
-                    "roi": 0,
-                    "annualizedRoi": 0,
-                    "smallDealCases": 0,
-                    "dealCyclesPerYear": 0,
-                    "annualROIMultiplier": 0
-                }
+                return self._no_bulk_metrics()
 
             # Calculate daily velocity
             daily_cases = annual_cases / 365  # V: Daily velocity in cases
@@ -224,6 +298,163 @@ class MultiProductBuyingCalculator:
                 "error": f"Calculation error: {str(e)}"
             }
 
+    @staticmethod
+    def _zero_velocity_metrics():
+        """Line item metrics for a product with no sales velocity."""
+        return {
+            "avgInvSmall": 0,
+            "avgInvBulk": 0,
+            "deltaInvestment": 0,
+            "savings": 0,
+            "roi": 0,
+            "annualizedRoi": 0,
+            "dealCyclesPerYear": 0,
+            "annualROIMultiplier": 0,
+            "error": "Zero velocity"
+        }
+
+    @staticmethod
+    def _no_bulk_metrics():
+        """Line item metrics for a product with no bulk cases allocated."""
+        return {
+            "avgInvSmall": 0,
+            "avgInvBulk": 0,
+            "deltaInvestment": 0,
+            "savings": 0,
+            "roi": 0,
+            "annualizedRoi": 0,
+            "smallDealCases": 0,
+            "dealCyclesPerYear": 0,
+            "annualROIMultiplier": 0
+        }
+
+    def compute_roi_columns(self, products, params, include_debug=False):
+        """
+        Compute ROI metrics for every product in one batched pass.
+
+        Products are packed into NumPy arrays and evaluated by roi_engine.
+        Products (or parameters) the vectorized path cannot handle, such as
+        non-numeric fields, fall back to compute_line_item_roi so the results
+        always match the scalar implementation.
+
+        Args:
+            products (list): List of product dictionaries
+            params (dict): Calculation parameters
+            include_debug (bool): Also compute the intermediate debug columns
+
+        Returns:
+            tuple: (input arrays, result columns). The result columns carry a
+                   'scalar' dict mapping row index -> scalar result for rows
+                   that were evaluated by the fallback path.
+        """
+        arrays, numeric = roi_engine.products_to_arrays(products)
+
+        if roi_engine.params_are_numeric(params):
+            columns = roi_engine.compute_roi_arrays(arrays, params, include_debug)
+        else:
+            columns = roi_engine.empty_roi_columns(len(products), include_debug)
+            numeric[:] = False
+
+        columns['scalar'] = {}
+        for i in np.flatnonzero(~numeric):
+            i = int(i)
+            result = self.compute_line_item_roi(products[i], params)
+            columns['scalar'][i] = result
+
+            status, values, warning = roi_engine.scalar_result_row(result)
+            columns['status'][i] = status
+            for name in roi_engine.METRIC_COLUMNS:
+                columns[name][i] = values[name]
+            columns['warning'][i] = warning
+
+        return arrays, columns
+
+    def compute_line_items(self, products, params, include_debug=False):
+        """
+        Batched equivalent of compute_line_item_roi for a list of products.
+
+        Args:
+            products (list): List of product dictionaries
+            params (dict): Calculation parameters
+            include_debug (bool): Include the per-product 'debug' payload
+
+        Returns:
+            list: ROI metrics dictionaries, one per product
+        """
+        _, columns = self.compute_roi_columns(products, params, include_debug)
+        return self._line_items_from_columns(products, params, columns, include_debug)
+
+    def _line_items_from_columns(self, products, params, columns, include_debug=False):
+        """Expand batched result columns into per-product metrics dictionaries."""
+        _, min_days_stock, deal_size_cases, small_deal_minimum = roi_engine.roi_params(params)
+
+        names = roi_engine.METRIC_COLUMNS + (roi_engine.DEBUG_COLUMNS if include_debug else ())
+        values = {name: columns[name].tolist() for name in names}
+        statuses = columns['status'].tolist()
+        warnings = columns['warning'].tolist()
+
+        results = []
+        for i, product in enumerate(products):
+            if i in columns['scalar']:
+                result = dict(columns['scalar'][i])
+                if not include_debug:
+                    result.pop('debug', None)
+                results.append(result)
+                continue
+
+            if statuses[i] == roi_engine.STATUS_ZERO_VELOCITY:
+                results.append(self._zero_velocity_metrics())
+                continue
+            if statuses[i] == roi_engine.STATUS_NO_BULK:
+                results.append(self._no_bulk_metrics())
+                continue
+
+            result = {
+                "smallDealCases": values['smallDealCases'][i],
+                "avgInvSmall": values['avgInvSmall'][i],
+                "avgInvBulk": values['avgInvBulk'][i],
+                "deltaInvestment": values['deltaInvestment'][i],
+                "savings": values['savings'][i],
+                "roi": values['roi'][i],
+                "annualizedRoi": values['annualizedRoi'][i],
+                "daysToDepleteBulk": values['daysToDepleteBulk'][i],
+                "totalStockDays": values['totalStockDays'][i],
+                "dealCyclesPerYear": values['dealCyclesPerYear'][i],
+                "annualROIMultiplier": values['annualROIMultiplier'][i]
+            }
+
+            if include_debug:
+                result["debug"] = {
+                    "dailyVelocity": values['dailyVelocity'][i],
+                    "Q2": product.get('bulk_quantity', 0),
+                    "Q1": int(values['smallDealCases'][i]),
+                    "daysQty": int(values['daysQty'][i]),
+                    "minDaysStock": min_days_stock,
+                    "smallDealMin": small_deal_minimum,
+                    "bulkDealMin": deal_size_cases,
+                    "casesSoldDuringTerms": values['casesSoldDuringTerms'][i],
+                    "smallCasesLeft": values['smallCasesLeft'][i],
+                    "bulkCasesLeft": values['bulkCasesLeft'][i],
+                    "smallDollarValue": values['smallDollarValue'][i],
+                    "bulkDollarValue": values['bulkDollarValue'][i],
+                    "avgDollarSmall": values['avgInvSmall'][i],
+                    "avgDollarBulk": values['avgInvBulk'][i],
+                    "savings": values['savings'][i],
+                    "deltaInv": values['deltaInvestment'][i],
+                    "avgInventoryCases": values['avgInventoryCases'][i],
+                    "dealCyclesPerYear": values['dealCyclesPerYear'][i],
+                    "annualROIMultiplier": values['annualROIMultiplier'][i],
+                    "daysToDepleteBulk": values['daysToDepleteBulk'][i],
+                    "daysAtRisk": values['daysAtRisk'][i]
+                }
+
+            if warnings[i]:
+                result["warning"] = f"Insufficient stock: {values['totalStockDays'][i]:.1f} days vs {min_days_stock} days required"
+
+            results.append(result)
+
+        return results
+
     def allocate_based_on_need(self, products, deal_size_cases, min_days_stock=30):
         """
         Allocate deal cases based on product needs, taking into account on-hand inventory.
@@ -426,6 +657,150 @@ class MultiProductBuyingCalculator:
             self.logger.error(f"Error in proportional allocation: {str(e)}")
             raise ValueError(f"Allocation error: {str(e)}")
 
+    def allocate_by_weights(self, products, weights, deal_size_cases):
+        """
+        Allocate deal cases in proportion to arbitrary per-product weights.
+
+        Uses the same floor-then-largest-remainder rounding as allocate_proportional.
+
+        Args:
+            products (list): List of product dictionaries
+            weights (list): Non-negative weight per product
+            deal_size_cases (int): Total number of cases in the deal
+
+        Returns:
+            list: Copies of the products with bulk_quantity assigned
+        """
+        weights = np.asarray(weights, dtype=float)
+        total_weight = weights.sum()
+        if not np.isfinite(total_weight) or total_weight <= 0:
+            raise ValueError("Allocation weights must sum to a positive number")
+
+        raw_cases = deal_size_cases * (weights / total_weight)
+        bulk_cases = np.floor(raw_cases).astype(int)
+        leftover = int(deal_size_cases - bulk_cases.sum())
+
+        # Distribute leftover cases by largest fractional part (stable for ties)
+        order = np.argsort(-(raw_cases - bulk_cases), kind='stable')
+        bulk_cases[order[:leftover]] += 1
+
+        return [dict(p, bulk_quantity=int(q)) for p, q in zip(products, bulk_cases)]
+
+    def build_seed_allocations(self, products, params):
+        """
+        Build the starting allocations for the multi-start optimizer.
+
+        Seeds are the allocation as received (when it fills the deal), proportional
+        to annual sales, need-based, ROI-ranked (sales weighted by each product's
+        rank on annualized ROI) and randomized sales-weighted splits.
+
+        Args:
+            products (list): List of product dictionaries
+            params (dict): Calculation parameters
+
+        Returns:
+            list: (seed name, products) tuples
+        """
+        deal_size_cases = int(params.get('dealSizeCases', 60))
+        random_starts = min(max(int(params.get('randomStarts', DEFAULT_RANDOM_STARTS)), 0), MAX_RANDOM_STARTS)
+        rng = np.random.default_rng(params.get('randomSeed', 0))
+        annual_cases = np.array([max(float(p.get('annual_cases', 0) or 0), 0.0) for p in products])
+
+        seeds = []
+        if sum(p.get('bulk_quantity', 0) or 0 for p in products) == deal_size_cases:
+            seeds.append(('current', [p.copy() for p in products]))
+
+        proportional = self.allocate_proportional(products, deal_size_cases)
+        seeds.append(('proportional', proportional))
+
+        # allocate_based_on_need moves zero-velocity products to the front; restore the input order
+        tagged = [dict(p, _seed_position=i) for i, p in enumerate(products)]
+        need_based = sorted(
+            self.allocate_based_on_need(tagged, deal_size_cases, params.get('minDaysStock', 30)),
+            key=lambda p: p['_seed_position']
+        )
+        for product in need_based:
+            product.pop('_seed_position', None)
+        seeds.append(('need', need_based))
+
+        # Rank products by annualized ROI if they took the whole deal; higher ranks get a larger share of sales
+        _, columns = self.compute_roi_columns([dict(p, bulk_quantity=deal_size_cases) for p in products], params)
+        rank_weights = np.empty(len(products))
+        rank_weights[np.argsort(-columns['annualizedRoi'], kind='stable')] = np.arange(len(products), 0, -1)
+        roi_weights = annual_cases * rank_weights
+        if roi_weights.sum() > 0:
+            seeds.append(('roi_ranked', self.allocate_by_weights(products, roi_weights, deal_size_cases)))
+
+        for k in range(random_starts):
+            random_weights = annual_cases * rng.random(len(products))
+            if random_weights.sum() > 0:
+                seeds.append((f"random_{k + 1}", self.allocate_by_weights(products, random_weights, deal_size_cases)))
+
+        return seeds
+
+    def run_multi_start(self, products, params):
+        """
+        Hill-climb from several starting allocations in parallel and keep the best.
+
+        Each seed runs run_iterations on the shared process pool, so wall-clock
+        time scales with the available cores rather than the number of seeds.
+
+        Args:
+            products (list): List of product dictionaries
+            params (dict): Calculation parameters ('maxWorkers', 'randomStarts'
+                and 'randomSeed' tune the search). maxWorkers is capped at
+                MAX_MULTI_START_WORKERS and 1 runs the seeds in this process;
+                randomStarts is capped at MAX_RANDOM_STARTS.
+
+        Returns:
+            dict: Best seed's optimization result plus a per-seed summary under 'multiStart'
+        """
+        try:
+            start_time = time.perf_counter()
+            seeds = self.build_seed_allocations(products, params)
+            max_workers = params.get('maxWorkers') or MAX_MULTI_START_WORKERS
+            max_workers = max(1, min(int(max_workers), MAX_MULTI_START_WORKERS, len(seeds)))
+
+            runs = []
+            if max_workers > 1:
+                pool = None
+                try:
+                    pool = _get_seed_pool()
+                    futures = [pool.submit(_run_optimization_seed, name, seed_products, params)
+                               for name, seed_products in seeds]
+                    runs = [future.result() for future in futures]
+                except (OSError, NotImplementedError, BrokenProcessPool) as e:
+                    if isinstance(e, BrokenProcessPool):
+                        _discard_seed_pool(pool)
+                    self.logger.warning(f"Process pool unavailable ({str(e)}), running seeds sequentially")
+                    max_workers = 1
+            if max_workers == 1:
+                runs = [_run_optimization_seed(name, seed_products, params) for name, seed_products in seeds]
+
+            # Best final annualized ROI wins; ties keep the earlier seed
+            best_name, best_result, _ = max(runs, key=lambda run: run[1]['finalAnnualizedROI'])
+            seed_summary = [{
+                'seed': name,
+                'initialAnnualizedROI': result['history'][0]['totalAnnualizedROI'],
+                'finalROI': result['finalROI'],
+                'finalAnnualizedROI': result['finalAnnualizedROI'],
+                'iterations': result['totalIterations'],
+                'elapsedMs': elapsed_ms
+            } for name, result, elapsed_ms in runs]
+
+            self.logger.info(f"Multi-start optimization finished: best seed {best_name} of {len(runs)} "
+                             f"(annualized ROI {best_result['finalAnnualizedROI']:.4f}) using {max_workers} workers")
+            return dict(best_result, multiStart={
+                'bestSeed': best_name,
+                'workers': max_workers,
+                'elapsedMs': (time.perf_counter() - start_time) * 1000,
+                'seeds': seed_summary
+            })
+
+        except Exception as e:
+            self.logger.error(f"Error in multi-start optimization: {str(e)}")
+            raise ValueError(f"Multi-start optimization error: {str(e)}")
+
     def run_iterations(self, products, params):
         """
         Run optimization iterations to improve ROI through case swaps.
@@ -442,7 +817,10 @@ class MultiProductBuyingCalculator:
             min_days_stock = params.get('minDaysStock', 30)
             payment_terms_days = params.get('paymentTermsDays', 30)
 
-            history = []
+            recorder = HistoryRecorder(
+                params.get('historyMode', 'full'),
+                params.get('historyCheckpointInterval', DEFAULT_CHECKPOINT_INTERVAL)
+            )
             iteration_count = 0
             max_iterations = 100 if iterations == 'auto' else int(iterations)
             improved = True
@@ -450,17 +828,40 @@ class MultiProductBuyingCalculator:
             # Deep copy products to avoid modifying the original
             current_products = [p.copy() for p in products]
 
+            # Evaluate the portfolio once; each swap then only re-evaluates the
+            # two products it touches and patches the running portfolio sums
+            arrays, columns = self.compute_roi_columns(current_products, params)
+            state = roi_engine.PortfolioState(
+                arrays, columns, params,
+                evaluate_fallback=lambda i, bulk: self.compute_line_item_roi(
+                    dict(current_products[i], bulk_quantity=bulk), params)
+            )
+
+            # Swap candidates are kept in heaps keyed by stable product IDs; ties go to
+            # the earliest product. The low heap only holds products with bulk cases > 1
+            # so we never reduce any product below 1 case.
+            product_keys = self._product_keys(current_products)
+            key_rows = {key: i for i, key in enumerate(product_keys)}
+            low_heap = IndexedHeap()
+            high_heap = IndexedHeap()
+
+            def update_candidates(i):
+                annualized_roi = float(state.columns['annualizedRoi'][i])
+                high_heap.update(product_keys[i], (-annualized_roi, i))
+                if state.arrays['bulk_quantity'][i] > 1:
+                    low_heap.update(product_keys[i], (annualized_roi, i))
+                else:
+                    low_heap.remove(product_keys[i])
+
+            for i in range(len(current_products)):
+                update_candidates(i)
+
             # Initial portfolio ROI calculation
-            portfolio_metrics = self.calculate_portfolio_roi(current_products, params)
+            portfolio_metrics = state.metrics()
             portfolio_annualized_roi = portfolio_metrics['roi'] * portfolio_metrics['annualROIMultiplier']
             self.logger.info(f"Initial portfolio ROI: {portfolio_metrics['roi']:.4f}, Annualized: {portfolio_annualized_roi:.4f}")
 
-            history.append({
-                'iteration': 0,
-                'totalROI': float(portfolio_metrics['roi']),
-                'totalAnnualizedROI': float(portfolio_annualized_roi),
-                'products': [p.copy() for p in current_products]
-            })
+            recorder.record(0, portfolio_metrics['roi'], portfolio_annualized_roi, current_products)
 
             # Run iterations
             while improved and iteration_count < max_iterations:
@@ -468,87 +869,48 @@ class MultiProductBuyingCalculator:
                 iteration_count += 1
                 self.logger.info(f"Starting iteration {iteration_count}")
 
-                # Find lowest and highest ROI products
-                lowest_roi_product = None
-                highest_roi_product = None
-                lowest_roi = float('inf')
-                highest_roi = float('-inf')
-
-                # Calculate ROI for each product
-                products_with_roi = []
-                for product in current_products:
-                    roi_metrics = self.compute_line_item_roi(product, params)
-                    annualized_roi = roi_metrics.get('annualizedRoi', 0)  # Use annualized ROI for optimization
-
-                    product_with_roi = product.copy()
-                    product_with_roi['annualizedRoi'] = annualized_roi
-                    products_with_roi.append(product_with_roi)
-
-                    # Track lowest annualized ROI (only for products with bulk cases > 1)
-                    # Ensure we don't reduce any product below 1 case
-                    if annualized_roi < lowest_roi and product.get('bulk_quantity', 0) > 1:
-                        lowest_roi = annualized_roi
-                        lowest_roi_product = product
-
-                    # Track highest annualized ROI (for any product that can accept more cases)
-                    # Remove the artificial annual_cases constraint - optimization should be based on ROI differences
-                    if annualized_roi > highest_roi:
-                        highest_roi = annualized_roi
-                        highest_roi_product = product
+                # Find lowest and highest annualized ROI products
+                # (annualized ROI is what the optimization works on)
+                low_index = key_rows[low_heap.peek()[1]] if low_heap else None
+                high_index = key_rows[high_heap.peek()[1]] if high_heap else None
+                annualized_rois = state.columns['annualizedRoi']
 
                 # Try a swap if we found candidates
-                if lowest_roi_product and highest_roi_product:
-                    self.logger.info(f"Attempting swap from {lowest_roi_product.get('product_name')} (Annualized ROI: {lowest_roi:.4f}) to {highest_roi_product.get('product_name')} (Annualized ROI: {highest_roi:.4f})")
-
-                    # Create test copies
-                    test_products = [p.copy() for p in current_products]
-
-                    # Find indexes of the products by matching product_name and other attributes
-                    low_index = None
-                    high_index = None
-
-                    for i, p in enumerate(test_products):
-                        if (p.get('product_name') == lowest_roi_product.get('product_name') and
-                            p.get('current_price') == lowest_roi_product.get('current_price') and
-                            p.get('bulk_price') == lowest_roi_product.get('bulk_price')):
-                            low_index = i
-                        if (p.get('product_name') == highest_roi_product.get('product_name') and
-                            p.get('current_price') == highest_roi_product.get('current_price') and
-                            p.get('bulk_price') == highest_roi_product.get('bulk_price')):
-                            high_index = i
-
-                    if low_index is None or high_index is None:
-                        self.logger.error("Could not find product indexes for swap")
-                        continue
-
-                    # Perform the swap
-                    test_products[low_index]['bulk_quantity'] -= 1
-                    test_products[high_index]['bulk_quantity'] += 1
-
-                    # Calculate new portfolio metrics (we no longer check minimum days stock here)
-                    new_portfolio_metrics = self.calculate_portfolio_roi(test_products, params)
+                if low_index is not None and high_index is not None:
+                    lowest_roi_product = current_products[low_index]
+                    highest_roi_product = current_products[high_index]
+                    self.logger.info(f"Attempting swap from {lowest_roi_product.get('product_name')} (Annualized ROI: {annualized_rois[low_index]:.4f}) to {highest_roi_product.get('product_name')} (Annualized ROI: {annualized_rois[high_index]:.4f})")
+
+                    # Score the swap incrementally (we no longer check minimum days stock here)
+                    new_portfolio_metrics, pending_move = state.score_move(low_index, high_index)
                     new_portfolio_annualized_roi = new_portfolio_metrics['roi'] * new_portfolio_metrics['annualROIMultiplier']
                     self.logger.info(f"New portfolio ROI after swap: {new_portfolio_metrics['roi']:.4f}, Annualized: {new_portfolio_annualized_roi:.4f}")
 
                     # Accept the swap if it improves the ANNUALIZED portfolio ROI
                     if new_portfolio_annualized_roi > portfolio_annualized_roi:
-                        current_products = test_products
+                        # Perform the swap
+                        current_products[low_index] = dict(lowest_roi_product, bulk_quantity=lowest_roi_product['bulk_quantity'] - 1)
+                        current_products[high_index] = dict(current_products[high_index], bulk_quantity=current_products[high_index]['bulk_quantity'] + 1)
+                        state.apply_move(pending_move)
+                        update_candidates(low_index)
+                        update_candidates(high_index)
+
                         portfolio_metrics = new_portfolio_metrics
                         portfolio_annualized_roi = new_portfolio_annualized_roi
                         improved = True
                         self.logger.info(f"Swap accepted - portfolio annualized ROI improved to {portfolio_annualized_roi:.4f}")
 
                         # Record this iteration
-                        history.append({
-                            'iteration': iteration_count,
-                            'totalROI': float(portfolio_metrics['roi']),
-                            'totalAnnualizedROI': float(portfolio_annualized_roi),
-                            'swapped': {
+                        recorder.record(
+                            iteration_count, portfolio_metrics['roi'], portfolio_annualized_roi, current_products,
+                            swap={
                                 'from': lowest_roi_product.get('product_name', ''),
-                                'to': highest_roi_product.get('product_name', '')
-                            },
-                            'products': [p.copy() for p in current_products]
-                        })
+                                'to': highest_roi_product.get('product_name', ''),
+                                'fromIndex': low_index,
+                                'toIndex': high_index,
+                                'cases': 1
+                            }
+                        )
                     else:
                         self.logger.info(f"Swap rejected - portfolio annualized ROI would decrease to {new_portfolio_annualized_roi:.4f}")
                 else:
@@ -562,7 +924,7 @@ class MultiProductBuyingCalculator:
             self.logger.info(f"Optimization completed after {iteration_count} iterations. Final ROI: {portfolio_metrics['roi']:.4f}, Annualized: {portfolio_annualized_roi:.4f}")
             return {
                 'products': current_products,
-                'history': history,
+                'history': recorder.history,
                 'totalIterations': iteration_count,
                 'finalROI': float(portfolio_metrics['roi']),
                 'finalAnnualizedROI': float(portfolio_annualized_roi)
@@ -572,6 +934,93 @@ class MultiProductBuyingCalculator:
             self.logger.error(f"Error in optimization: {str(e)}")
             raise ValueError(f"Optimization error: {str(e)}")
 
+    @staticmethod
+    def _product_keys(products):
+        """
+        Return a stable, unique key for each product.
+
+        Uses the client-supplied product 'id' when every product has a distinct
+        one, otherwise falls back to the product's position.
+        """
+        keys = [str(p['id']) if p.get('id') is not None else None for p in products]
+        if None in keys or len(set(keys)) != len(keys):
+            keys = [f"product-{i}" for i in range(len(products))]
+        return keys
+
+    def solve_allocation(self, products, params):
+        """
+        Solve the bulk case allocation directly instead of swapping one case at a time.
+
+        Finds the integer allocation that maximizes portfolio annualized ROI
+        subject to the cases summing to the deal size, non-negative cases, and
+        optional per-product 'min_bulk_quantity'/'max_bulk_quantity' bounds.
+
+        Args:
+            products (list): List of product dictionaries
+            params (dict): Calculation parameters
+
+        Returns:
+            dict: Updated products, history and solver report (optimality gap and solve time)
+        """
+        try:
+            deal_size_cases = params.get('dealSizeCases', 60)
+            if not roi_engine.is_number(deal_size_cases) or deal_size_cases <= 0 or deal_size_cases != int(deal_size_cases):
+                raise ValueError(f"Deal size must be a positive whole number of cases, got {deal_size_cases}")
+            deal_size_cases = int(deal_size_cases)
+
+            current_products = [p.copy() for p in products]
+            lower, upper = allocation_solver.allocation_bounds(current_products, deal_size_cases)
+            # Refuse oversized problems before building their contribution tables
+            allocation_solver.check_problem_size(lower, upper, deal_size_cases)
+
+            recorder = HistoryRecorder(
+                params.get('historyMode', 'full'),
+                params.get('historyCheckpointInterval', DEFAULT_CHECKPOINT_INTERVAL)
+            )
+            initial_metrics = self.calculate_portfolio_roi(current_products, params)
+            recorder.record(0, initial_metrics['roi'], initial_metrics['roi'] * initial_metrics['annualROIMultiplier'], current_products)
+
+            arrays, numeric = roi_engine.products_to_arrays(current_products)
+            tables = allocation_solver.contribution_tables(
+                arrays, numeric, params, lower, upper, deal_size_cases,
+                evaluate_fallback=lambda i, bulk: self.compute_line_item_roi(
+                    dict(current_products[i], bulk_quantity=bulk), params)
+            )
+            solution = allocation_solver.solve_allocation(tables, lower, upper, deal_size_cases)
+
+            for product, cases in zip(current_products, solution['allocation']):
+                product['bulk_quantity'] = int(cases)
+
+            portfolio_metrics = self.calculate_portfolio_roi(current_products, params)
+            portfolio_annualized_roi = portfolio_metrics['roi'] * portfolio_metrics['annualROIMultiplier']
+            recorder.record(solution['iterations'], portfolio_metrics['roi'], portfolio_annualized_roi, current_products)
+
+            self.logger.info(
+                f"Exact allocation solved in {solution['solveTimeMs']:.1f} ms "
+                f"({solution['iterations']} iterations), annualized ROI: {portfolio_annualized_roi:.4f}, "
+                f"gap: {solution['optimalityGap']}"
+            )
+            return {
+                'products': current_products,
+                'history': recorder.history,
+                'totalIterations': solution['iterations'],
+                'finalROI': float(portfolio_metrics['roi']),
+                'finalAnnualizedROI': float(portfolio_annualized_roi),
+                'solver': {
+                    'mode': 'exact',
+                    'optimalityGap': solution['optimalityGap'],
+                    'upperBound': solution['upperBound'],
+                    'solveTimeMs': solution['solveTimeMs'],
+                    'exact': solution['exact']
+                }
+            }
+
+        except allocation_solver.SolverLimitError:
+            raise
+        except Exception as e:
+            self.logger.error(f"Error in allocation solver: {str(e)}")
+            raise ValueError(f"Allocation solver error: {str(e)}")
+
     def check_min_days_stock(self, product, min_days_stock):
         """
         Check if a product meets minimum days stock requirement.
@@ -602,58 +1051,21 @@ class MultiProductBuyingCalculator:
         Returns:
             dict: Portfolio ROI metrics
         """
-        total_delta_investment = 0
-        total_savings = 0
-        total_annual_cases = 0
-        total_avg_inventory = 0
-        total_weighted_days_at_risk = 0
-        total_investment_for_weighting = 0
-
-        for product in products:
-            result = self.compute_line_item_roi(product, params)
-
-            if 'error' not in result:
-                delta_investment = result.get('deltaInvestment', 0)
-                savings = result.get('savings', 0)
-                days_at_risk = result.get('debug', {}).get('daysAtRisk', 0)
-                bulk_cases = product.get('bulk_quantity', 0)
-
-                total_delta_investment += delta_investment
-                total_savings += savings
-
-                # Collect data for portfolio deal cycles calculation (raw turnover)
-                annual_cases = product.get('annual_cases', 0)
-                on_hand_cases = product.get('on_hand', 0)
-
-                total_annual_cases += annual_cases
-                total_avg_inventory += (on_hand_cases + bulk_cases) / 2
-
-                # Weight days at risk by actual investment amounts for portfolio calculation
-                # This ensures the multiplier reflects true capital exposure
-                if delta_investment > 0 and days_at_risk > 0:
-                    total_weighted_days_at_risk += days_at_risk * delta_investment
-                    total_investment_for_weighting += delta_investment
-
-        # Calculate portfolio ROI
-        portfolio_roi = total_savings / total_delta_investment if total_delta_investment > 0 else 0
+        arrays, columns = self.compute_roi_columns(products, params)
+        return self._portfolio_from_columns(arrays, columns)
 
-        # Calculate portfolio deal cycles per year (raw inventory turnover, unadjusted)
-        portfolio_deal_cycles = total_annual_cases / total_avg_inventory if total_avg_inventory > 0 else 0
+    def _portfolio_from_columns(self, arrays, columns):
+        """
+        Aggregate batched line item columns into portfolio ROI metrics.
 
-        # Calculate investment-weighted average days at risk for portfolio
-        if total_investment_for_weighting > 0:
-            weighted_avg_days_at_risk = total_weighted_days_at_risk / total_investment_for_weighting
-            # Calculate annual ROI multiplier (after-terms) based on investment-weighted average exposure
-            portfolio_roi_multiplier = 365 / weighted_avg_days_at_risk if weighted_avg_days_at_risk > 0 else 0
-        else:
-            portfolio_roi_multiplier = 0
+        Args:
+            arrays (dict): Product input arrays from compute_roi_columns
+            columns (dict): Result columns from compute_roi_columns
 
-        return {
-            'roi': portfolio_roi,
-            'dealCyclesPerYear': portfolio_deal_cycles,
-            'annualROIMultiplier': portfolio_roi_multiplier,
-            'weightedAvgDaysAtRisk': weighted_avg_days_at_risk if total_investment_for_weighting > 0 else 0
-        }
+        Returns:
+            dict: Portfolio ROI metrics
+        """
+        return roi_engine.portfolio_from_columns(arrays, columns)
 
     def calculate(self, data):
         """
@@ -688,25 +1100,21 @@ class MultiProductBuyingCalculator:
                     products = self.allocate_based_on_need(products, params['dealSizeCases'], params['minDaysStock'])
                     break
 
-            # Calculate ROI metrics for each product
-            results = []
-            total_delta_investment = 0
-            total_savings = 0
-
-            for product in products:
-                metrics = self.compute_line_item_roi(product, params)
+            # Calculate ROI metrics for all products in one batched pass
+            include_debug = bool(data.get('includeDebug', False))
+            arrays, columns = self.compute_roi_columns(products, params, include_debug)
+            line_items = self._line_items_from_columns(products, params, columns, include_debug)
 
+            results = []
+            for product, metrics in zip(products, line_items):
                 product_copy = product.copy()
                 product_copy['metrics'] = metrics
-
                 results.append(product_copy)
 
-                if 'error' not in metrics:
-                    total_delta_investment += metrics.get('deltaInvestment', 0)
-                    total_savings += metrics.get('savings', 0)
-
-            # Calculate portfolio metrics
-            portfolio_metrics = self.calculate_portfolio_roi(products, params)
+            # Portfolio totals and metrics come from the same columns
+            portfolio_metrics = self._portfolio_from_columns(arrays, columns)
+            total_delta_investment = portfolio_metrics['totalDeltaInvestment']
+            total_savings = portfolio_metrics['totalSavings']
 
             return {
                 'products': results,
@@ -745,9 +1153,17 @@ class MultiProductBuyingCalculator:
             params.setdefault('minDaysStock', 30)
             params.setdefault('paymentTermsDays', 30)
             params.setdefault('iterations', 'auto')
+            params.setdefault('optimizationMode', 'iterative')
 
             # Run optimization
-            optimization_results = self.run_iterations(products, params)
+            if params['optimizationMode'] == 'exact':
+                optimization_results = self.solve_allocation(products, params)
+            elif params['optimizationMode'] == 'iterative':
+                optimization_results = self.run_iterations(products, params)
+            elif params['optimizationMode'] == 'multistart':
+                optimization_results = self.run_multi_start(products, params)
+            else:
+                raise ValueError(f"Unknown optimization mode: {params['optimizationMode']}")
 
             # Calculate final metrics
             optimized_data = {
@@ -766,13 +1182,83 @@ class MultiProductBuyingCalculator:
                 'portfolioROIMultiplier': calculation_results['portfolioROIMultiplier'],
                 'weightedAvgDaysAtRisk': calculation_results['weightedAvgDaysAtRisk'],
                 'history': optimization_results['history'],
-                'totalIterations': optimization_results['totalIterations']
+                'totalIterations': optimization_results['totalIterations'],
+                **{key: optimization_results[key] for key in ('solver', 'multiStart') if key in optimization_results}
             }
 
+        except allocation_solver.SolverLimitError:
+            raise
         except Exception as e:
             self.logger.error(f"Error in optimization: {str(e)}")
             raise ValueError(f"Optimization error: {str(e)}")
 
+    def evaluate_grid(self, data):
+        """
+        Evaluate portfolio ROI over a grid of parameter values in one batched pass.
+
+        Args:
+            data (dict): Dictionary containing products, base parameters, a 'grid'
+                mapping parameter names (dealSizeCases, paymentTermsDays,
+                minDaysStock, smallDealCases) to lists of values, and an optional
+                'rescaleAllocation' flag to rescale bulk quantities to each deal size
+
+        Returns:
+            dict: Grid axes, a matrix per portfolio metric and the elapsed time
+        """
+        try:
+            start_time = time.perf_counter()
+            products = data.get('products', [])
+            params = dict(data.get('parameters', {}))
+            grid = data.get('grid', {})
+            rescale_allocation = bool(data.get('rescaleAllocation', False))
+
+            if not products:
+                raise ValueError("No products provided")
+            if not grid:
+                raise ValueError("No grid parameters provided")
+
+            for name, values in grid.items():
+                if name not in roi_engine.GRID_PARAMETERS:
+                    raise ValueError(f"Unsupported grid parameter: {name}")
+                if not isinstance(values, list) or not values:
+                    raise ValueError(f"Grid values for {name} must be a non-empty list")
+                if not all(roi_engine.is_number(value) for value in values):
+                    raise ValueError(f"Grid values for {name} must be numeric")
+            if 'dealSizeCases' in grid and any(value <= 0 for value in grid['dealSizeCases']):
+                raise ValueError("Grid deal sizes must be greater than zero")
+            if rescale_allocation and any(value != int(value) for value in grid.get('dealSizeCases', [])):
+                raise ValueError("Grid deal sizes must be whole cases when rescaling the allocation")
+
+            points = math.prod(len(values) for values in grid.values())
+            if points > self.MAX_GRID_POINTS:
+                raise ValueError(f"Grid too large: {points} points exceeds {self.MAX_GRID_POINTS}")
+            if points * len(products) > self.MAX_GRID_CELLS:
+                raise ValueError(f"Grid too large: {points} points x {len(products)} products exceeds {self.MAX_GRID_CELLS} evaluations")
+
+            # The smallDealCases grid axis also overrides the legacy smallDealMinimum name
+            if 'smallDealCases' in grid:
+                params.pop('smallDealMinimum', None)
+            if not roi_engine.params_are_numeric(params):
+                raise ValueError("Base parameters must be numeric with a non-zero deal size")
+
+            arrays, numeric = roi_engine.products_to_arrays(products)
+            if not numeric.all():
+                bad = int(np.flatnonzero(~numeric)[0])
+                raise ValueError(f"Product {products[bad].get('product_name', bad + 1)} has non-numeric fields")
+
+            shape, metrics = roi_engine.evaluate_parameter_grid(arrays, params, grid, rescale_allocation)
+
+            return {
+                'axes': [{'name': name, 'values': list(values)} for name, values in grid.items()],
+                'shape': list(shape),
+                'metrics': {name: values.tolist() for name, values in metrics.items()},
+                'elapsedMs': (time.perf_counter() - start_time) * 1000
+            }
+
+        except Exception as e:
+            self.logger.error(f"Error evaluating parameter grid: {str(e)}")
+            raise ValueError(f"Grid evaluation error: {str(e)}")
+
     def save_scenario(self, data):
         """
         Save a scenario.
@@ -788,13 +1274,9 @@ class MultiProductBuyingCalculator:
             if not name:
                 raise ValueError("Scenario name is required")
 
-            # Ensure the scenarios directory exists
-            os.makedirs(self.scenarios_dir, exist_ok=True)
-
             # Save the scenario
-            scenario_path = os.path.join(self.scenarios_dir, f"{name}.json")
-            with open(scenario_path, 'w') as f:
-                json.dump(data, f, indent=2)
+            tags = data.get('tags')
+            self.scenario_store.save(name, data, tags if isinstance(tags, list) else None)
 
             return True
 
@@ -813,16 +1295,12 @@ class MultiProductBuyingCalculator:
             dict: Scenario data
         """
         try:
-            # Ensure the scenarios directory exists
-            os.makedirs(self.scenarios_dir, exist_ok=True)
-
             # Load the scenario
-            scenario_path = os.path.join(self.scenarios_dir, f"{name}.json")
-            if not os.path.exists(scenario_path):
+            scenario = self.scenario_store.get(name)
+            if scenario is None:
                 raise ValueError(f"Scenario '{name}' not found")
 
-            with open(scenario_path, 'r') as f:
-                return json.load(f)
+            return scenario
 
         except Exception as e:
             self.logger.error(f"Error loading scenario: {str(e)}")
@@ -836,14 +1314,8 @@ class MultiProductBuyingCalculator:
             list: List of scenario names
         """
         try:
-            # Ensure the scenarios directory exists
-            os.makedirs(self.scenarios_dir, exist_ok=True)
-
-            # List scenario files
-            scenario_files = [f for f in os.listdir(self.scenarios_dir) if f.endswith('.json')]
-            scenario_names = [os.path.splitext(f)[0] for f in scenario_files]
-
-            return scenario_names
+            # List scenario names from the index
+            return self.scenario_store.names()
 
         except Exception as e:
             self.logger.error(f"Error listing scenarios: {str(e)}")
@@ -860,15 +1332,10 @@ class MultiProductBuyingCalculator:
             bool: True if deleted successfully
         """
         try:
-            # Ensure the scenarios directory exists
-            os.makedirs(self.scenarios_dir, exist_ok=True)
-
             # Delete the scenario
-            scenario_path = os.path.join(self.scenarios_dir, f"{name}.json")
-            if not os.path.exists(scenario_path):
+            if not self.scenario_store.delete(name):
                 raise ValueError(f"Scenario '{name}' not found")
 
-            os.remove(scenario_path)
             return True
 
         except Exception as e:
@@ -0,0 +1,115 @@
+"""
+Optimization history recording for the multi-product buying calculator.
+
+In 'full' mode every history entry carries a snapshot of all products. In
+'compact' mode entries only carry the swap that was made (product positions
+and case count) plus a 'checkpoint' list of bulk quantities every few swaps,
+so the history grows with the number of swaps rather than swaps × products.
+reconstruct_allocations and reconstruct_products replay a compact history.
+"""
+
+HISTORY_MODES = ('full', 'compact')
+DEFAULT_CHECKPOINT_INTERVAL = 25
+
+
+class HistoryRecorder:
+    """Builds the optimizer history list in the requested mode."""
+
+    def __init__(self, mode='full', checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL):
+        """
+        Args:
+            mode (str): 'full' or 'compact'
+            checkpoint_interval (int): Swaps between checkpoints in compact mode
+        """
+        if mode not in HISTORY_MODES:
+            raise ValueError(f"Unknown history mode: {mode}")
+        if int(checkpoint_interval) < 1:
+            raise ValueError(f"History checkpoint interval must be at least 1, got {checkpoint_interval}")
+
+        self.mode = mode
+        self.checkpoint_interval = int(checkpoint_interval)
+        self.history = []
+        self._swaps_since_checkpoint = 0
+
+    def record(self, iteration, portfolio_roi, annualized_roi, products, swap=None):
+        """
+        Append a history entry.
+
+        Args:
+            iteration (int): Iteration number
+            portfolio_roi (float): Portfolio ROI after the iteration
+            annualized_roi (float): Portfolio annualized ROI after the iteration
+            products (list): Current product dictionaries
+            swap (dict): Optional swap made in this iteration, with 'from'/'to'
+                product names, 'fromIndex'/'toIndex' positions and 'cases'
+        """
+        entry = {
+            'iteration': iteration,
+            'totalROI': float(portfolio_roi),
+            'totalAnnualizedROI': float(annualized_roi)
+        }
+
+        if self.mode == 'full':
+            if swap is not None:
+                entry['swapped'] = {'from': swap['from'], 'to': swap['to']}
+            entry['products'] = [p.copy() for p in products]
+        else:
+            if swap is not None:
+                entry['swapped'] = dict(swap)
+                self._swaps_since_checkpoint += 1
+            if swap is None or self._swaps_since_checkpoint >= self.checkpoint_interval:
+                entry['checkpoint'] = [p.get('bulk_quantity', 0) for p in products]
+                self._swaps_since_checkpoint = 0
+
+        self.history.append(entry)
+
+
+def reconstruct_allocations(history):
+    """
+    Replay a history into the bulk quantities after each entry.
+
+    Works for both modes: full entries carry product snapshots, compact
+    entries carry checkpoints or swap deltas applied to the previous entry.
+
+    Args:
+        history (list): History entries from an optimization run
+
+    Returns:
+        list: One list of bulk quantities per history entry
+    """
+    allocations = []
+    current = None
+
+    for entry in history:
+        if 'products' in entry:
+            current = [p.get('bulk_quantity', 0) for p in entry['products']]
+        elif 'checkpoint' in entry:
+            current = list(entry['checkpoint'])
+        elif current is None:
+            raise ValueError(f"History entry {entry.get('iteration')} has no checkpoint to replay from")
+        else:
+            swap = entry.get('swapped') or {}
+            current = list(current)
+            if 'fromIndex' in swap and 'toIndex' in swap:
+                cases = swap.get('cases', 1)
+                current[swap['fromIndex']] -= cases
+                current[swap['toIndex']] += cases
+        allocations.append(current)
+
+    return allocations
+
+
+def reconstruct_products(products, history, position=-1):
+    """
+    Rebuild the product list as of one history entry.
+
+    Args:
+        products (list): Product dictionaries the optimization started from
+        history (list): History entries from an optimization run
+        position (int): Index into history (defaults to the last entry)
+
+    Returns:
+        list: Product dictionaries with the bulk quantities at that entry
+    """
+    allocation = reconstruct_allocations(history)[position]
+    return [dict(p, bulk_quantity=q) for p, q in zip(products, allocation)]
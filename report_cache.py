@@ -0,0 +1,212 @@
+"""
+Content-addressed on-disk cache of generated AP reports.
+
+Reports are keyed by a SHA-256 of the uploaded workbook's bytes plus the
+processing options, so uploading the same aging export again (or clicking
+View Sample Report twice) reuses the finished workbook instead of processing
+it again. Entries live in reports/cache as "<key> <report filename>" and are
+evicted least recently used first once the cache grows past its size limit;
+a hit refreshes the entry's modification time, which serves as the LRU clock.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+# ioctl request that clones a file's extents (copy-on-write) on Linux filesystems such as Btrfs and XFS
+FICLONE = 0x40049409
+
+
+def _reflink(source, destination):
+    """Clone source into a new destination file; raises OSError where reflinks are not supported."""
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError("reflinks are not supported on this platform")
+
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+
+def file_digest(file_path):
+    """
+    Returns:
+        str: Hex SHA-256 of the file's bytes
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def link_or_copy(source, destination, reflink=False):
+    """
+    Make destination share source's data, copying only when that is not possible.
+
+    With reflink=True a copy-on-write clone is tried first, which is safe
+    even if source is later modified in place. Otherwise (or where clones
+    are unsupported) a hardlink is made, and a plain copy is the last
+    resort. The new file is created under a temporary name and moved into
+    place, so readers never see a partial file and an existing destination
+    is replaced atomically.
+
+    Returns:
+        str: 'reflink', 'hardlink' or 'copy'
+    """
+    directory, name = os.path.split(destination)
+    temp_path = os.path.join(directory, f".{uuid.uuid4().hex}.{name}")
+    try:
+        method = None
+        if reflink:
+            try:
+                _reflink(source, temp_path)
+                method = 'reflink'
+            except OSError:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+        if method is None:
+            try:
+                os.link(source, temp_path)
+                method = 'hardlink'
+            except OSError:
+                shutil.copy2(source, temp_path)
+                method = 'copy'
+        os.replace(temp_path, destination)
+        return method
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+class ReportCache:
+    """Size-bounded LRU cache of report workbooks keyed by content hash."""
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Args:
+            directory (str): Folder holding the cached reports
+            max_bytes (int): Total size of cached reports before eviction
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(file_path, options, digest=None):
+        """
+        Hash a workbook's bytes together with its processing options.
+
+        Args:
+            file_path (str): Uploaded workbook
+            options (dict): JSON-serializable options that affect the report
+            digest (str): The file's file_digest, if already computed
+
+        Returns:
+            str: Hex SHA-256 digest
+        """
+        if digest is None:
+            digest = file_digest(file_path)
+        key = hashlib.sha256(digest.encode('utf-8'))
+        key.update(json.dumps(options, sort_keys=True).encode('utf-8'))
+        return key.hexdigest()
+
+    def _scan(self):
+        """List the cache folder, recreating it if it has been removed."""
+        os.makedirs(self.directory, exist_ok=True)
+        return os.scandir(self.directory)
+
+    def _entries(self):
+        """Return (path, key, filename, size, mtime) for every cached report."""
+        entries = []
+        for entry in self._scan():
+            if entry.name.startswith('.') or ' ' not in entry.name or not entry.is_file():
+                continue
+            key, filename = entry.name.split(' ', 1)
+            stat = entry.stat()
+            entries.append((entry.path, key, filename, stat.st_size, stat.st_mtime))
+        return entries
+
+    def get(self, key):
+        """
+        Look up a cached report.
+
+        Returns:
+            tuple: (cached path, report filename), or None on a miss
+        """
+        with self._lock:
+            prefix = f"{key} "
+            for entry in self._scan():
+                if entry.name.startswith(prefix) and entry.is_file():
+                    # Refresh the LRU clock
+                    now = time.time()
+                    os.utime(entry.path, (now, now))
+                    self.hits += 1
+                    return entry.path, entry.name[len(prefix):]
+            self.misses += 1
+            return None
+
+    def put(self, key, report_path, filename=None):
+        """
+        Store a finished report and evict old entries beyond max_bytes.
+
+        Args:
+            key (str): Key from make_key
+            report_path (str): Generated report
+            filename (str): Report filename get() returns (defaults to report_path's)
+        """
+        cached_path = os.path.join(self.directory, f"{key} {filename or os.path.basename(report_path)}")
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            link_or_copy(report_path, cached_path)
+            now = time.time()
+            os.utime(cached_path, (now, now))
+            self._evict()
+
+    def _evict(self):
+        """Remove least recently used entries until the cache fits. Caller holds the lock."""
+        entries = sorted(self._entries(), key=lambda entry: entry[4])
+        total = sum(entry[3] for entry in entries)
+        # Never evict the newest entry, even if it alone exceeds the limit
+        for path, _, _, size, _ in entries[:-1]:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        """Remove every cached report and reset the counters."""
+        with self._lock:
+            for path, _, _, _, _ in self._entries():
+                os.remove(path)
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        Returns:
+            dict: hits, misses, entries, bytes and maxBytes
+        """
+        with self._lock:
+            entries = self._entries()
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(entries),
+                'bytes': sum(entry[3] for entry in entries),
+                'maxBytes': self.max_bytes
+            }
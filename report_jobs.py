@@ -0,0 +1,140 @@
+"""
+Background jobs for AP report generation.
+
+/upload hands each report to a ReportJobQueue instead of processing it in the
+request thread. A small worker pool runs APReportProcessor.generate_report and
+records which stage each job is in, so the success page can poll /jobs/<id>
+and concurrent uploads do not block each other.
+
+Workers are threads: the processor spends most of its time in pandas and file
+I/O, and threads can share the queue's job table without pickling processors.
+"""
+
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_WORKERS = 2
+# Finished jobs kept for polling before the oldest are forgotten
+MAX_FINISHED_JOBS = 200
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+
+class ReportJobQueue:
+    """Runs report processors on a worker pool and tracks their progress."""
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, max_finished=MAX_FINISHED_JOBS):
+        """
+        Args:
+            max_workers (int): Reports processed at the same time
+            max_finished (int): Finished jobs kept for polling
+        """
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='report-job')
+        self._jobs = OrderedDict()
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def submit(self, processor):
+        """
+        Queue a report for generation.
+
+        Args:
+            processor (APReportProcessor): Processor for the uploaded file
+
+        Returns:
+            str: Job ID to poll with get()
+        """
+        job_id = uuid.uuid4().hex
+        stages = list(processor.REPORT_STAGES)
+        with self._lock:
+            self._jobs[job_id] = {
+                'id': job_id,
+                'status': JOB_QUEUED,
+                'stage': None,
+                'stages': stages,
+                'progress': 0.0,
+                'timings': {},
+                'submittedAt': time.time(),
+                'startedAt': None,
+                'finishedAt': None,
+                'filename': None,
+                'cached': False,
+                'error': None
+            }
+            self._prune()
+            self._futures[job_id] = self._executor.submit(self._run, job_id, processor)
+        return job_id
+
+    def get(self, job_id):
+        """
+        Return a snapshot of a job.
+
+        Returns:
+            dict: Job fields, or None for an unknown job
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            snapshot = dict(job, stages=list(job['stages']), timings=dict(job['timings']))
+
+        snapshot['elapsedMs'] = None
+        if snapshot['startedAt'] is not None:
+            end = snapshot['finishedAt'] or time.time()
+            snapshot['elapsedMs'] = (end - snapshot['startedAt']) * 1000
+        return snapshot
+
+    def wait(self, job_id, timeout=None):
+        """
+        Block until a job finishes.
+
+        Returns:
+            dict: The finished job snapshot, or None for an unknown job
+        """
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None:
+            future.result(timeout=timeout)
+        return self.get(job_id)
+
+    def shutdown(self, wait=True):
+        """Stop accepting jobs and, by default, wait for running ones."""
+        self._executor.shutdown(wait=wait)
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+
+    def _run(self, job_id, processor):
+        stages = processor.REPORT_STAGES
+        self._update(job_id, status=JOB_RUNNING, startedAt=time.time())
+
+        def progress(stage):
+            self._update(job_id, stage=stage, progress=stages.index(stage) / len(stages),
+                         timings=dict(processor.timings))
+
+        try:
+            output_path = processor.generate_report(progress=progress)
+            self._update(job_id, status=JOB_DONE, stage=None, progress=1.0, timings=dict(processor.timings),
+                         filename=os.path.basename(output_path), cached=processor.cache_hit,
+                         finishedAt=time.time())
+        except Exception as e:
+            self._update(job_id, status=JOB_FAILED, timings=dict(processor.timings),
+                         error=str(e), finishedAt=time.time())
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond max_finished. Caller holds the lock."""
+        finished = [job_id for job_id, job in self._jobs.items() if job['status'] in (JOB_DONE, JOB_FAILED)]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+            self._futures.pop(job_id, None)
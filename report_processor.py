@@ -3,8 +3,13 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import re
-import shutil
+import time
+import uuid
+from itertools import chain, islice
 from pathlib import Path
+import openpyxl
+from report_cache import file_digest, link_or_copy
+from backup_store import BackupStore
 
 class APReportProcessor:
     """
@@ -17,23 +22,110 @@ class APReportProcessor:
     SHEET_VENDOR_SUBTOTALS = "VendorSubtotals"
     SHEET_WEEKLY_SUMMARY = "WeeklySummary"
 
-    def __init__(self, file_path):
-        """Initialize the processor with the source file path."""
+    # Rows scanned for the report title, "As of" date and header row
+    HEADER_SCAN_ROWS = 5
+    # AP Aging exports put the column headers on row 5 (index 4)
+    AP_HEADER_ROW = 4
+    # Data rows collected per chunk while streaming the source sheet
+    INGEST_CHUNK_ROWS = 10000
+    # Stages reported to generate_report progress callbacks, in order
+    REPORT_STAGES = ('ingest', 'bucket', 'vendor_subtotals', 'write')
+    # Weeks after next Monday that get their own subtotal
+    DEFAULT_FORWARD_WEEKS = 4
+    # A year of week buckets; each one is a subtotal group and a column in the reports
+    MAX_FORWARD_WEEKS = 52
+    # Stream report rows to disk instead of holding the whole workbook in memory
+    CONSTANT_MEMORY_OUTPUT = True
+    # Rows sampled when estimating column widths, and the widest column allowed
+    WIDTH_SAMPLE_ROWS = 1000
+    MAX_COLUMN_WIDTH = 50
+    # Bump when the report layout changes so cached reports are not reused
+    REPORT_FORMAT_VERSION = 1
+
+    def __init__(self, file_path, forward_weeks=None, cache=None, backup_store=None, remove_source=False):
+        """
+        Initialize the processor with the source file path.
+
+        Args:
+            file_path (str): Path to the AP Aging Excel file
+            forward_weeks (int): Weeks after next Monday that get their own
+                subtotal (defaults to DEFAULT_FORWARD_WEEKS, at most MAX_FORWARD_WEEKS)
+            cache (ReportCache): Optional cache of finished reports, keyed by
+                the file's bytes and the processing options
+            backup_store (BackupStore): Where source files are backed up
+                (defaults to a 'backups' folder next to the file)
+            remove_source (bool): Delete the source file once generate_report
+                finishes, whether or not it succeeded (for uploads, whose
+                copy lives on in the backup store)
+        """
+        if forward_weeks is None:
+            forward_weeks = self.DEFAULT_FORWARD_WEEKS
+        if int(forward_weeks) < 1:
+            raise ValueError(f"Forward weeks must be at least 1, got {forward_weeks}")
+        if int(forward_weeks) > self.MAX_FORWARD_WEEKS:
+            raise ValueError(f"Forward weeks must be at most {self.MAX_FORWARD_WEEKS}, got {forward_weeks}")
+
         self.file_path = file_path
+        self.forward_weeks = int(forward_weeks)
         self.source_date = None
         self.next_monday = None
         self.output_file = None
+        # Reports are named by their As-of date; this suffix keeps each processor's file
+        # apart from other jobs (or cache hits) for the same date
+        self.report_id = uuid.uuid4().hex[:12]
+        self.timings = {}
+        self.cache = cache
+        if backup_store is None:
+            backup_store = BackupStore(os.path.join(os.path.dirname(os.path.abspath(file_path)), 'backups'))
+        self.backup_store = backup_store
+        self.remove_source = remove_source
+        self.backup = None
+        self._digest = None
+        self.cache_hit = False
+        self.source_date_found = False
+        # Row positions of the subtotal rows in the WeeklyBill sheet
+        self.subtotal_rows = np.array([], dtype=int)
+        # Column widths per frame, keyed by id(frame)
+        self._width_cache = {}
+
+    def generate_report(self, progress=None):
+        """
+        Main method to generate the AP weekly report.
 
-    def generate_report(self):
-        """Main method to generate the AP weekly report."""
+        Args:
+            progress (callable): Optional callback, called as progress(stage)
+                as each of REPORT_STAGES starts. Stage durations are recorded
+                in self.timings (milliseconds).
+
+        Returns:
+            str: Path of the generated report
+        """
+        self.timings = {}
+        self._progress = progress
+        self._stage = None
+        self.cache_hit = False
         try:
             # Create a backup of the original file
             self._create_backup()
 
-            # Load the source data
-            self.src_wb = pd.ExcelFile(self.file_path)
+            # Reuse a finished report for the same file and options
+            cache_key = None
+            if self.cache is not None:
+                lookup_started = time.perf_counter()
+                cache_key = self.cache.make_key(self.file_path, self._cache_options(), digest=self._file_digest())
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    cached_path, filename = cached
+                    output_path = os.path.join('reports', self._output_filename(filename))
+                    link_or_copy(cached_path, output_path)
+                    self.cache_hit = True
+                    self.timings['cache'] = (time.perf_counter() - lookup_started) * 1000
+                    print(f"Reusing cached report: {output_path}")
+                    return output_path
+                self.timings['cache'] = (time.perf_counter() - lookup_started) * 1000
 
             # Find and load the raw data sheet
+            self._start_stage('ingest')
             self._find_source_sheet()
 
             # Calculate next Monday based on source date
@@ -42,17 +134,27 @@ class APReportProcessor:
             # Create weekly bill report
             weekly_bill_df = self._create_weekly_bill()
 
-            # Insert subtotals by week
-            weekly_bill_df = self._insert_subtotals(weekly_bill_df)
+            # Assign every bill to a payment week
+            self._start_stage('bucket')
+            bills, buckets = self._build_week_buckets(weekly_bill_df)
 
-            # Create vendor subtotals
-            vendor_subtotals_df = self._create_vendor_subtotals(weekly_bill_df)
+            # Insert subtotals by week
+            weekly_bill_df = self._insert_subtotals(bills, buckets)
 
-            # Create weekly summary
-            weekly_summary_df = self._create_weekly_summary(weekly_bill_df)
+            # Create vendor subtotals and the weekly summary
+            self._start_stage('vendor_subtotals')
+            vendor_subtotals_df = self._create_vendor_subtotals(buckets)
+            weekly_summary_df = self._create_weekly_summary(buckets)
 
             # Save the complete report
-            return self._save_report_as(weekly_bill_df, vendor_subtotals_df, weekly_summary_df)
+            self._start_stage('write')
+            output_path = self._save_report_as(weekly_bill_df, vendor_subtotals_df, weekly_summary_df)
+            self._start_stage(None)
+
+            # Reports dated from the clock (no "As of" line) would go stale, so only dated reports are cached
+            if cache_key is not None and self.source_date_found:
+                self.cache.put(cache_key, output_path, filename=self._report_name())
+            return output_path
 
         except Exception as e:
             print(f"ERROR IN GENERATE_REPORT: {str(e)}")
@@ -60,114 +162,205 @@ class APReportProcessor:
             traceback.print_exc()
             raise Exception(f"Error generating report: {str(e)}")
 
+        finally:
+            if self.remove_source:
+                self._remove_source()
+
+    def _remove_source(self):
+        try:
+            os.remove(self.file_path)
+        except FileNotFoundError:
+            pass
+
+    def _cache_options(self):
+        """Options that change the generated report, for the cache key."""
+        return {'forwardWeeks': self.forward_weeks, 'formatVersion': self.REPORT_FORMAT_VERSION}
+
+    def _start_stage(self, stage):
+        """Close the timing of the current stage and start the next one (None ends the last stage)."""
+        now = time.perf_counter()
+        if self._stage is not None:
+            self.timings[self._stage] = (now - self._stage_started) * 1000
+        self._stage = stage
+        self._stage_started = now
+        if stage is not None and self._progress is not None:
+            self._progress(stage)
+
     def _create_backup(self):
-        """Creates a backup of the source file."""
-        src_path = Path(self.file_path)
-        backup_folder = src_path.parent
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_name = f"{src_path.stem}_Backup_{timestamp}{src_path.suffix}"
-        backup_path = backup_folder / backup_name
+        """
+        Creates a backup of the source file in the backup store.
 
+        The store keeps one backup per distinct file (cloned or hardlinked
+        where possible); its cost is recorded as the 'backup' timing.
+        """
+        backup_started = time.perf_counter()
         try:
-            shutil.copy2(self.file_path, backup_path)
-            print(f"Backup created at: {backup_path}")
+            backup = self.backup_store.store(self.file_path, digest=self._file_digest())
+            self.backup = backup
+            print(f"Backup {'reused' if backup['method'] == 'existing' else 'created'} at: {backup['path']} ({backup['method']})")
         except Exception as e:
             print(f"Warning: Could not create backup. {str(e)}")
+        self.timings['backup'] = (time.perf_counter() - backup_started) * 1000
+
+    def _file_digest(self):
+        """SHA-256 of the source file, computed once and shared by the backup store and report cache."""
+        if self._digest is None:
+            self._digest = file_digest(self.file_path)
+        return self._digest
 
     def _find_source_sheet(self):
-        """Finds the appropriate source sheet in the workbook."""
-        # Check if RawData sheet exists
-        if self.SHEET_RAW_DATA in self.src_wb.sheet_names:
-            self.src_sheet = self.SHEET_RAW_DATA
-        else:
-            # Try to find a sheet with "aging detail report" in the first few rows
-            found = False
-            for sheet in self.src_wb.sheet_names:
-                df = pd.read_excel(self.src_wb, sheet_name=sheet, nrows=5)  # Read up to 5 rows to find header
-                sheet_found = False
-                for _, row in df.iterrows():
-                    for val in row:
-                        if isinstance(val, str) and "aging detail report" in val.lower():
-                            self.src_sheet = sheet
-                            found = True
-                            sheet_found = True
-                            break
-                    if sheet_found:
+        """
+        Finds the appropriate source sheet and loads it in a single pass.
+
+        The sheet is streamed row by row: the first rows give the "As of" date
+        and the header row, and the remaining rows are collected into
+        self.src_data.
+        """
+        sheet_names, read_rows, close = self._open_workbook()
+        try:
+            # Check if RawData sheet exists
+            if self.SHEET_RAW_DATA in sheet_names:
+                self.src_sheet = self.SHEET_RAW_DATA
+            else:
+                # Try to find a sheet with "aging detail report" in the first few rows,
+                # otherwise use the first sheet
+                self.src_sheet = sheet_names[0]
+                for sheet in sheet_names:
+                    if any(isinstance(val, str) and "aging detail report" in val.lower()
+                           for row in read_rows(sheet, self.HEADER_SCAN_ROWS + 1) for val in row):
+                        self.src_sheet = sheet
                         break
-                if sheet_found:
-                    break
 
-            # If no matching sheet found, use the first sheet
-            if not found:
-                self.src_sheet = self.src_wb.sheet_names[0]
+            print(f"Selected source sheet: {self.src_sheet}")
+            self._ingest_rows(read_rows(self.src_sheet))
+        finally:
+            close()
 
-        print(f"Selected source sheet: {self.src_sheet}")
+        # Print the final columns we're using
+        print(f"\nFinal column set: {self.src_data.columns.tolist()}")
+        print(f"Loaded {len(self.src_data)} rows, source date {self.source_date}")
 
-        # Let's check both ways - first try reading file with both header options and print columns
-        # Try reading with headers in row 5 (index 4)
-        try:
-            df_header4 = pd.read_excel(self.src_wb, sheet_name=self.src_sheet, header=4)
-            print(f"Header row 5 (index 4) columns: {df_header4.columns.tolist()}")
+    def _open_workbook(self):
+        """
+        Open the source workbook for row streaming.
 
-            # Debug print the first few rows to see the content
-            print("\nSample rows with header row 5:")
-            print(df_header4.head(2))
-        except Exception as e:
-            print(f"Error reading with header=4: {str(e)}")
+        .xlsx/.xlsm files are opened with openpyxl in read-only mode so rows are
+        parsed lazily. Other formats (.xls) are read through pandas, one sheet
+        at a time.
 
-        # Try reading with first row header
-        try:
-            df_header0 = pd.read_excel(self.src_wb, sheet_name=self.src_sheet)
-            print(f"Header row 1 (index 0) columns: {df_header0.columns.tolist()}")
+        Returns:
+            tuple: (sheet names, read_rows(sheet, max_row=None) returning an
+                   iterator of row tuples, close function)
+        """
+        if Path(self.file_path).suffix.lower() in ('.xlsx', '.xlsm'):
+            workbook = openpyxl.load_workbook(self.file_path, read_only=True, data_only=True)
 
-            # Debug print the first few rows to see the content
-            print("\nSample rows with header row 1:")
-            print(df_header0.head(2))
-        except Exception as e:
-            print(f"Error reading with header=0: {str(e)}")
+            def read_rows(sheet, max_row=None):
+                return workbook[sheet].iter_rows(max_row=max_row, values_only=True)
 
-        # First check if the data has headers in row 5 (typical for AP Aging reports)
-        try:
-            # Try reading with headers in row 5 (index 4)
-            self.src_data = pd.read_excel(self.src_wb, sheet_name=self.src_sheet, header=4)
-
-            # Check if we have expected columns (due date, amount, etc.)
-            has_header = False
-            print("\nChecking for expected columns with header=4...")
-            for col in self.src_data.columns:
-                col_str = str(col).lower()
-                print(f"Column: '{col}', Lower: '{col_str}'")
+            return workbook.sheetnames, read_rows, workbook.close
+
+        excel_file = pd.ExcelFile(self.file_path)
+
+        def read_rows(sheet, max_row=None):
+            df = pd.read_excel(excel_file, sheet_name=sheet, header=None, nrows=max_row)
+            df = df.astype(object).where(df.notna(), None)
+            return df.itertuples(index=False, name=None)
+
+        return excel_file.sheet_names, read_rows, excel_file.close
+
+    def _ingest_rows(self, rows):
+        """
+        Build self.src_data and self.source_date from a stream of sheet rows.
+
+        AP Aging exports have the report title and "As of" date in the first
+        rows and the column headers on row 5; other sheets are assumed to have
+        headers on row 1.
+
+        Args:
+            rows (iterable): Row tuples for the whole sheet, top to bottom
+        """
+        rows = iter(rows)
+        head = [tuple(row) for row in islice(rows, self.HEADER_SCAN_ROWS)]
+
+        self.source_date = self._get_source_date(head)
+
+        # Headers are on row 5 if it names a due date or amount column
+        header_index = 0
+        if len(head) > self.AP_HEADER_ROW:
+            for val in head[self.AP_HEADER_ROW]:
+                col_str = str(val).lower() if val is not None else ''
                 if "due date" in col_str or "amount" in col_str:
-                    has_header = True
-                    print(f"Found expected column: {col}")
-
-            if not has_header:
-                print("No expected columns found with header=4, trying with header=0...")
-                # If headers weren't found in row 5, try with headers in row 1
-                self.src_data = pd.read_excel(self.src_wb, sheet_name=self.src_sheet)
-                print(f"Columns with header=0: {self.src_data.columns.tolist()}")
-        except Exception as e:
-            print(f"Exception during header detection: {str(e)}")
-            # Fall back to standard header (first row)
-            self.src_data = pd.read_excel(self.src_wb, sheet_name=self.src_sheet)
-            print(f"Fallback to header=0, columns: {self.src_data.columns.tolist()}")
+                    header_index = self.AP_HEADER_ROW
+                    break
+        print(f"Using header row {header_index + 1}")
+
+        header = head[header_index] if head else ()
+        data_rows = chain(head[header_index + 1:], rows)
+
+        # Build the frame a chunk at a time so large exports never hold more
+        # than one chunk of row tuples in memory
+        frames = []
+        width = len(header)
+        while True:
+            chunk = list(islice(data_rows, self.INGEST_CHUNK_ROWS))
+            if not chunk:
+                break
+            width = max(width, max(len(row) for row in chunk))
+            frames.append(pd.DataFrame.from_records(chunk))
+
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        df = df.reindex(columns=range(width))
+        df.columns = self._column_names(header, width)
+
+        # Drop trailing rows with no values at all
+        filled = np.flatnonzero(df.notna().any(axis=1).to_numpy())
+        df = df.iloc[:filled[-1] + 1 if len(filled) else 0]
+
+        self.src_data = self._type_columns(df.infer_objects())
+
+    @staticmethod
+    def _column_names(header, width):
+        """Name columns the way pandas does: blank headers become 'Unnamed: n', repeats get '.1', '.2', ..."""
+        names = []
+        seen = {}
+        for i in range(width):
+            val = header[i] if i < len(header) else None
+            name = f"Unnamed: {i}" if val is None or val == '' else val
+            if name in seen:
+                seen[name] += 1
+                name = f"{name}.{seen[name]}"
+            else:
+                seen[name] = 0
+            names.append(name)
+        return names
 
-        # Print the final columns we're using
-        print(f"\nFinal column set: {self.src_data.columns.tolist()}")
+    @staticmethod
+    def _type_columns(df):
+        """Parse date columns as datetimes and amount/balance columns as numbers."""
+        for col in df.columns:
+            col_str = str(col).lower()
+            if "date" in col_str:
+                df[col] = pd.to_datetime(df[col], errors='coerce')
+            elif "amount" in col_str or "balance" in col_str:
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+        return df
 
-        # Extract source date from the report (typically in cell A3)
-        self._get_source_date()
+    def _get_source_date(self, head_rows):
+        """
+        Extract the source date from the AP Aging report.
 
-    def _get_source_date(self):
-        """Extract the source date from the AP Aging report."""
-        try:
-            # Read the original Excel file to get cell A3 value
-            date_df = pd.read_excel(self.src_wb, sheet_name=self.src_sheet, header=None, nrows=5)
+        Args:
+            head_rows (list): The first rows of the source sheet
 
+        Returns:
+            Timestamp or date: The "As of" date, or today if none is found
+        """
+        try:
             # Get value from A3 (or equivalent first few rows)
             date_text = None
-            for i in range(min(5, date_df.shape[0])):
-                val = date_df.iloc[i, 0]
+            for row in head_rows[:self.HEADER_SCAN_ROWS]:
+                val = row[0] if row else None
                 if isinstance(val, str) and "as of" in val.lower():
                     date_text = val
                     break
@@ -176,14 +369,15 @@ class APReportProcessor:
             if date_text:
                 date_text = re.sub(r'(?i)as\s+of\s+', '', date_text).strip()
                 try:
-                    self.source_date = pd.to_datetime(date_text)
+                    source_date = pd.to_datetime(date_text)
+                    self.source_date_found = True
+                    return source_date
                 except:
-                    self.source_date = datetime.now().date()
-            else:
-                self.source_date = datetime.now().date()
+                    return datetime.now().date()
+            return datetime.now().date()
         except:
             # Default to today if can't find or parse the date
-            self.source_date = datetime.now().date()
+            return datetime.now().date()
 
     def _get_next_monday(self, start_date=None):
         """Calculate the next Monday from a given date."""
@@ -248,10 +442,20 @@ class APReportProcessor:
         print(f"Weekly bill columns after cleanup: {df.columns.tolist()}")
         return df
 
-    def _insert_subtotals(self, df):
+    def _build_week_buckets(self, df):
         """
-        Calculates and adds subtotal rows by week, with dates
-        formatted as mm/dd/yyyy.
+        Build the week-bucket model that the report sheets are derived from.
+
+        Bills with a due date are put in week order (keeping their original
+        order within a week). If no bill has a due date, all bills are kept
+        with a week of -1 and no week gets a subtotal.
+
+        Args:
+            df (DataFrame): Cleaned WeeklyBill data
+
+        Returns:
+            tuple: (bill rows in week order, DataFrame with the matching
+                   'week', 'vendor' and 'amount' for each bill)
         """
         # Find the due date and amount columns
         due_col = None
@@ -273,279 +477,208 @@ class APReportProcessor:
             print(f"ERROR: {error_msg}")
             raise ValueError(error_msg)
 
+        vendor_col = self._find_vendor_column(df)
+        print(f"Using columns: Vendor={vendor_col}, Due date={due_col}, Amount={amt_col}")
+
         # Convert due date column to datetime
+        df = df.copy()
         df[due_col] = pd.to_datetime(df[due_col], errors='coerce')
 
-        # Make a copy of the dataframe to work with
-        result_df = []
-
-        # Convert next_monday to pandas Timestamp for proper comparison
-        report_first_monday = pd.Timestamp(self.next_monday)
-        print(f"report_first_monday type: {type(report_first_monday)}, value: {report_first_monday}")
-
-        # Process items before first Monday (Remainder of current week)
-        remainder_filter = df[due_col] < report_first_monday
-        remainder_items = df[remainder_filter].copy()
-        if len(remainder_items) > 0:
-            print(f"Found {len(remainder_items)} items for remainder of current week")
-            week_total = remainder_items[amt_col].sum()
-            result_df.append(remainder_items)
-
-            # Add subtotal row for remainder of week
-            subtotal_row = pd.DataFrame({
-                df.columns[0]: [f"TOTAL FOR CURRENT WEEK: UP TO {report_first_monday.strftime('%m/%d/%Y')}"],
-                amt_col: [week_total]
-            })
-            for col in df.columns:
-                if col != df.columns[0] and col != amt_col:
-                    subtotal_row[col] = None
-            result_df.append(subtotal_row)
-
-        # Process subsequent weeks (4 weeks after first Monday)
-        for i in range(1, 5):
-            week_start = report_first_monday + pd.Timedelta(days=(i-1)*7)
-            week_end = report_first_monday + pd.Timedelta(days=i*7) - pd.Timedelta(days=1)
-            next_monday = report_first_monday + pd.Timedelta(days=i*7)
-
-            # Items due this week
-            week_filter = (df[due_col] >= week_start) & (df[due_col] < next_monday)
-            week_items = df[week_filter].copy()
-
-            if len(week_items) > 0:
-                print(f"Found {len(week_items)} items for date range {week_start.strftime('%m/%d/%Y')} - {week_end.strftime('%m/%d/%Y')}")
-                week_total = week_items[amt_col].sum()
-                result_df.append(week_items)
-
-                # Add subtotal row for this week
-                subtotal_row = pd.DataFrame({
-                    df.columns[0]: [f"TOTAL FOR {week_start.strftime('%m/%d/%Y')} - {week_end.strftime('%m/%d/%Y')}"],
-                    amt_col: [week_total]
-                })
-                for col in df.columns:
-                    if col != df.columns[0] and col != amt_col:
-                        subtotal_row[col] = None
-                result_df.append(subtotal_row)
-
-        # Add total for any remaining items after 4 weeks
-        fifth_monday = report_first_monday + pd.Timedelta(days=4*7)
-        remaining_filter = df[due_col] >= fifth_monday
-        remaining_items = df[remaining_filter].copy()
-        if len(remaining_items) > 0:
-            print(f"Found {len(remaining_items)} items for dates after {fifth_monday.strftime('%m/%d/%Y')}")
-            remaining_total = remaining_items[amt_col].sum()
-            result_df.append(remaining_items)
-
-            # Add subtotal row for remaining items
-            subtotal_row = pd.DataFrame({
-                df.columns[0]: [f"TOTAL FOR AFTER {fifth_monday.strftime('%m/%d/%Y')}"],
-                amt_col: [remaining_total]
-            })
-            for col in df.columns:
-                if col != df.columns[0] and col != amt_col:
-                    subtotal_row[col] = None
-            result_df.append(subtotal_row)
-
-        # Combine all parts into a single DataFrame
-        if len(result_df) > 0:
-            combined_df = pd.concat(result_df, ignore_index=True)
-            return combined_df
+        # Assign every bill to a week bucket: 0 is the remainder of the current
+        # week, 1..forward_weeks are the following weeks, and forward_weeks + 1
+        # collects everything after. Bills without a due date are left out.
+        weeks = self._assign_week_buckets(df[due_col])
+        dated = weeks >= 0
+        if dated.any():
+            # One stable sort keeps bills in their original order within each week
+            order = np.flatnonzero(dated)
+            order = order[np.argsort(weeks[order], kind='stable')]
         else:
-            return df
+            order = np.arange(len(df))
 
-    def _create_vendor_subtotals(self, weekly_bill_df):
-        """
-        Creates the VendorSubtotals sheet with vendor totals by week.
-        """
-        # Find the vendor, due date, and amount columns
-        vendor_col = None
-        due_col = None
-        amt_col = None
-
-        # Print all available columns for debugging
-        print(f"Available columns for vendor detection: {weekly_bill_df.columns.tolist()}")
+        bills = df.iloc[order].reset_index(drop=True)
+        buckets = pd.DataFrame({
+            'week': weeks[order],
+            'vendor': bills[vendor_col].to_numpy(),
+            'amount': pd.to_numeric(bills[amt_col], errors='coerce').to_numpy(dtype=float)
+        })
+        self.amount_column = amt_col
+        return bills, buckets
 
-        # First look for vendor column with more flexible matching
-        for col in weekly_bill_df.columns:
+    def _find_vendor_column(self, df):
+        """Return the vendor column: 'Vendor Display Name', any vendor column, the first text column, or the first column."""
+        vendor_col = None
+        for col in df.columns:
             col_str = str(col).lower()
-            print(f"Checking column: '{col}' (lower: '{col_str}')")
-            # More flexible vendor matching - look for any column with "vendor" in the name
             if "vendor" in col_str:
                 vendor_col = col
-                print(f"Found vendor column: {col}")
                 if "display" in col_str and "name" in col_str:
-                    # This is the ideal match, so break immediately
-                    break
+                    # This is the ideal match
+                    return col
+        if vendor_col:
+            return vendor_col
 
-            if "due date" in col_str or "due" in col_str:
-                due_col = col
-                print(f"Found due date column: {col}")
+        # Fallback: use the first text column
+        for col in df.columns:
+            sample_values = df[col].dropna().head(5)
+            if len(sample_values) > 0 and all(isinstance(val, str) for val in sample_values):
+                print(f"Using text column as vendor: {col}")
+                return col
 
-            if "amount" in col_str:
-                amt_col = col
-                print(f"Found amount column: {col}")
+        # Last resort: just use the first column
+        print(f"Using first column as vendor: {df.columns[0]}")
+        return df.columns[0]
 
-        # Fallback: if no vendor column found with "vendor" in name, use the first text column
-        if not vendor_col:
-            print("No vendor column found with 'vendor' in name, trying to find first text column")
-            for col in weekly_bill_df.columns:
-                # Get sample values to check if it might be a text column
-                sample_values = weekly_bill_df[col].dropna().head(5)
-                if len(sample_values) > 0 and all(isinstance(val, str) for val in sample_values):
-                    vendor_col = col
-                    print(f"Using text column as vendor: {col}")
-                    break
+    def _week_totals(self, buckets):
+        """
+        Total amount and bill count for every week that has bills.
 
-        if not vendor_col:
-            # Last resort: just use the first column
-            vendor_col = weekly_bill_df.columns[0]
-            print(f"Using first column as vendor: {vendor_col}")
-
-        # If due_col and amt_col are still not found, try simpler matching
-        if not due_col:
-            for col in weekly_bill_df.columns:
-                if "due" in str(col).lower():
-                    due_col = col
-                    print(f"Found due date column (simplified search): {col}")
-                    break
+        Returns:
+            DataFrame: 'total' and 'bills' indexed by week bucket, in week order
+        """
+        dated = buckets[buckets['week'] >= 0]
+        return dated.groupby('week')['amount'].agg(total='sum', bills='size')
 
-        if not amt_col:
-            for col in weekly_bill_df.columns:
-                if "amount" in str(col).lower() or "amt" in str(col).lower():
-                    amt_col = col
-                    print(f"Found amount column (simplified search): {col}")
-                    break
-                # Try to identify amount column by numeric values
-                elif weekly_bill_df[col].dtype in [np.float64, np.int64]:
-                    amt_col = col
-                    print(f"Using numeric column as amount: {col}")
-                    break
+    def _insert_subtotals(self, bills, buckets):
+        """
+        Builds the WeeklyBill sheet: bills in week order with a subtotal row
+        after each week, with dates formatted as mm/dd/yyyy.
 
-        print(f"Using columns: Vendor={vendor_col}, Due date={due_col}, Amount={amt_col}")
+        Args:
+            bills (DataFrame): Bill rows from _build_week_buckets
+            buckets (DataFrame): Week model from _build_week_buckets
+        """
+        totals = self._week_totals(buckets)
+        if len(totals) == 0:
+            return bills
+
+        labels = self._week_labels()
+        for week, row in totals.iterrows():
+            print(f"Found {row['bills']} items for {labels[week]}")
+
+        # Subtotal rows: week label in the first column, week total in the amount column
+        amt_col = self.amount_column
+        subtotal_rows = pd.DataFrame({
+            bills.columns[0]: [f"TOTAL FOR {labels[week]}" for week in totals.index],
+            amt_col: totals['total'].to_numpy()
+        })
+        for col in bills.columns:
+            if col != bills.columns[0] and col != amt_col:
+                subtotal_rows[col] = None
+        subtotal_rows = subtotal_rows[bills.columns]
+
+        # Each subtotal row goes directly after the last bill of its week
+        ends = np.cumsum(totals['bills'].to_numpy())
+        rows = np.arange(len(bills))
+        positions = np.concatenate([
+            rows + np.searchsorted(ends, rows, side='right'),
+            ends + np.arange(len(ends))
+        ])
+        self.subtotal_rows = ends + np.arange(len(ends))
+        combined_df = pd.concat([bills, subtotal_rows], ignore_index=True)
+        return combined_df.iloc[np.argsort(positions, kind='stable')].reset_index(drop=True)
+
+    def _week_boundaries(self):
+        """
+        Return the Mondays that start each forward week, plus the Monday after the last one.
+
+        Returns:
+            DatetimeIndex: forward_weeks + 1 Mondays starting at next_monday
+        """
+        return pd.date_range(pd.Timestamp(self.next_monday), periods=self.forward_weeks + 1, freq='7D')
 
-        # Double check that we found all required columns
-        if not vendor_col:
-            print("WARNING: No vendor column found, using first column")
-            vendor_col = weekly_bill_df.columns[0]
+    def _assign_week_buckets(self, due_dates):
+        """
+        Bucket due dates by week with a single searchsorted over the Monday boundaries.
 
-        if not due_col:
-            print("WARNING: No due date column found, continuing without it")
-            # This isn't strictly required for vendor subtotals
-            due_col = vendor_col  # Set to something non-None to pass the check
+        Args:
+            due_dates (Series): Datetime due dates
 
-        if not amt_col:
-            print("WARNING: No amount column found, cannot continue")
-            return pd.DataFrame(columns=['VENDOR', '# OF BILLS', 'TOTAL AMOUNT', '% OF WEEK'])
+        Returns:
+            ndarray: Bucket per row (0 = before next Monday, forward_weeks + 1 =
+                     after the last forward week, -1 = no due date)
+        """
+        boundaries = self._week_boundaries().to_numpy()
+        values = due_dates.to_numpy(dtype='datetime64[ns]')
+        buckets = np.searchsorted(boundaries, values, side='right')
+        return np.where(np.isnat(values), -1, buckets)
 
-        # Print the subtotal structure for debugging
-        print("\nAnalyzing subtotal structure:")
-        # Extract subtotal rows to identify week boundaries
-        subtotal_filter = weekly_bill_df[weekly_bill_df.columns[0]].str.contains('TOTAL FOR', case=False, na=False)
-        subtotal_rows = weekly_bill_df[subtotal_filter].copy()
+    def _week_labels(self):
+        """
+        Return the display label for every week bucket.
 
-        for i, row in subtotal_rows.iterrows():
-            print(f"Subtotal at row {i}: {row[weekly_bill_df.columns[0]]}")
+        Returns:
+            list: forward_weeks + 2 labels, indexed by bucket
+        """
+        mondays = self._week_boundaries()
+        labels = [f"CURRENT WEEK: UP TO {mondays[0].strftime('%m/%d/%Y')}"]
+        for week_start in mondays[:-1]:
+            week_end = week_start + pd.Timedelta(days=6)
+            labels.append(f"{week_start.strftime('%m/%d/%Y')} - {week_end.strftime('%m/%d/%Y')}")
+        labels.append(f"AFTER {mondays[-1].strftime('%m/%d/%Y')}")
+        return labels
+
+    def _create_vendor_subtotals(self, buckets):
+        """
+        Creates the VendorSubtotals sheet with vendor totals by week.
 
-        if len(subtotal_rows) == 0:
-            print("Warning: No subtotal rows found. Returning empty vendor subtotal sheet.")
+        Args:
+            buckets (DataFrame): Week model from _build_week_buckets
+        """
+        dated = buckets[buckets['week'] >= 0]
+        if len(dated) == 0:
+            print("Warning: No dated bills found. Returning empty vendor subtotal sheet.")
             return pd.DataFrame(columns=['VENDOR', '# OF BILLS', 'TOTAL AMOUNT', '% OF WEEK'])
 
-        # Initialize result DataFrame for VendorSubtotals
-        vendor_subtotals = []
+        # Vendor totals for every week in one groupby (bills without a vendor are left out)
+        vendor_totals = dated.groupby(['week', 'vendor'])['amount'].agg(['count', 'sum'])
+        labels = self._week_labels()
 
-        # Add header
-        vendor_subtotals.append(pd.DataFrame({
+        # Initialize result DataFrame for VendorSubtotals
+        vendor_subtotals = [pd.DataFrame({
             'HEADER': ['Vendor Subtotals by Week', f"Report for data as of: {self.source_date.strftime('%m/%d/%Y')}"]
-        }))
+        })]
 
-        # Process each week - we'll do this by analyzing the data between subtotal rows
-        week_boundaries = subtotal_rows.index.tolist()
-        print(f"Week boundaries at rows: {week_boundaries}")
-
-        # Add index 0 as the first boundary and len(weekly_bill_df) as the last
-        all_boundaries = [0] + week_boundaries + [len(weekly_bill_df)]
-
-        # Process each section (week)
-        for i in range(len(week_boundaries)):
-            # Get the title from the subtotal row
-            week_title = weekly_bill_df.iloc[week_boundaries[i], 0]
-            if "TOTAL FOR" in week_title:
-                week_title = week_title.replace("TOTAL FOR", "").strip()
-
-            print(f"Processing section: {week_title}")
-
-            # Get the start and end indices for this section
-            start_idx = all_boundaries[i]  # Start from the previous boundary
-            end_idx = week_boundaries[i]   # End at this subtotal row
-
-            # Skip if there are no data rows in this section
-            if end_idx <= start_idx:
-                print(f"  Skipping empty section {i+1}")
-                continue
-
-            # Extract data rows only (no subtotal rows)
-            mask = ~weekly_bill_df.iloc[start_idx:end_idx][weekly_bill_df.columns[0]].str.contains('TOTAL FOR', case=False, na=False)
-            week_data = weekly_bill_df.iloc[start_idx:end_idx][mask].copy()
-
-            if len(week_data) == 0:
-                print(f"  No items in section {i+1}")
-                continue
-
-            print(f"  Found {len(week_data)} items in section {i+1}")
-
-            # Process this week's data
-            try:
-                # Group by vendor and sum amounts
-                vendor_totals = week_data.groupby(vendor_col)[amt_col].agg(['count', 'sum']).reset_index()
-                vendor_totals.columns = ['VENDOR', '# OF BILLS', 'TOTAL AMOUNT']
-
-                # Calculate percentage of week
-                week_total = vendor_totals['TOTAL AMOUNT'].sum()
-                if week_total > 0:  # Avoid division by zero
-                    vendor_totals['% OF WEEK'] = vendor_totals['TOTAL AMOUNT'] / week_total
-                else:
-                    vendor_totals['% OF WEEK'] = 0.0
-
-                # Sort by amount descending
-                vendor_totals = vendor_totals.sort_values('TOTAL AMOUNT', ascending=False)
-
-                # Add week title and headers
-                result = [
-                    pd.DataFrame({'WEEK': [week_title]}),
-                    pd.DataFrame({
-                        'VENDOR': ['VENDOR'],
-                        '# OF BILLS': ['# OF BILLS'],
-                        'TOTAL AMOUNT': ['TOTAL AMOUNT'],
-                        '% OF WEEK': ['% OF WEEK']
-                    }),
-                    vendor_totals,
-                    pd.DataFrame({
-                        'VENDOR': ['WEEK TOTAL'],
-                        '# OF BILLS': [vendor_totals['# OF BILLS'].sum()],
-                        'TOTAL AMOUNT': [week_total],
-                        '% OF WEEK': [1.0]
-                    }),
-                    pd.DataFrame({'SPACER': ['']}),  # blank row between weeks
-                ]
-                section_result = pd.concat(result, ignore_index=True)
-                vendor_subtotals.append(section_result)
-                print(f"  Added section with {len(section_result)} rows")
-            except Exception as e:
-                print(f"Error processing section {i+1}: {str(e)}")
-
-        # Calculate grand total across all weeks
         grand_total = 0
         total_bills = 0
-        try:
-            for frame in vendor_subtotals:
-                if 'VENDOR' in frame.columns and 'TOTAL AMOUNT' in frame.columns:
-                    week_total_rows = frame.loc[frame['VENDOR'] == 'WEEK TOTAL', 'TOTAL AMOUNT']
-                    week_bills_rows = frame.loc[frame['VENDOR'] == 'WEEK TOTAL', '# OF BILLS']
-                    if not week_total_rows.empty:
-                        grand_total += week_total_rows.iloc[0]
-                    if not week_bills_rows.empty:
-                        total_bills += week_bills_rows.iloc[0]
-        except Exception as e:
-            print(f"Error calculating grand total: {str(e)}")
+        for week in np.unique(dated['week'].to_numpy()):
+            if week in vendor_totals.index.get_level_values('week'):
+                week_totals = vendor_totals.loc[week].reset_index()
+            else:
+                week_totals = pd.DataFrame(columns=['vendor', 'count', 'sum'])
+            week_totals.columns = ['VENDOR', '# OF BILLS', 'TOTAL AMOUNT']
+
+            # Calculate percentage of week
+            week_total = week_totals['TOTAL AMOUNT'].sum()
+            if week_total > 0:  # Avoid division by zero
+                week_totals['% OF WEEK'] = week_totals['TOTAL AMOUNT'] / week_total
+            else:
+                week_totals['% OF WEEK'] = 0.0
+
+            # Sort by amount descending
+            week_totals = week_totals.sort_values('TOTAL AMOUNT', ascending=False)
+            week_bills = week_totals['# OF BILLS'].sum()
+
+            # Add week title and headers
+            vendor_subtotals.extend([
+                pd.DataFrame({'WEEK': [labels[week]]}),
+                pd.DataFrame({
+                    'VENDOR': ['VENDOR'],
+                    '# OF BILLS': ['# OF BILLS'],
+                    'TOTAL AMOUNT': ['TOTAL AMOUNT'],
+                    '% OF WEEK': ['% OF WEEK']
+                }),
+                week_totals,
+                pd.DataFrame({
+                    'VENDOR': ['WEEK TOTAL'],
+                    '# OF BILLS': [week_bills],
+                    'TOTAL AMOUNT': [week_total],
+                    '% OF WEEK': [1.0]
+                }),
+                pd.DataFrame({'SPACER': ['']}),  # blank row between weeks
+            ])
+            grand_total += week_total
+            total_bills += week_bills
 
         # Add grand total row
         vendor_subtotals.append(pd.DataFrame({
@@ -555,39 +688,18 @@ class APReportProcessor:
             '% OF WEEK': [1.0]
         }))
 
-        # Combine all parts
-        if len(vendor_subtotals) > 0:
-            try:
-                result_df = pd.concat(vendor_subtotals, ignore_index=True)
-                return result_df
-            except Exception as e:
-                print(f"Error combining vendor subtotals: {str(e)}")
-                # Return a basic DataFrame if concatenation fails
-                return pd.DataFrame({
-                    'VENDOR': ['Error creating vendor subtotals'],
-                    '# OF BILLS': [0],
-                    'TOTAL AMOUNT': [0],
-                    '% OF WEEK': [0]
-                })
-        else:
-            # Return an empty DataFrame with expected columns if no data
-            return pd.DataFrame(columns=['VENDOR', '# OF BILLS', 'TOTAL AMOUNT', '% OF WEEK'])
+        return pd.concat(vendor_subtotals, ignore_index=True)
 
-    def _create_weekly_summary(self, weekly_bill_df):
+    def _create_weekly_summary(self, buckets):
         """
         Creates the WeeklySummary sheet with totals by week.
-        """
-        # Find the amount column
-        amt_col = None
-        for col in weekly_bill_df.columns:
-            if isinstance(col, str) and 'amount' in str(col).lower():
-                amt_col = col
-                break
 
-        if not amt_col:
-            raise ValueError("Could not find 'Amount' column in WeeklyBill data")
+        Args:
+            buckets (DataFrame): Week model from _build_week_buckets
+        """
+        totals = self._week_totals(buckets)
+        labels = self._week_labels()
 
-        # Initialize summary DataFrame
         summary = [
             pd.DataFrame({
                 'TITLE': ['Weekly Payment Summary', f"Report for data as of: {self.source_date.strftime('%m/%d/%Y')}"]
@@ -599,103 +711,110 @@ class APReportProcessor:
             })
         ]
 
-        # Extract week subtotals
-        subtotal_filter = weekly_bill_df[weekly_bill_df.columns[0]].str.contains('TOTAL FOR', case=False, na=False)
-        subtotal_rows = weekly_bill_df[subtotal_filter].copy()
-
-        # Process each week subtotal
-        week_data = []
-        grand_total = 0
-        total_invoices = 0
-
-        # Helper to count invoices in a week
-        def count_invoices(start_idx, end_idx):
-            if start_idx >= end_idx:
-                return 0
-            week_df = weekly_bill_df.iloc[start_idx:end_idx].copy()
-            no_total_filter = ~week_df[weekly_bill_df.columns[0]].str.contains('TOTAL FOR', case=False, na=False)
-            return len(week_df[no_total_filter])
-
-        # Process each subtotal row
-        subtotal_indices = subtotal_rows.index.tolist()
-        for i, idx in enumerate(subtotal_indices):
-            row = weekly_bill_df.iloc[idx]
-            week_text = re.sub(r'(?i)TOTAL FOR ', '', str(row[weekly_bill_df.columns[0]]))
-            week_total = row[amt_col]
-
-            # Count invoices in this section
-            start_idx = 0 if i == 0 else subtotal_indices[i-1] + 1
-            invoice_count = count_invoices(start_idx, idx)
-
-            week_data.append({
-                'PAYMENT PERIOD': week_text,
-                'TOTAL AMOUNT': week_total,
-                '# OF INVOICES': invoice_count
-            })
-
-            grand_total += week_total
-            total_invoices += invoice_count
-
-        # Add week data
-        if len(week_data) > 0:
-            summary.append(pd.DataFrame(week_data))
+        # One row per week that has bills
+        if len(totals) > 0:
+            summary.append(pd.DataFrame({
+                'PAYMENT PERIOD': [labels[week] for week in totals.index],
+                'TOTAL AMOUNT': totals['total'].to_numpy(),
+                '# OF INVOICES': totals['bills'].to_numpy()
+            }))
 
         # Add grand total
         summary.append(pd.DataFrame({
             'PAYMENT PERIOD': ['TOTAL PAYMENTS'],
-            'TOTAL AMOUNT': [grand_total],
-            '# OF INVOICES': [total_invoices]
+            'TOTAL AMOUNT': [totals['total'].sum() if len(totals) > 0 else 0],
+            '# OF INVOICES': [int(totals['bills'].sum())]
         }))
 
-        # Combine all parts
-        if len(summary) > 0:
-            result_df = pd.concat(summary, ignore_index=True)
-            return result_df
-        else:
-            # Return an empty DataFrame with expected columns if no data
-            return pd.DataFrame(columns=['PAYMENT PERIOD', 'TOTAL AMOUNT', '# OF INVOICES'])
+        return pd.concat(summary, ignore_index=True)
+
+    def _report_name(self):
+        """The report's name by its As-of date, shared by every job for that date (and used in the cache)."""
+        return f"Upcoming Bills Report {self.source_date.strftime('%Y%m%d')}.xlsx"
+
+    def _output_filename(self, report_name):
+        """This processor's own file name for a report name."""
+        stem, extension = os.path.splitext(report_name)
+        return f"{stem} {self.report_id}{extension}"
 
     def _save_report_as(self, weekly_bill_df, vendor_subtotals_df, weekly_summary_df):
         """Save the processed report with enhanced formatting using xlsxwriter."""
         # Create output filename with source date
-        output_filename = f"Upcoming Bills Report {self.source_date.strftime('%Y%m%d')}.xlsx"
+        output_filename = self._output_filename(self._report_name())
         output_path = os.path.join('reports', output_filename)
 
-        # Create Excel writer with xlsxwriter engine
-        with pd.ExcelWriter(output_path, engine='xlsxwriter') as writer:
-            # Write each sheet
-            self._write_weekly_summary(writer, weekly_summary_df)
-            self._write_weekly_bill(writer, weekly_bill_df)
-            self._write_vendor_subtotals(writer, vendor_subtotals_df)
-            self._write_raw_data(writer, self.src_data)
+        # Create Excel writer with xlsxwriter engine. Sheets are written row by
+        # row, so constant_memory mode can flush each row as soon as it is done.
+        # The workbook is written to a temporary name and moved into place, so
+        # a download never sees a half-written file.
+        options = {'constant_memory': self.CONSTANT_MEMORY_OUTPUT, 'default_date_format': 'mm/dd/yyyy'}
+        temp_path = os.path.join('reports', f".{uuid.uuid4().hex}.{output_filename}")
+        try:
+            with pd.ExcelWriter(temp_path, engine='xlsxwriter', engine_kwargs={'options': options}) as writer:
+                # Write each sheet
+                self._write_weekly_summary(writer, weekly_summary_df)
+                self._write_weekly_bill(writer, weekly_bill_df)
+                self._write_vendor_subtotals(writer, vendor_subtotals_df)
+                self._write_raw_data(writer, self.src_data)
+            os.replace(temp_path, output_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
 
         print(f"Report saved as: {output_path}")
         return output_path
 
-    def _write_weekly_summary(self, writer, df):
-        """Format and write the weekly summary sheet."""
-        # Write data
-        df.to_excel(writer, sheet_name=self.SHEET_WEEKLY_SUMMARY, index=False)
+    @staticmethod
+    def _cell_values(df):
+        """Return the frame's rows as lists of Python values, with missing values as None."""
+        columns = []
+        for i in range(df.shape[1]):
+            column = df.iloc[:, i]
+            columns.append(column.astype(object).where(column.notna(), None).tolist())
+        return [list(row) for row in zip(*columns)]
 
-        # Get workbook and worksheet
-        workbook = writer.book
-        worksheet = writer.sheets[self.SHEET_WEEKLY_SUMMARY]
+    def _write_rows(self, worksheet, df, header_format, row_formats=None):
+        """
+        Write the header and data rows of a frame, each cell exactly once.
+
+        Cells take their column's format unless row_formats gives them their
+        own. Rows are written strictly top to bottom, which constant_memory
+        mode requires.
+
+        Args:
+            worksheet: xlsxwriter worksheet
+            df (DataFrame): Data to write
+            header_format: Format for the header row
+            row_formats (dict): Frame row index -> {column index: format} for
+                rows that need cell-level formats
+        """
+        row_formats = row_formats or {}
+        worksheet.write_row(0, 0, [str(col) for col in df.columns], header_format)
+        for i, values in enumerate(self._cell_values(df)):
+            formats = row_formats.get(i)
+            if formats is None:
+                worksheet.write_row(i + 1, 0, values)
+            else:
+                for j, value in enumerate(values):
+                    worksheet.write(i + 1, j, value, formats.get(j))
 
-        # Define formats
-        title_format = workbook.add_format({
+    @staticmethod
+    def _header_format(workbook):
+        """Bold, bordered, centered header cells."""
+        return workbook.add_format({
             'bold': True,
-            'font_size': 14,
+            'border': 1,
             'align': 'center',
-            'valign': 'vcenter'
+            'valign': 'top'
         })
 
-        header_format = workbook.add_format({
-            'bold': True,
-            'bg_color': '#D9E1F2',
-            'border': 1,
-            'align': 'center'
-        })
+    def _write_weekly_summary(self, writer, df):
+        """Format and write the weekly summary sheet."""
+        # Get workbook and worksheet
+        workbook = writer.book
+        worksheet = workbook.add_worksheet(self.SHEET_WEEKLY_SUMMARY)
 
+        # Define formats
         money_format = workbook.add_format({
             'num_format': '$#,##0.00',
             'align': 'right'
@@ -708,6 +827,8 @@ class APReportProcessor:
             'top': 2
         })
 
+        bold_format = workbook.add_format({'bold': True})
+
         # Find amount and period columns
         amount_col = None
         period_col = None
@@ -719,50 +840,21 @@ class APReportProcessor:
             elif "period" in col_str or "payment" in col_str:
                 period_col = i
 
-        # Apply column formatting
-        worksheet.set_column('A:A', 30)  # Payment period
-        worksheet.set_column('B:B', 15, money_format)  # Total amount
-        worksheet.set_column('C:C', 15)  # Number of invoices
-
-        # Find the row where the actual data starts (after headers)
-        data_start_row = 0
-        for i, row in df.iterrows():
-            if 'PAYMENT PERIOD' in str(row.iloc[0]):
-                data_start_row = i + 1
-                break
+        # Format the total row: bold labels and counts, total format for the amount
+        row_formats = {}
+        if period_col is not None:
+            for i in np.flatnonzero(df.iloc[:, period_col].astype(str).str.contains('TOTAL PAYMENTS').to_numpy()):
+                formats = {j: bold_format for j in range(df.shape[1])}
+                if amount_col is not None:
+                    formats[amount_col] = total_format
+                row_formats[i] = formats
 
-        # Find total row
-        total_row = None
-        for i, row in df.iterrows():
-            if 'TOTAL PAYMENTS' in str(row.iloc[0]):
-                total_row = i
-                break
+        # Set optimal column widths based on content, with the amount column in
+        # money format (column formats must be set before rows are written)
+        column_formats = {amount_col: money_format} if amount_col is not None else {}
+        self._set_column_widths(worksheet, df, column_formats)
 
-        # Apply formatting to all cells with amounts
-        if amount_col is not None:
-            for i in range(len(df)):
-                try:
-                    val = df.iloc[i, amount_col] if amount_col < df.shape[1] else None
-                    if pd.notna(val) and isinstance(val, (int, float)):
-                        # For regular rows or header rows
-                        if total_row is not None and i == total_row:
-                            # Use total format for the total row
-                            worksheet.write(i+1, amount_col, val, total_format)
-                        elif i >= data_start_row:
-                            # Regular data rows
-                            worksheet.write(i+1, amount_col, val, money_format)
-                except (IndexError, KeyError):
-                    pass
-
-        # Apply formatting to data rows
-        if total_row is not None:
-            # Format the total row
-            worksheet.write(total_row+1, 0, 'TOTAL PAYMENTS', workbook.add_format({'bold': True}))
-            # Total amount already formatted above
-            worksheet.write(total_row+1, 2, df.iloc[total_row, 2], workbook.add_format({'bold': True}))
-
-        # Set optimal column widths based on content
-        self._set_column_widths(worksheet, df)
+        self._write_rows(worksheet, df, self._header_format(workbook), row_formats)
 
     def _write_weekly_bill(self, writer, df):
         """Format and write the weekly bill sheet with enhanced formatting."""
@@ -791,20 +883,11 @@ class APReportProcessor:
         if vendor_col is None and len(df.columns) > 3:
             vendor_col = 3  # Typical position for vendor
 
-        # Write data to Excel
-        df.to_excel(writer, sheet_name=self.SHEET_WEEKLY_BILL, index=False)
-
         # Get workbook and worksheet
         workbook = writer.book
-        worksheet = writer.sheets[self.SHEET_WEEKLY_BILL]
+        worksheet = workbook.add_worksheet(self.SHEET_WEEKLY_BILL)
 
         # Define formats
-        header_format = workbook.add_format({
-            'bold': True,
-            'bg_color': '#D9E1F2',
-            'border': 1
-        })
-
         date_format = workbook.add_format({
             'num_format': 'mm/dd/yyyy',  # Date format without time
         })
@@ -821,65 +904,32 @@ class APReportProcessor:
             'bottom': 1
         })
 
-        # Apply column formatting
+        subtotal_label_format = workbook.add_format({
+            'bold': True,
+            'bg_color': '#F2F2F2',
+            'top': 1,
+            'bottom': 1
+        })
+
+        # Subtotal rows: label in the first column, week total in the amount column
+        row_formats = {}
+        for i in self.subtotal_rows:
+            formats = {0: subtotal_label_format}
+            if amt_col is not None:
+                formats[amt_col] = subtotal_format
+            row_formats[int(i)] = formats
+
+        # Set optimal column widths, with date and money formats on their columns
+        column_formats = {}
         if due_col is not None:
-            worksheet.set_column(due_col, due_col, 12, date_format)
+            column_formats[due_col] = date_format
         if amt_col is not None:
-            worksheet.set_column(amt_col, amt_col, 15, money_format)
-        if vendor_col is not None:
-            worksheet.set_column(vendor_col, vendor_col, 25)
+            column_formats[amt_col] = money_format
         if date_col is not None:
-            worksheet.set_column(date_col, date_col, 12, date_format)
+            column_formats[date_col] = date_format
+        self._set_column_widths(worksheet, df, column_formats)
 
-        # Apply money format to all amount cells (including data rows)
-        if amt_col is not None:
-            for i in range(1, len(df)+1):  # Skip header row (0)
-                try:
-                    val = df.iloc[i-1, amt_col] if i-1 < len(df) else None
-                    if pd.notna(val) and isinstance(val, (int, float)):
-                        if 'TOTAL FOR' in str(df.iloc[i-1, 0]):
-                            # Use subtotal format for total rows
-                            worksheet.write(i, amt_col, val, subtotal_format)
-                        else:
-                            # Use standard money format for regular rows
-                            worksheet.write(i, amt_col, val, money_format)
-                except (IndexError, KeyError):
-                    pass
-
-        # Apply date format to all date cells
-        if date_col is not None:
-            for i in range(1, len(df)+1):
-                try:
-                    val = df.iloc[i-1, date_col] if i-1 < len(df) else None
-                    if pd.notna(val) and not ('TOTAL FOR' in str(df.iloc[i-1, 0])):
-                        worksheet.write(i, date_col, val, date_format)
-                except (IndexError, KeyError):
-                    pass
-
-        # Apply formatting to subtotal rows
-        for i in range(len(df)):
-            if 'TOTAL FOR' in str(df.iloc[i, 0]):
-                # Format the entire subtotal row
-                for j in range(len(df.columns)):
-                    cell_value = df.iloc[i, j]
-                    if j != amt_col and j == 0:  # Skip amount column as it's handled above
-                        # First column (description) with subtotal format
-                        worksheet.write(i+1, j, cell_value, workbook.add_format({
-                            'bold': True,
-                            'bg_color': '#F2F2F2',
-                            'top': 1,
-                            'bottom': 1
-                        }))
-
-        # Apply date format to all due date cells
-        if due_col is not None:
-            for i in range(1, len(df)+1):  # Skip header row
-                try:
-                    val = df.iloc[i-1, due_col] if i-1 < len(df) else None
-                    if pd.notna(val) and not ('TOTAL FOR' in str(df.iloc[i-1, 0])):
-                        worksheet.write(i, due_col, val, date_format)
-                except (IndexError, KeyError):
-                    pass
+        self._write_rows(worksheet, df, self._header_format(workbook), row_formats)
 
         # Add conditional formatting to highlight upcoming and overdue payments
         if due_col is not None:
@@ -897,28 +947,16 @@ class APReportProcessor:
                 'format': workbook.add_format({'bg_color': '#F4CCCC'})
             })
 
-        # Set optimal column widths
-        self._set_column_widths(worksheet, df)
-
         # Freeze panes at B2 to keep headers and row labels visible
         worksheet.freeze_panes(1, 1)
 
     def _write_vendor_subtotals(self, writer, df):
         """Format and write the vendor subtotals sheet."""
-        # Write data to Excel
-        df.to_excel(writer, sheet_name=self.SHEET_VENDOR_SUBTOTALS, index=False)
-
         # Get workbook and worksheet
         workbook = writer.book
-        worksheet = writer.sheets[self.SHEET_VENDOR_SUBTOTALS]
+        worksheet = workbook.add_worksheet(self.SHEET_VENDOR_SUBTOTALS)
 
         # Define formats
-        header_format = workbook.add_format({
-            'bold': True,
-            'bg_color': '#E2EFDA',
-            'border': 1
-        })
-
         money_format = workbook.add_format({
             'num_format': '$#,##0.00'
         })
@@ -927,19 +965,13 @@ class APReportProcessor:
             'num_format': '0.0%'  # Proper percentage format
         })
 
-        total_format = workbook.add_format({
-            'bold': True,
-            'bg_color': '#F2F2F2',
-            'num_format': '$#,##0.00',
-            'top': 1,
-            'bottom': 1
-        })
+        week_total_format = {'bold': True, 'bg_color': '#F2F2F2'}
+        grand_total_format = {'bold': True, 'bg_color': '#D9E1F2'}
 
         # Find column indices for special formatting
         total_col = None
         percent_col = None
         vendor_col = None
-        bills_col = None
 
         for i, col in enumerate(df.columns):
             col_str = str(col).lower() if not pd.isna(col) else ""
@@ -949,79 +981,36 @@ class APReportProcessor:
                 percent_col = i
             elif 'vendor' in col_str:
                 vendor_col = i
-            elif '# of bills' in col_str or 'bills' in col_str:
-                bills_col = i
 
-        # Apply column formatting
+        # Week total and grand total rows are bold and shaded across the row
+        row_formats = {}
+        if vendor_col is not None:
+            vendors = df.iloc[:, vendor_col]
+            for label, base in (('WEEK TOTAL', week_total_format), ('ALL WEEKS TOTAL', grand_total_format)):
+                plain = workbook.add_format(base)
+                formats = {j: plain for j in range(df.shape[1])}
+                if total_col is not None:
+                    formats[total_col] = workbook.add_format(dict(base, num_format='$#,##0.00', top=1, bottom=1))
+                if percent_col is not None:
+                    formats[percent_col] = workbook.add_format(dict(base, num_format='0.0%'))
+                for i in np.flatnonzero((vendors == label).to_numpy()):
+                    row_formats[i] = formats
+
+        # Set column widths, with money and percent formats on their columns
+        column_formats = {}
         if total_col is not None:
-            worksheet.set_column(total_col, total_col, 15, money_format)
+            column_formats[total_col] = money_format
         if percent_col is not None:
-            worksheet.set_column(percent_col, percent_col, 10, percent_format)
-        if vendor_col is not None:
-            worksheet.set_column(vendor_col, vendor_col, 25)
-        if bills_col is not None:
-            worksheet.set_column(bills_col, bills_col, 10)
-
-        # Apply formatting to all rows
-        for i in range(len(df)):
-            try:
-                # Total amount formatting for all rows
-                if total_col is not None and i < len(df):
-                    val = df.iloc[i, total_col] if total_col < df.shape[1] else None
-                    if pd.notna(val) and isinstance(val, (int, float)):
-                        worksheet.write(i+1, total_col, val, money_format)
-
-                # Percentage formatting for all rows
-                if percent_col is not None and i < len(df):
-                    val = df.iloc[i, percent_col] if percent_col < df.shape[1] else None
-                    if pd.notna(val) and isinstance(val, (int, float)):
-                        worksheet.write(i+1, percent_col, val, percent_format)
-            except (IndexError, KeyError):
-                pass
-
-        # Format week title and total rows
-        for i in range(len(df)):
-            # Identify row types
-            cell_val = str(df.iloc[i, 0]) if len(df.columns) > 0 and i < len(df) else ''
-
-            if 'WEEK TOTAL' in cell_val or (len(df.columns) > 1 and 'WEEK TOTAL' in str(df.iloc[i, 1])):
-                # Week total row
-                for j in range(len(df.columns)):
-                    if j < df.shape[1]:  # Make sure column exists
-                        try:
-                            cell_value = df.iloc[i, j]
-                            if pd.notna(cell_value):
-                                if j == total_col:
-                                    worksheet.write(i+1, j, cell_value, total_format)
-                                else:
-                                    worksheet.write(i+1, j, cell_value, workbook.add_format({
-                                        'bold': True,
-                                        'bg_color': '#F2F2F2'
-                                    }))
-                        except IndexError:
-                            pass
-
-            elif 'GRAND TOTAL' in cell_val:
-                # Grand total row
-                worksheet.write(i+1, 0, cell_val, workbook.add_format({'bold': True, 'bg_color': '#D9E1F2'}))
-                if len(df.columns) > 1 and i < len(df):
-                    worksheet.write(i+1, 1, df.iloc[i, 1], workbook.add_format({
-                        'bold': True,
-                        'bg_color': '#D9E1F2',
-                        'num_format': '$#,##0.00'
-                    }))
+            column_formats[percent_col] = percent_format
+        self._set_column_widths(worksheet, df, column_formats)
 
-        # Set column widths
-        self._set_column_widths(worksheet, df)
+        self._write_rows(worksheet, df, self._header_format(workbook), row_formats)
 
     def _write_raw_data(self, writer, df):
         """Write the raw data sheet with basic formatting."""
-        # Write data to Excel
-        df.to_excel(writer, sheet_name=self.SHEET_RAW_DATA, index=False)
-
         # Get workbook and worksheet
         workbook = writer.book
-        worksheet = writer.sheets[self.SHEET_RAW_DATA]
+        worksheet = workbook.add_worksheet(self.SHEET_RAW_DATA)
 
         # Define formats
         header_format = workbook.add_format({
@@ -1038,58 +1027,59 @@ class APReportProcessor:
             'num_format': '$#,##0.00'
         })
 
-        # Format the headers
-        for col_num, value in enumerate(df.columns.values):
-            worksheet.write(0, col_num, value, header_format)
-
-        # Apply column formatting for dates and amounts
+        # Column formatting for dates and amounts (set before any row is written)
+        column_formats = {}
         for i, col in enumerate(df.columns):
             col_str = str(col).lower()
             if "date" in col_str:
-                worksheet.set_column(i, i, 12, date_format)
+                column_formats[i] = date_format
+            elif "amount" in col_str or "balance" in col_str:
+                column_formats[i] = money_format
 
-                # Also format each cell in date columns
-                for row_idx in range(1, len(df)+1):
-                    try:
-                        val = df.iloc[row_idx-1, i]
-                        if pd.notna(val):
-                            worksheet.write(row_idx, i, val, date_format)
-                    except (IndexError, KeyError):
-                        pass
+        # Set column widths
+        self._set_column_widths(worksheet, df, column_formats)
 
-            elif "amount" in col_str or "balance" in col_str:
-                worksheet.set_column(i, i, 15, money_format)
-
-                # Also format each cell in amount columns
-                for row_idx in range(1, len(df)+1):
-                    try:
-                        val = df.iloc[row_idx-1, i]
-                        if pd.notna(val) and isinstance(val, (int, float)):
-                            worksheet.write(row_idx, i, val, money_format)
-                    except (IndexError, KeyError):
-                        pass
-            else:
-                # Default width for other columns
-                worksheet.set_column(i, i, 15)
+        self._write_rows(worksheet, df, header_format)
 
         # Freeze the top row
         worksheet.freeze_panes(1, 0)
 
-        # Set column widths
-        self._set_column_widths(worksheet, df)
+    def _column_widths(self, df):
+        """
+        Estimate display widths for every column of a frame.
 
-    def _set_column_widths(self, worksheet, df):
-        """Calculate and set optimal column widths based on data."""
-        # Iterate through each column
+        Lengths are computed per column with vectorized string operations over
+        the first WIDTH_SAMPLE_ROWS rows. Results are cached per frame, so a
+        frame written to more than one sheet is only measured once.
+
+        Returns:
+            list: Width per column (header or longest value + 2, capped at MAX_COLUMN_WIDTH)
+        """
+        cached = self._width_cache.get(id(df))
+        if cached is not None and cached[0] is df:
+            return cached[1]
+
+        sample = df.head(self.WIDTH_SAMPLE_ROWS)
+        widths = []
         for i, col in enumerate(df.columns):
-            # Start with header width
-            max_width = len(str(col)) + 2
+            values = sample.iloc[:, i]
+            lengths = values.astype(str).str.len().where(values.notna(), 0)
+            longest = int(lengths.max()) if len(lengths) else 0
+            widths.append(min(max(len(str(col)), longest) + 2, self.MAX_COLUMN_WIDTH))
 
-            # Check width needed for data
-            for j in range(min(len(df), 1000)):  # Limit to first 1000 rows for performance
-                if j < len(df):
-                    cell_value = str(df.iloc[j, i]) if i < df.shape[1] and pd.notna(df.iloc[j, i]) else ''
-                    max_width = max(max_width, len(cell_value) + 2)
+        # Keep a reference to the frame so its id cannot be reused while cached
+        self._width_cache[id(df)] = (df, widths)
+        return widths
 
-            # Set column width with a maximum reasonable width
-            worksheet.set_column(i, i, min(max_width, 50))
+    def _set_column_widths(self, worksheet, df, column_formats=None):
+        """
+        Calculate and set optimal column widths based on data.
+
+        Args:
+            worksheet: xlsxwriter worksheet
+            df (DataFrame): Data written to the sheet
+            column_formats (dict): Column index -> default format for the column
+        """
+        column_formats = column_formats or {}
+        for i, width in enumerate(self._column_widths(df)):
+            worksheet.set_column(i, i, width, column_formats.get(i))
@@ -0,0 +1,106 @@
+"""
+Bounded LRU cache for line item ROI results.
+
+compute_line_item_roi is a pure function of six product fields and four
+calculation parameters, so its results can be shared between requests served
+by the same worker process. Entries are keyed by those inputs (with their
+types, since the debug payload echoes some of them back unchanged).
+"""
+
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 4096
+
+
+class LineItemCache:
+    """Thread-safe LRU cache with hit/miss counters."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        """
+        Args:
+            max_entries (int): Maximum number of cached results
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _copy_result(result):
+        """Copy a result dict; values are scalars apart from the nested debug dict."""
+        copied = dict(result)
+        if 'debug' in copied:
+            copied['debug'] = dict(copied['debug'])
+        return copied
+
+    @staticmethod
+    def make_key(values):
+        """
+        Build a cache key from the ROI inputs.
+
+        Returns:
+            tuple: Hashable key, or None if an input cannot be hashed
+        """
+        key = tuple((type(value).__name__, value) for value in values)
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached result for key, computing and storing it on a miss.
+
+        Callers get their own copy so mutating a result cannot corrupt the cache.
+
+        Args:
+            key (tuple): Key from make_key (None bypasses the cache)
+            compute (callable): Produces the result on a miss
+
+        Returns:
+            dict: The (copied) result
+        """
+        if key is None:
+            return compute()
+
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._copy_result(result)
+            self.misses += 1
+
+        # Compute outside the lock; a concurrent miss on the same key just stores it twice
+        result = compute()
+        with self._lock:
+            self._entries[key] = self._copy_result(result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+    def clear(self):
+        """Drop all entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        Returns:
+            dict: hits, misses, hitRate, size and maxEntries
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'maxEntries': self.max_entries
+            }
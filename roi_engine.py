@@ -0,0 +1,547 @@
+"""
+Columnar ROI engine for the multi-product buying calculator.
+Evaluates the linear depletion ROI model for a whole portfolio at once using
+NumPy arrays. Every formula mirrors MultiProductBuyingCalculator.compute_line_item_roi
+operation for operation so the batched results match the scalar ones exactly.
+"""
+
+import numbers
+import numpy as np
+
+# Product fields consumed by the ROI model, in the order they are packed
+ROI_INPUT_FIELDS = (
+    'annual_cases',
+    'bottles_per_case',
+    'current_price',
+    'bulk_price',
+    'bulk_quantity',
+    'on_hand',
+)
+
+# Row status codes
+STATUS_OK = 0
+STATUS_ZERO_VELOCITY = 1
+STATUS_NO_BULK = 2
+STATUS_ERROR = 3
+
+# Per-product metric columns returned by compute_roi_arrays
+METRIC_COLUMNS = (
+    'smallDealCases',
+    'avgInvSmall',
+    'avgInvBulk',
+    'deltaInvestment',
+    'savings',
+    'roi',
+    'annualizedRoi',
+    'daysToDepleteBulk',
+    'totalStockDays',
+    'dealCyclesPerYear',
+    'annualROIMultiplier',
+    'daysAtRisk',
+)
+
+# Columns that are only produced when the debug payload is requested
+DEBUG_COLUMNS = (
+    'dailyVelocity',
+    'daysQty',
+    'casesSoldDuringTerms',
+    'smallCasesLeft',
+    'bulkCasesLeft',
+    'smallDollarValue',
+    'bulkDollarValue',
+    'avgInventoryCases',
+)
+
+
+def is_number(value):
+    """Return True for real numbers the scalar model can do arithmetic with."""
+    return isinstance(value, numbers.Real)
+
+
+def roi_params(params):
+    """
+    Resolve the calculation parameters used by the ROI model.
+
+    Returns a tuple of (payment_terms_days, min_days_stock, deal_size_cases,
+    small_deal_minimum) using the same defaults as the scalar implementation.
+    """
+    payment_terms_days = params.get('paymentTermsDays', 30)
+    min_days_stock = params.get('minDaysStock', 30)
+    deal_size_cases = params.get('dealSizeCases', 60)
+    # Handle both old and new parameter names for backward compatibility
+    small_deal_minimum = params.get('smallDealCases', params.get('smallDealMinimum', 30))
+    return payment_terms_days, min_days_stock, deal_size_cases, small_deal_minimum
+
+
+def params_are_numeric(params):
+    """Return True if the batched engine can evaluate these parameters."""
+    values = roi_params(params)
+    # A zero deal size makes the scalar model raise, so leave it to that path
+    return all(is_number(value) for value in values) and values[2] != 0
+
+
+def empty_roi_columns(count, include_debug=False):
+    """Return zeroed result columns for count products, all flagged STATUS_ERROR."""
+    columns = {name: np.zeros(count, dtype=float) for name in METRIC_COLUMNS}
+    columns['status'] = np.full(count, STATUS_ERROR, dtype=np.int8)
+    columns['warning'] = np.zeros(count, dtype=bool)
+    if include_debug:
+        columns.update({name: np.zeros(count, dtype=float) for name in DEBUG_COLUMNS})
+    return columns
+
+
+def products_to_arrays(products):
+    """
+    Pack product dictionaries into one float array per ROI input field.
+
+    Products with a missing field use 0, like the scalar implementation.
+    Products with a non-numeric field are flagged in the returned mask so
+    callers can route them through the scalar path instead.
+
+    Args:
+        products (list): List of product dictionaries
+
+    Returns:
+        tuple: (dict of field name -> np.ndarray, np.ndarray of bool numeric mask)
+    """
+    count = len(products)
+    numeric = np.ones(count, dtype=bool)
+    columns = {field: np.zeros(count, dtype=float) for field in ROI_INPUT_FIELDS}
+
+    for i, product in enumerate(products):
+        for field in ROI_INPUT_FIELDS:
+            value = product.get(field, 0)
+            if is_number(value):
+                columns[field][i] = value
+            else:
+                numeric[i] = False
+
+    return columns, numeric
+
+
+def compute_roi_arrays(arrays, params, include_debug=False):
+    """
+    Compute line item ROI metrics for every product in one batched pass.
+
+    Args:
+        arrays (dict): Field arrays as returned by products_to_arrays
+        params (dict): Calculation parameters (must be numeric, dealSizeCases > 0)
+        include_debug (bool): Also return the intermediate debug columns
+
+    Returns:
+        dict: Column name -> np.ndarray. Includes a 'status' column holding
+              STATUS_OK, STATUS_ZERO_VELOCITY or STATUS_NO_BULK per row and a
+              boolean 'warning' column for rows below the minimum days stock.
+    """
+    payment_terms_days, min_days_stock, deal_size_cases, small_deal_minimum = roi_params(params)
+
+    annual_cases = arrays['annual_cases']
+    bottles_per_case = arrays['bottles_per_case']
+    price_small = arrays['current_price']
+    price_bulk = arrays['bulk_price']
+    bulk_cases = arrays['bulk_quantity']
+    on_hand_cases = arrays['on_hand']
+
+    status = np.full(annual_cases.shape, STATUS_OK, dtype=np.int8)
+    status[bulk_cases <= 0] = STATUS_NO_BULK
+    status[annual_cases <= 0] = STATUS_ZERO_VELOCITY
+    ok = status == STATUS_OK
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        daily_cases = annual_cases / 365
+
+        # Q₁ = ceiling(Q₂ × SmallDealMin/BulkDealMin)
+        small_deal_cases = np.ceil(bulk_cases * (small_deal_minimum / deal_size_cases))
+
+        # Total Savings: Q₂ × B × (P₁-P₂)
+        savings_per_bottle = price_small - price_bulk
+        total_savings = bulk_cases * bottles_per_case * savings_per_bottle
+
+        cases_sold_during_terms = daily_cases * payment_terms_days
+        small_cases_left = np.maximum(0, small_deal_cases - cases_sold_during_terms)
+        bulk_cases_left = np.maximum(0, bulk_cases - cases_sold_during_terms)
+
+        small_dollar_value = small_cases_left * price_small * bottles_per_case
+        bulk_dollar_value = bulk_cases_left * price_bulk * bottles_per_case
+        avg_dollar_small = small_dollar_value / 2
+        avg_dollar_bulk = bulk_dollar_value / 2
+        delta_investment = avg_dollar_bulk - avg_dollar_small
+
+        roi = np.where(delta_investment > 0, total_savings / delta_investment, 0.0)
+
+        days_to_deplete_bulk = bulk_cases / daily_cases
+        days_at_risk = np.where(bulk_cases_left > 0, bulk_cases_left / daily_cases, 0.0)
+        annual_roi_multiplier = np.where(days_at_risk > 0, 365 / days_at_risk, 0.0)
+        annualized_roi = np.where(days_at_risk > 0, roi * (365 / days_at_risk), roi)
+
+        total_stock_days = (on_hand_cases + bulk_cases) / daily_cases
+        avg_inventory_cases = (on_hand_cases + bulk_cases) / 2
+        deal_cycles_per_year = np.where(avg_inventory_cases > 0, annual_cases / avg_inventory_cases, 0.0)
+
+    def masked(values):
+        return np.where(ok, values, 0.0)
+
+    columns = {
+        'status': status,
+        'smallDealCases': masked(small_deal_cases),
+        'avgInvSmall': masked(avg_dollar_small),
+        'avgInvBulk': masked(avg_dollar_bulk),
+        'deltaInvestment': masked(delta_investment),
+        'savings': masked(total_savings),
+        'roi': masked(roi),
+        'annualizedRoi': masked(annualized_roi),
+        'daysToDepleteBulk': masked(days_to_deplete_bulk),
+        'totalStockDays': masked(total_stock_days),
+        'dealCyclesPerYear': masked(deal_cycles_per_year),
+        'annualROIMultiplier': masked(annual_roi_multiplier),
+        'daysAtRisk': masked(days_at_risk),
+        'warning': ok & (total_stock_days < min_days_stock),
+    }
+
+    if include_debug:
+        columns.update({
+            'dailyVelocity': masked(daily_cases),
+            'daysQty': masked(np.ceil(daily_cases * min_days_stock)),
+            'casesSoldDuringTerms': masked(cases_sold_during_terms),
+            'smallCasesLeft': masked(small_cases_left),
+            'bulkCasesLeft': masked(bulk_cases_left),
+            'smallDollarValue': masked(small_dollar_value),
+            'bulkDollarValue': masked(bulk_dollar_value),
+            'avgInventoryCases': masked(avg_inventory_cases),
+        })
+
+    return columns
+
+
+def sequential_sum(values):
+    """
+    Sum an array left to right.
+
+    np.sum uses pairwise summation, which can differ in the last bits from the
+    running totals the scalar code accumulates; cumsum keeps the same order.
+    """
+    if len(values) == 0:
+        return 0.0
+    return float(np.cumsum(values)[-1])
+
+
+def scalar_result_row(result):
+    """
+    Convert a compute_line_item_roi result into batched column values.
+
+    Returns:
+        tuple: (status, dict of metric column -> value, warning flag)
+    """
+    if 'error' in result:
+        status = STATUS_ZERO_VELOCITY if result['error'] == "Zero velocity" else STATUS_ERROR
+        return status, {name: 0.0 for name in METRIC_COLUMNS}, False
+
+    status = STATUS_OK if 'debug' in result else STATUS_NO_BULK
+    values = {name: result.get(name, 0) for name in METRIC_COLUMNS}
+    values['daysAtRisk'] = result.get('debug', {}).get('daysAtRisk', 0)
+    return status, values, 'warning' in result
+
+
+# Per-product contributions to the portfolio sums
+CONTRIBUTION_COLUMNS = (
+    'deltaInvestment',
+    'savings',
+    'annualCases',
+    'avgInventory',
+    'weightedDaysAtRisk',
+    'investmentForWeighting',
+)
+
+
+def row_contributions(arrays, columns):
+    """
+    Return each product's contribution to the portfolio running sums.
+
+    Zero velocity and failed rows carry an 'error' in the scalar model and
+    contribute nothing.
+    """
+    status = columns['status']
+    valid = (status == STATUS_OK) | (status == STATUS_NO_BULK)
+
+    delta_investment = np.where(valid, columns['deltaInvestment'], 0.0)
+    days_at_risk = columns['daysAtRisk']
+    # Weight days at risk by actual investment amounts for portfolio calculation
+    weighted = valid & (delta_investment > 0) & (days_at_risk > 0)
+
+    return {
+        'deltaInvestment': delta_investment,
+        'savings': np.where(valid, columns['savings'], 0.0),
+        'annualCases': np.where(valid, arrays['annual_cases'], 0.0),
+        'avgInventory': np.where(valid, (arrays['on_hand'] + arrays['bulk_quantity']) / 2, 0.0),
+        'weightedDaysAtRisk': np.where(weighted, days_at_risk * delta_investment, 0.0),
+        'investmentForWeighting': np.where(weighted, delta_investment, 0.0),
+    }
+
+
+def portfolio_metrics(totals):
+    """
+    Compute portfolio ROI metrics from the running sums.
+
+    Args:
+        totals (dict): CONTRIBUTION_COLUMNS name -> summed value
+
+    Returns:
+        dict: Portfolio ROI metrics
+    """
+    total_delta_investment = totals['deltaInvestment']
+    total_savings = totals['savings']
+    total_avg_inventory = totals['avgInventory']
+    total_investment_for_weighting = totals['investmentForWeighting']
+
+    # Calculate portfolio ROI
+    portfolio_roi = total_savings / total_delta_investment if total_delta_investment > 0 else 0
+
+    # Calculate portfolio deal cycles per year (raw inventory turnover, unadjusted)
+    portfolio_deal_cycles = totals['annualCases'] / total_avg_inventory if total_avg_inventory > 0 else 0
+
+    # Calculate investment-weighted average days at risk for portfolio
+    weighted_avg_days_at_risk = 0
+    portfolio_roi_multiplier = 0
+    if total_investment_for_weighting > 0:
+        weighted_avg_days_at_risk = totals['weightedDaysAtRisk'] / total_investment_for_weighting
+        # Annual ROI multiplier (after-terms) based on investment-weighted average exposure
+        portfolio_roi_multiplier = 365 / weighted_avg_days_at_risk if weighted_avg_days_at_risk > 0 else 0
+
+    return {
+        'roi': portfolio_roi,
+        'dealCyclesPerYear': portfolio_deal_cycles,
+        'annualROIMultiplier': portfolio_roi_multiplier,
+        'weightedAvgDaysAtRisk': weighted_avg_days_at_risk,
+        'totalDeltaInvestment': total_delta_investment,
+        'totalSavings': total_savings
+    }
+
+
+def portfolio_from_columns(arrays, columns):
+    """Aggregate batched line item columns into portfolio ROI metrics."""
+    contributions = row_contributions(arrays, columns)
+    return portfolio_metrics({name: sequential_sum(values) for name, values in contributions.items()})
+
+
+class PortfolioState:
+    """
+    Running portfolio sums for incremental swap evaluation.
+
+    Holds the per-product ROI columns and each product's contribution to the
+    portfolio totals. Moving cases between two products only re-evaluates
+    those two rows and patches the totals, so scoring a swap costs O(1)
+    instead of recomputing the whole portfolio.
+    """
+
+    def __init__(self, arrays, columns, params, evaluate_fallback=None):
+        """
+        Args:
+            arrays (dict): Product input arrays from products_to_arrays
+            columns (dict): Result columns for those arrays
+            params (dict): Calculation parameters
+            evaluate_fallback (callable): (row index, bulk quantity) -> scalar
+                result dict, used for rows the vectorized path cannot handle
+        """
+        self.arrays = {name: values.copy() for name, values in arrays.items()}
+        self.columns = {name: columns[name].copy() for name in METRIC_COLUMNS + ('status', 'warning')}
+        self.params = params
+        self.fallback_rows = set(columns.get('scalar', {}))
+        self.evaluate_fallback = evaluate_fallback
+        self.vectorized = params_are_numeric(params)
+
+        self.contributions = row_contributions(self.arrays, self.columns)
+        self.totals = {name: sequential_sum(values) for name, values in self.contributions.items()}
+
+    def metrics(self):
+        """Current portfolio ROI metrics."""
+        return portfolio_metrics(self.totals)
+
+    def _evaluate_rows(self, bulk_quantities):
+        """Evaluate the given rows ({row index: bulk quantity}) and return their new column values."""
+        indexes = list(bulk_quantities)
+        sub_arrays = {name: values[indexes].copy() for name, values in self.arrays.items()}
+        sub_arrays['bulk_quantity'] = np.array([bulk_quantities[i] for i in indexes], dtype=float)
+
+        if self.vectorized:
+            sub_columns = compute_roi_arrays(sub_arrays, self.params)
+        else:
+            sub_columns = empty_roi_columns(len(indexes))
+
+        for position, index in enumerate(indexes):
+            if index in self.fallback_rows or not self.vectorized:
+                status, values, warning = scalar_result_row(self.evaluate_fallback(index, bulk_quantities[index]))
+                sub_columns['status'][position] = status
+                for name in METRIC_COLUMNS:
+                    sub_columns[name][position] = values[name]
+                sub_columns['warning'][position] = warning
+
+        return indexes, sub_arrays, sub_columns
+
+    def score_move(self, source, target, cases=1):
+        """
+        Score moving cases from one product to another without applying it.
+
+        Args:
+            source (int): Row index giving up cases
+            target (int): Row index receiving cases
+            cases (int): Number of cases to move
+
+        Returns:
+            tuple: (portfolio metrics after the move, pending move for apply_move)
+        """
+        bulk_quantities = {source: self.arrays['bulk_quantity'][source] - cases}
+        bulk_quantities[target] = bulk_quantities.get(target, self.arrays['bulk_quantity'][target]) + cases
+
+        indexes, sub_arrays, sub_columns = self._evaluate_rows(bulk_quantities)
+        new_contributions = row_contributions(sub_arrays, sub_columns)
+
+        totals = dict(self.totals)
+        for name in CONTRIBUTION_COLUMNS:
+            for position, index in enumerate(indexes):
+                totals[name] += new_contributions[name][position] - self.contributions[name][index]
+
+        pending = {
+            'indexes': indexes,
+            'bulk_quantity': sub_arrays['bulk_quantity'],
+            'columns': sub_columns,
+            'contributions': new_contributions,
+            'totals': totals,
+        }
+        return portfolio_metrics(totals), pending
+
+    def apply_move(self, pending):
+        """Commit a move previously scored by score_move."""
+        indexes = pending['indexes']
+        self.arrays['bulk_quantity'][indexes] = pending['bulk_quantity']
+        for name in self.columns:
+            self.columns[name][indexes] = pending['columns'][name]
+        for name in CONTRIBUTION_COLUMNS:
+            self.contributions[name][indexes] = pending['contributions'][name]
+        self.totals = pending['totals']
+
+
+# Parameters a what-if grid can sweep
+GRID_PARAMETERS = ('dealSizeCases', 'paymentTermsDays', 'minDaysStock', 'smallDealCases')
+
+# (grid point, product) rows evaluated per batch, which bounds the grid's working memory
+GRID_CHUNK_CELLS = 50_000
+
+# Portfolio metrics returned for every grid point
+GRID_METRICS = (
+    'roi',
+    'annualizedRoi',
+    'annualROIMultiplier',
+    'weightedAvgDaysAtRisk',
+    'dealCyclesPerYear',
+    'totalDeltaInvestment',
+    'totalSavings',
+)
+
+
+def largest_remainder_allocation(weights, totals):
+    """
+    Split each total into whole cases in proportion to weights.
+
+    Floors the proportional shares, then hands the leftover cases to the
+    largest fractional parts (earlier products win ties), like
+    MultiProductBuyingCalculator.allocate_proportional.
+
+    Args:
+        weights (ndarray): Non-negative weight per product, shape (N,)
+        totals (ndarray): Whole number of cases to split, shape (P,)
+
+    Returns:
+        ndarray: Cases per product for each total, shape (P, N)
+    """
+    weights = np.asarray(weights, dtype=float)
+    totals = np.asarray(totals, dtype=float).reshape(-1)
+
+    raw_cases = totals[:, None] * (weights / weights.sum())[None, :]
+    cases = np.floor(raw_cases)
+    leftover = totals - cases.sum(axis=1)
+
+    order = np.argsort(-(raw_cases - cases), axis=1, kind='stable')
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.broadcast_to(np.arange(len(weights)), order.shape), axis=1)
+    return cases + (ranks < leftover[:, None])
+
+
+def sequential_sum_rows(values):
+    """Row-wise sequential_sum for a 2-D array."""
+    if values.shape[1] == 0:
+        return np.zeros(values.shape[0])
+    return np.cumsum(values, axis=1)[:, -1]
+
+
+def portfolio_metric_arrays(totals):
+    """Vectorized portfolio_metrics over arrays of running sums."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        roi = np.where(totals['deltaInvestment'] > 0, totals['savings'] / totals['deltaInvestment'], 0.0)
+        deal_cycles = np.where(totals['avgInventory'] > 0, totals['annualCases'] / totals['avgInventory'], 0.0)
+
+        weighted = totals['investmentForWeighting'] > 0
+        weighted_avg_days_at_risk = np.where(weighted, totals['weightedDaysAtRisk'] / totals['investmentForWeighting'], 0.0)
+        multiplier = np.where(weighted & (weighted_avg_days_at_risk > 0), 365 / weighted_avg_days_at_risk, 0.0)
+
+    return {
+        'roi': roi,
+        'annualizedRoi': roi * multiplier,
+        'annualROIMultiplier': multiplier,
+        'weightedAvgDaysAtRisk': weighted_avg_days_at_risk,
+        'dealCyclesPerYear': deal_cycles,
+        'totalDeltaInvestment': totals['deltaInvestment'],
+        'totalSavings': totals['savings'],
+    }
+
+
+def evaluate_parameter_grid(arrays, params, grid, rescale_allocation=False):
+    """
+    Evaluate portfolio ROI for every point of a parameter grid in one pass.
+
+    The grid is the Cartesian product of the given parameter values. Every
+    (grid point, product) pair is evaluated as one row of a 2-D batch, in
+    batches of at most GRID_CHUNK_CELLS rows.
+
+    Args:
+        arrays (dict): Product input arrays from products_to_arrays
+        params (dict): Base calculation parameters
+        grid (dict): GRID_PARAMETERS name -> list of values to sweep
+        rescale_allocation (bool): Rescale the bulk quantities to each point's
+            deal size (in proportion to the current bulk quantities, or to
+            annual sales when none are set) instead of keeping them fixed
+
+    Returns:
+        tuple: (grid shape, dict of GRID_METRICS name -> ndarray of that shape)
+    """
+    names = list(grid)
+    axes = [np.asarray(grid[name], dtype=float) for name in names]
+    shape = tuple(len(values) for values in axes)
+    mesh = [values.reshape(-1, 1) for values in np.meshgrid(*axes, indexing='ij')]
+    points = int(np.prod(shape))
+
+    weights = None
+    if rescale_allocation and len(arrays['bulk_quantity']) > 0:
+        weights = arrays['bulk_quantity'] if arrays['bulk_quantity'].sum() > 0 else arrays['annual_cases']
+
+    metrics = {name: np.empty(points) for name in GRID_METRICS}
+    chunk = max(1, GRID_CHUNK_CELLS // max(len(arrays['bulk_quantity']), 1))
+    for start in range(0, points, chunk):
+        stop = min(start + chunk, points)
+        point_params = dict(params)
+        for name, values in zip(names, mesh):
+            point_params[name] = values[start:stop]
+
+        point_arrays = {field: np.broadcast_to(values, (stop - start, len(values))).copy()
+                        for field, values in arrays.items()}
+        if weights is not None:
+            deal_sizes = np.broadcast_to(roi_params(point_params)[2], (stop - start, 1))[:, 0]
+            point_arrays['bulk_quantity'] = largest_remainder_allocation(weights, deal_sizes)
+
+        columns = compute_roi_arrays(point_arrays, point_params)
+        contributions = row_contributions(point_arrays, columns)
+        totals = {name: sequential_sum_rows(values) for name, values in contributions.items()}
+        chunk_metrics = portfolio_metric_arrays(totals)
+        for name in GRID_METRICS:
+            metrics[name][start:stop] = chunk_metrics[name]
+
+    return shape, {name: metrics[name].reshape(shape) for name in GRID_METRICS}
@@ -4,8 +4,48 @@ import openpyxl
 from openpyxl.utils.dataframe import dataframe_to_rows
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 import os
+import re
 import json
+import time
+import tempfile
+import threading
+import uuid
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
+from tax_rates import TaxRateTable, DEFAULT_RATES_PATH
+
+# Worker processes writing batch workbooks, shared by every request in the process
+MAX_REPORT_WORKERS = min(4, os.cpu_count() or 1)
+
+_report_pool = None
+_report_pool_lock = threading.Lock()
+
+
+def _get_report_pool():
+    """
+    Return the shared workbook-writing pool, starting it on first use.
+
+    Workers are spawned rather than forked, because forking a multithreaded
+    web server can copy a lock that another thread is holding.
+    """
+    global _report_pool
+    with _report_pool_lock:
+        if _report_pool is None:
+            _report_pool = ProcessPoolExecutor(max_workers=MAX_REPORT_WORKERS,
+                                               mp_context=multiprocessing.get_context('spawn'))
+        return _report_pool
+
+
+def _discard_report_pool(pool):
+    """Forget a pool whose worker died, so the next batch starts a fresh one."""
+    global _report_pool
+    with _report_pool_lock:
+        if _report_pool is pool:
+            _report_pool = None
+    pool.shutdown(wait=False)
 
 class SalesTaxCalculator:
     """
@@ -13,237 +53,193 @@ class SalesTaxCalculator:
     actual sales amounts and properly distribute taxes to appropriate authorities.
     """
 
-    def __init__(self):
-        """Initialize the calculator with tax rates and jurisdiction data."""
-        # Tax rates and jurisdictions - matches data from the Constants sheet
-        self.jurisdictions = {
-            "040206": {"name": "UNINCORPORATED", "city_name": "FALCON", "county": "EL PASO",
-                      "city_tax": 0.0000, "county_tax": 0.0123, "rta_tax": 0.0100, "state_tax": 0.0290,
-                      "total_tax": 0.0513, "state_service_fee": 0.0400, "city_service_fee": 0.0000,
-                      "city_collection": "State Collected"},
-            "040206-1": {"name": "UNINCORPORATED", "city_name": "SECURITY/WIDEFIELD", "county": "EL PASO",
-                      "city_tax": 0.0000, "county_tax": 0.0123, "rta_tax": 0.0100, "state_tax": 0.0290,
-                      "total_tax": 0.0513, "state_service_fee": 0.0400, "city_service_fee": 0.0000,
-                      "city_collection": "State Collected"},
-            "040206-2": {"name": "UNINCORPORATED", "city_name": "CHIPITA PARK", "county": "EL PASO",
-                      "city_tax": 0.0000, "county_tax": 0.0123, "rta_tax": 0.0100, "state_tax": 0.0290,
-                      "total_tax": 0.0513, "state_service_fee": 0.0400, "city_service_fee": 0.0000,
-                      "city_collection": "State Collected"},
-            "040206-3": {"name": "UNINCORPORATED", "city_name": "PEYTON", "county": "EL PASO",
-                      "city_tax": 0.0000, "county_tax": 0.0123, "rta_tax": 0.0100, "state_tax": 0.0290,
-                      "total_tax": 0.0513, "state_service_fee": 0.0400, "city_service_fee": 0.0000,
-                      "city_collection": "State Collected"},
-            "040017": {"name": "COLORADO SPRINGS", "city_name": "COLORADO SPRINGS", "county": "EL PASO",
-                      "city_tax": 0.0307, "county_tax": 0.0123, "rta_tax": 0.0100, "state_tax": 0.0290,
-                      "total_tax": 0.0820, "state_service_fee": 0.0400, "city_service_fee": 0.0000,
-                      "city_collection": "Self Collected"},
-            "040059": {"name": "PALMER LAKE", "city_name": "PALMER LAKE", "county": "EL PASO",
-                      "city_tax": 0.0300, "county_tax": 0.0123, "rta_tax": 0.0000, "state_tax": 0.0290,
-                      "total_tax": 0.0713, "state_service_fee": 0.0400, "city_service_fee": 0.0330,
-                      "city_collection": "State Collected"},
-            "040052": {"name": "MANITOU SPRINGS", "city_name": "MANITOU SPRINGS", "county": "EL PASO",
-                      "city_tax": 0.0390, "county_tax": 0.0123, "rta_tax": 0.0100, "state_tax": 0.0290,
-                      "total_tax": 0.0903, "state_service_fee": 0.0400, "city_service_fee": 0.0000,
-                      "city_collection": "State Collected"},
-            "040097": {"name": "WOODLAND PARK", "city_name": "WOODLAND PARK", "county": "EL PASO",
-                      "city_tax": 0.0300, "county_tax": 0.0123, "rta_tax": 0.0100, "state_tax": 0.0290,
-                      "total_tax": 0.0813, "state_service_fee": 0.0400, "city_service_fee": 0.0000,
-                      "city_collection": "Self Collected"},
-            "040031": {"name": "FOUNTAIN", "city_name": "FOUNTAIN", "county": "EL PASO",
-                      "city_tax": 0.0340, "county_tax": 0.0123, "rta_tax": 0.0000, "state_tax": 0.0290,
-                      "total_tax": 0.0753, "state_service_fee": 0.0400, "city_service_fee": 0.0000,
-                      "city_collection": "State Collected"},
-            "040057": {"name": "MONUMENT", "city_name": "MONUMENT", "county": "EL PASO",
-                      "city_tax": 0.0350, "county_tax": 0.0123, "rta_tax": 0.0000, "state_tax": 0.0290,
-                      "total_tax": 0.0763, "state_service_fee": 0.0400, "city_service_fee": 0.0330,
-                      "city_collection": "Self Collected"},
-        }
+    def __init__(self, rates_path=DEFAULT_RATES_PATH):
+        """
+        Initialize the calculator with tax rates and jurisdiction data.
 
-    def calculate_sales_from_tax(self, tax_data):
+        Args:
+            rates_path: CSV of versioned jurisdiction rates (see tax_rates.py)
+        """
+        self.rate_table = TaxRateTable(rates_path)
+
+    # Collected-tax input columns; missing or blank amounts count as zero
+    TAX_COLUMNS = ['standard_tax', 'cigarette_tax', 'soda_tax']
+
+    SALES_COLUMNS = [
+        'jurisdiction_code', 'city_name', 'jurisdiction_name', 'total_tax_collected',
+        'standard_sales', 'cigarette_sales', 'soda_sales', 'total_sales',
+        'calculated_state_net_tax', 'calculated_city_tax', 'calculated_total_net_tax'
+    ]
+
+    TAX_CALC_COLUMNS = [
+        'jurisdiction_code', 'city_name', 'calculated_county_tax', 'calculated_city_tax',
+        'calculated_rta_tax', 'calculated_state_tax', 'calculated_total_tax',
+        'calculated_city_svc_fee', 'calculated_state_svc_fee', 'calculated_state_net_tax',
+        'calculated_city_net_tax', 'calculated_total_net_tax'
+    ]
+
+    def calculate_tax_frame(self, tax_data, as_of=None):
+        """
+        Calculate sales and every tax component for many rows at once
+
+        Args:
+            tax_data: List of dictionaries or a DataFrame with the columns
+                described in calculate_sales_from_tax. Any other columns (for
+                example a filing period or location) are carried through, so a
+                whole year of filings can be calculated in one call.
+            as_of: Date whose rates apply (today by default). Rows with their
+                own as_of value use the rates in effect on that date instead.
+
+        Returns:
+            DataFrame with the input columns, the tax amounts as floats and the
+            calculated columns, one row per input row whose jurisdiction has
+            rates on its date
+        """
+        frame = pd.DataFrame(tax_data).reset_index(drop=True)
+        for column in ['jurisdiction_code', 'city_name']:
+            if column not in frame:
+                frame[column] = ''
+        for column in self.TAX_COLUMNS:
+            if column in frame:
+                # Same as float(value or 0) per row
+                values = frame[column].where(frame[column].astype(bool) & frame[column].notna(), 0)
+                frame[column] = pd.to_numeric(values).astype(float)
+            else:
+                frame[column] = 0.0
+
+        dates = as_of
+        if 'as_of' in frame:
+            dates = pd.to_datetime(frame['as_of']).fillna(pd.Timestamp(as_of or datetime.now().date()))
+        # A (code, city name) match picks the sub-area of a shared code such as 040206;
+        # other cities get the code's default rates
+        rates, positions = self.rate_table.resolve(
+            frame['jurisdiction_code'].fillna('').astype(str).to_numpy(),
+            frame['city_name'].fillna('').astype(str).to_numpy(),
+            dates
+        )
+        # Skip invalid jurisdiction codes
+        known = positions >= 0
+        frame = frame[known].reset_index(drop=True)
+        rate = rates.iloc[positions[known]].reset_index(drop=True)
+
+        standard_tax = frame['standard_tax'].to_numpy()
+        cigarette_tax = frame['cigarette_tax'].to_numpy()
+        soda_tax = frame['soda_tax'].to_numpy()
+        total_tax_rate = rate['total_tax'].to_numpy(dtype=float)
+
+        # Sales = Tax / Tax Rate, for positive amounts at a positive rate
+        divisor = np.where(total_tax_rate > 0, total_tax_rate, 1.0)
+
+        def sales_from(tax):
+            return np.where((tax > 0) & (total_tax_rate > 0), tax / divisor, 0.0)
+
+        standard_sales = sales_from(standard_tax)
+        cigarette_sales = sales_from(cigarette_tax)
+        soda_sales = sales_from(soda_tax)
+        total_sales = standard_sales + cigarette_sales + soda_sales
+
+        # Individual tax components
+        city_tax = rate['city_tax'].to_numpy(dtype=float) * total_sales
+        county_tax = rate['county_tax'].to_numpy(dtype=float) * total_sales
+        rta_tax = rate['rta_tax'].to_numpy(dtype=float) * total_sales
+        state_tax = rate['state_tax'].to_numpy(dtype=float) * total_sales
+
+        # Service fees, and net tax after them
+        city_service_fee = city_tax * rate['city_service_fee'].to_numpy(dtype=float)
+        state_service_fee = state_tax * rate['state_service_fee'].to_numpy(dtype=float)
+        state_net_tax = state_tax + county_tax + rta_tax - state_service_fee
+        # City tax is only remitted directly when the city collects it
+        city_net_tax = np.where(rate['city_collection'].to_numpy() == 'Self Collected', city_tax, 0.0)
+
+        return frame.assign(
+            jurisdiction_name=rate['name'].to_numpy(),
+            total_tax_collected=standard_tax + cigarette_tax + soda_tax,
+            standard_sales=standard_sales,
+            cigarette_sales=cigarette_sales,
+            soda_sales=soda_sales,
+            total_sales=total_sales,
+            calculated_county_tax=county_tax,
+            calculated_city_tax=city_tax,
+            calculated_rta_tax=rta_tax,
+            calculated_state_tax=state_tax,
+            calculated_total_tax=city_tax + county_tax + rta_tax + state_tax,
+            calculated_city_svc_fee=city_service_fee,
+            calculated_state_svc_fee=state_service_fee,
+            calculated_state_net_tax=state_net_tax,
+            calculated_city_net_tax=city_net_tax,
+            calculated_total_net_tax=state_net_tax + city_net_tax
+        )
+
+    def _with_totals(self, frame, columns):
+        """Select columns and append a totals row summing the numeric ones."""
+        frame = frame[columns]
+        totals = frame.drop(columns=['jurisdiction_code', 'city_name', 'jurisdiction_name'],
+                            errors='ignore').sum().to_dict()
+        totals.update({column: '' for column in columns if column not in totals})
+        return pd.concat([frame, pd.DataFrame([totals], columns=columns)], ignore_index=True)
+
+    def calculate_sales_from_tax(self, tax_data, as_of=None):
         """
         Calculate sales amounts and tax distribution based on collected tax amounts
 
         Args:
-            tax_data: List of dictionaries containing jurisdiction codes and tax amounts
-                Each dictionary should have:
+            tax_data: List of dictionaries (or a DataFrame) containing jurisdiction codes and tax amounts
+                Each row should have:
                 - jurisdiction_code: The jurisdiction code
                 - city_name: The city name
                 - standard_tax: The standard tax amount collected
                 - cigarette_tax: Optional cigarette tax amount collected
                 - soda_tax: Optional soda tax amount collected
+            as_of: Date whose rates apply, for recalculating past periods (today by default)
 
         Returns:
             Dict containing calculation results
         """
-        # Initialize result DataFrames
-        sales_results = []
-        tax_calcs = []
-
-        # Process each jurisdiction
-        total_tax_collected = 0
-        total_standard_sales = 0
-        total_cig_sales = 0
-        total_soda_sales = 0
-        total_sales = 0
-
-        for item in tax_data:
-            code = item['jurisdiction_code']
-
-            # Handle unincorporated areas with same code but different names
-            if code == '040206':
-                city_name = item['city_name']
-                # Find the correct entry by matching city name
-                for key, data in self.jurisdictions.items():
-                    if key.startswith('040206') and data['city_name'] == city_name:
-                        code = key
-                        break
-                # If no match found, use default 040206
-                if code == '040206' and city_name != 'FALCON':
-                    code = '040206'  # Default unincorporated
-
-            if code not in self.jurisdictions:
-                # Skip invalid jurisdiction codes
-                continue
-
-            # Get jurisdiction tax rates
-            jurisdiction = self.jurisdictions[code]
-
-            # Get tax amounts collected or default to zero
-            standard_tax = float(item.get('standard_tax', 0) or 0)
-            cigarette_tax = float(item.get('cigarette_tax', 0) or 0)
-            soda_tax = float(item.get('soda_tax', 0) or 0)
-
-            # Calculate total tax collected for this jurisdiction
-            total_jurisdiction_tax = standard_tax + cigarette_tax + soda_tax
-
-            # Calculate sales amount for each tax category by working backwards from tax collected
-            # Sales = Tax / Tax Rate
-            total_tax_rate = jurisdiction['total_tax']
-            if total_tax_rate > 0:
-                standard_sales = standard_tax / total_tax_rate if standard_tax > 0 else 0
-                cigarette_sales = cigarette_tax / total_tax_rate if cigarette_tax > 0 else 0
-                soda_sales = soda_tax / total_tax_rate if soda_tax > 0 else 0
-                total_jurisdiction_sales = standard_sales + cigarette_sales + soda_sales
-            else:
-                standard_sales = 0
-                cigarette_sales = 0
-                soda_sales = 0
-                total_jurisdiction_sales = 0
-
-            # Calculate individual tax components
-            city_tax_amount = jurisdiction['city_tax'] * total_jurisdiction_sales
-            county_tax_amount = jurisdiction['county_tax'] * total_jurisdiction_sales
-            rta_tax_amount = jurisdiction['rta_tax'] * total_jurisdiction_sales
-            state_tax_amount = jurisdiction['state_tax'] * total_jurisdiction_sales
-            calculated_total_tax = city_tax_amount + county_tax_amount + rta_tax_amount + state_tax_amount
-
-            # Calculate service fees
-            city_service_fee = city_tax_amount * jurisdiction['city_service_fee']
-            state_service_fee = state_tax_amount * jurisdiction['state_service_fee']
-
-            # Calculate net tax amounts (after service fees)
-            state_net_tax = state_tax_amount + county_tax_amount + rta_tax_amount - state_service_fee
-
-            # Determine if city tax goes to state or directly to city
-            city_net_tax = 0
-            if jurisdiction['city_collection'] == 'Self Collected':
-                city_net_tax = city_tax_amount
-
-            # Total net tax
-            total_net_tax = state_net_tax + city_net_tax
-
-            # Add to sales results
-            sales_results.append({
-                'jurisdiction_code': item['jurisdiction_code'],
-                'city_name': item['city_name'],
-                'jurisdiction_name': jurisdiction['name'],
-                'total_tax_collected': total_jurisdiction_tax,
-                'standard_sales': standard_sales,
-                'cigarette_sales': cigarette_sales,
-                'soda_sales': soda_sales,
-                'total_sales': total_jurisdiction_sales,
-                'calculated_state_net_tax': state_net_tax,
-                'calculated_city_tax': city_net_tax,
-                'calculated_total_net_tax': total_net_tax
-            })
+        return self._results(self.calculate_tax_frame(tax_data, as_of))
 
-            # Add to tax calculations
-            tax_calcs.append({
-                'jurisdiction_code': item['jurisdiction_code'],
-                'city_name': item['city_name'],
-                'calculated_county_tax': county_tax_amount,
-                'calculated_city_tax': city_tax_amount,
-                'calculated_rta_tax': rta_tax_amount,
-                'calculated_state_tax': state_tax_amount,
-                'calculated_total_tax': calculated_total_tax,
-                'calculated_city_svc_fee': city_service_fee,
-                'calculated_state_svc_fee': state_service_fee,
-                'calculated_state_net_tax': state_net_tax,
-                'calculated_city_net_tax': city_net_tax,
-                'calculated_total_net_tax': total_net_tax
-            })
-
-            # Add to totals
-            total_tax_collected += total_jurisdiction_tax
-            total_standard_sales += standard_sales
-            total_cig_sales += cigarette_sales
-            total_soda_sales += soda_sales
-            total_sales += total_jurisdiction_sales
-
-        # Add totals row to sales results
-        sales_results.append({
-            'jurisdiction_code': '',
-            'city_name': '',
-            'jurisdiction_name': '',
-            'total_tax_collected': total_tax_collected,
-            'standard_sales': total_standard_sales,
-            'cigarette_sales': total_cig_sales,
-            'soda_sales': total_soda_sales,
-            'total_sales': total_sales,
-            'calculated_state_net_tax': sum(item['calculated_state_net_tax'] for item in tax_calcs),
-            'calculated_city_tax': sum(item['calculated_city_net_tax'] for item in tax_calcs),
-            'calculated_total_net_tax': sum(item['calculated_total_net_tax'] for item in tax_calcs)
-        })
-
-        # Add totals row to tax calculations
-        tax_calcs.append({
-            'jurisdiction_code': '',
-            'city_name': '',
-            'calculated_county_tax': sum(item['calculated_county_tax'] for item in tax_calcs),
-            'calculated_city_tax': sum(item['calculated_city_tax'] for item in tax_calcs),
-            'calculated_rta_tax': sum(item['calculated_rta_tax'] for item in tax_calcs),
-            'calculated_state_tax': sum(item['calculated_state_tax'] for item in tax_calcs),
-            'calculated_total_tax': sum(item['calculated_total_tax'] for item in tax_calcs),
-            'calculated_city_svc_fee': sum(item['calculated_city_svc_fee'] for item in tax_calcs),
-            'calculated_state_svc_fee': sum(item['calculated_state_svc_fee'] for item in tax_calcs),
-            'calculated_state_net_tax': sum(item['calculated_state_net_tax'] for item in tax_calcs),
-            'calculated_city_net_tax': sum(item['calculated_city_net_tax'] for item in tax_calcs),
-            'calculated_total_net_tax': sum(item['calculated_total_net_tax'] for item in tax_calcs)
-        })
-
-        # Convert lists to DataFrames
-        sales_df = pd.DataFrame(sales_results)
-        tax_calcs_df = pd.DataFrame(tax_calcs)
+    def _results(self, calculated):
+        """Split a calculate_tax_frame result into the sales and tax calculation tables."""
+        # The summary reports the city tax actually remitted to the city
+        sales = calculated.drop(columns=['calculated_city_tax']).rename(
+            columns={'calculated_city_net_tax': 'calculated_city_tax'})
 
         return {
-            'sales_calculations': sales_df,
-            'tax_calculations': tax_calcs_df
+            'sales_calculations': self._with_totals(sales, self.SALES_COLUMNS),
+            'tax_calculations': self._with_totals(calculated, self.TAX_CALC_COLUMNS)
         }
 
-    def generate_report(self, tax_data, file_path):
+    def generate_report(self, tax_data, file_path, as_of=None):
         """
         Generate an Excel report with sales tax calculations
 
         Args:
             tax_data: List of dictionaries containing jurisdiction codes and tax amounts
             file_path: Path where the Excel file will be saved
+            as_of: Date whose rates apply (today by default)
 
         Returns:
             Path to the generated Excel file
         """
         # Calculate results
-        results = self.calculate_sales_from_tax(tax_data)
+        results = self.calculate_sales_from_tax(tax_data, as_of)
+        return self.write_report(results, self.rate_table.effective(as_of), tax_data, file_path)
+
+    @staticmethod
+    def write_report(results, rates, tax_data, file_path):
+        """
+        Write calculated results to an Excel report
 
+        Static so that it can run in a worker process.
+
+        Args:
+            results: Dict returned by calculate_sales_from_tax
+            rates: DataFrame of the rates in effect, for the rate reference section
+            tax_data: List of dictionaries of the input rows
+            file_path: Path where the Excel file will be saved
+
+        Returns:
+            Path to the generated Excel file
+        """
         # Extract the DataFrames
         sales_df = results['sales_calculations']
         tax_calcs_df = results['tax_calculations']
@@ -399,8 +395,8 @@ class SalesTaxCalculator:
 
         # Write Tax Rates data
         row_idx = start_row + 2
-        for code, data in self.jurisdictions.items():
-            ws_summary.cell(row=row_idx, column=1).value = code.split('-')[0]  # Remove suffixes for display
+        for data in rates.to_dict('records'):
+            ws_summary.cell(row=row_idx, column=1).value = data['code']
             ws_summary.cell(row=row_idx, column=2).value = data['city_name']
             ws_summary.cell(row=row_idx, column=3).value = data['name']
             ws_summary.cell(row=row_idx, column=4).value = data['county']
@@ -478,3 +474,101 @@ class SalesTaxCalculator:
         wb.save(file_path)
 
         return file_path
+
+    def generate_reports(self, filings, directory, max_workers=None):
+        """
+        Generate one report per filing and bundle them into a single zip file
+
+        Every filing is calculated in one pass over all of their rows; the
+        workbooks are then written in parallel by a process pool shared
+        across requests.
+
+        Args:
+            filings: List of dictionaries, each with
+                - period: Filing period, such as "2025-01" or "2025Q1"
+                - tax_data: List of dictionaries as for calculate_sales_from_tax
+                - location: Optional location name, added to the file name
+                - as_of: Optional date whose rates apply (default: start of the period)
+            directory: Folder where the zip file is saved
+            max_workers: 1 writes the workbooks in this process; otherwise they
+                are written by the shared pool of MAX_REPORT_WORKERS processes
+
+        Returns:
+            Dict with the zip_path, a files list (filename, period, location,
+            total_sales and total_net_tax per filing) and timings in
+            milliseconds (compute_ms, write_ms, zip_ms, total_ms)
+        """
+        if not filings:
+            raise ValueError("No filings provided")
+        started = time.perf_counter()
+
+        # Calculate every filing at once, each at the rates of its own period
+        dates = [pd.Timestamp(filing.get('as_of') or pd.Period(filing['period']).start_time)
+                 for filing in filings]
+        frames = [pd.DataFrame(filing['tax_data']).assign(filing=index, as_of=dates[index])
+                  for index, filing in enumerate(filings)]
+        calculated = self.calculate_tax_frame(pd.concat(frames, ignore_index=True))
+        parts = dict(iter(calculated.groupby('filing')))
+
+        rates_by_date = {date: self.rate_table.effective(date) for date in set(dates)}
+        jobs = []
+        files = []
+        used_names = set()
+        for index, filing in enumerate(filings):
+            results = self._results(parts.get(index, calculated.iloc[:0]))
+            totals = results['sales_calculations'].iloc[-1]
+
+            name = re.sub(r'[^A-Za-z0-9._-]+', '_', '_'.join(
+                str(part) for part in ['sales_tax', filing['period'], filing.get('location')] if part))
+            filename = f"{name}.xlsx"
+            copy = 1
+            while filename in used_names:
+                copy += 1
+                filename = f"{name}_{copy}.xlsx"
+            used_names.add(filename)
+
+            jobs.append((results, rates_by_date[dates[index]], filing['tax_data'], filename))
+            files.append({
+                'filename': filename,
+                'period': filing['period'],
+                'location': filing.get('location', ''),
+                'total_sales': float(totals['total_sales']),
+                'total_net_tax': float(totals['calculated_total_net_tax'])
+            })
+        computed = time.perf_counter()
+
+        # The random suffix keeps batches generated in the same second apart
+        zip_path = os.path.join(directory, f"sales_tax_batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}.zip")
+        # Absolute paths, because the pooled workers keep the directory they started in
+        with tempfile.TemporaryDirectory(dir=os.path.abspath(directory)) as work_dir:
+            paths = [os.path.join(work_dir, filename) for _, _, _, filename in jobs]
+            arguments = list(zip(*[job[:3] + (path,) for job, path in zip(jobs, paths)]))
+            if min(max_workers or MAX_REPORT_WORKERS, len(jobs)) > 1:
+                pool = _get_report_pool()
+                try:
+                    list(pool.map(SalesTaxCalculator.write_report, *arguments))
+                except BrokenProcessPool:
+                    _discard_report_pool(pool)
+                    raise
+            else:
+                list(map(SalesTaxCalculator.write_report, *arguments))
+            written = time.perf_counter()
+
+            # Workbooks are already compressed, so they are stored as-is
+            temp_zip = os.path.join(work_dir, 'batch.zip')
+            with zipfile.ZipFile(temp_zip, 'w', compression=zipfile.ZIP_STORED) as archive:
+                for path in paths:
+                    archive.write(path, os.path.basename(path))
+            os.replace(temp_zip, zip_path)
+        finished = time.perf_counter()
+
+        return {
+            'zip_path': zip_path,
+            'files': files,
+            'timings': {
+                'compute_ms': (computed - started) * 1000,
+                'write_ms': (written - computed) * 1000,
+                'zip_ms': (finished - written) * 1000,
+                'total_ms': (finished - started) * 1000
+            }
+        }
@@ -1,12 +1,13 @@
 """
 Scenario management module for the multi-product calculator.
 Provides functions for loading, saving, and managing scenarios.
+Scenarios are stored in the shared scenario database (see scenario_store.py).
 """
 
 import os
-import json
 import logging
 from validator import validate_product, validate_calculator_params, ValidationError
+from scenario_store import ScenarioStore, SCENARIOS_DB, directory_records
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -23,10 +24,14 @@ class ScenarioManager:
         Initialize the scenario manager.
 
         Parameters:
-        - scenarios_dir: Directory to store scenario files
+        - scenarios_dir: Directory holding the scenario database; any
+          <name>.json files already in it are imported the first time
         """
         self.scenarios_dir = scenarios_dir
         self._ensure_scenarios_dir()
+        legacy_dir = os.path.abspath(scenarios_dir)
+        self.store = ScenarioStore(os.path.join(legacy_dir, SCENARIOS_DB), kind='portfolio',
+                                   legacy=lambda: directory_records(legacy_dir))
 
     def _ensure_scenarios_dir(self):
         """Ensure the scenarios directory exists."""
@@ -40,19 +45,11 @@ class ScenarioManager:
 
         Returns: List of scenario names
         """
-        self._ensure_scenarios_dir()
-        scenarios = []
-
-        for filename in os.listdir(self.scenarios_dir):
-            if filename.endswith(".json"):
-                scenario_name = filename[:-5]  # Remove .json extension
-                scenarios.append(scenario_name)
-
-        return scenarios
+        return self.store.names()
 
     def load_scenario(self, scenario_name):
         """
-        Load a scenario from file.
+        Load a saved scenario.
 
         Parameters:
         - scenario_name: Name of the scenario to load
@@ -67,39 +64,35 @@ class ScenarioManager:
         # Sanitize scenario name to prevent directory traversal
         scenario_name = os.path.basename(scenario_name)
 
-        # Construct path to scenario file
-        file_path = os.path.join(self.scenarios_dir, f"{scenario_name}.json")
+        try:
+            scenario_data = self.store.get(scenario_name)
+        except Exception as e:
+            raise ScenarioError(f"Error loading scenario: {e}")
 
-        # Check if file exists
-        if not os.path.exists(file_path):
+        # Check if scenario exists
+        if scenario_data is None:
             raise ScenarioError(f"Scenario '{scenario_name}' not found")
 
         try:
-            # Load scenario from file
-            with open(file_path, 'r') as f:
-                scenario_data = json.load(f)
-
             # Validate scenario data
             self._validate_scenario(scenario_data)
 
             return scenario_data
 
-        except json.JSONDecodeError as e:
-            raise ScenarioError(f"Invalid JSON in scenario file: {e}")
-
         except ValidationError as e:
             raise ScenarioError(f"Invalid scenario data: {e}")
 
         except Exception as e:
             raise ScenarioError(f"Error loading scenario: {e}")
 
-    def save_scenario(self, scenario_name, scenario_data):
+    def save_scenario(self, scenario_name, scenario_data, tags=None):
         """
-        Save a scenario to file.
+        Save a scenario.
 
         Parameters:
         - scenario_name: Name of the scenario
         - scenario_data: Dictionary with scenario data
+        - tags: Optional list of tags (None keeps the scenario's current tags)
 
         Raises ScenarioError if scenario name invalid or data invalid
         """
@@ -116,19 +109,12 @@ class ScenarioManager:
         except ValidationError as e:
             raise ScenarioError(f"Invalid scenario data: {e}")
 
-        # Ensure scenarios directory exists
-        self._ensure_scenarios_dir()
-
-        # Construct path to scenario file
-        file_path = os.path.join(self.scenarios_dir, f"{scenario_name}.json")
-
         try:
             # Convert numpy types to native Python types for JSON serialization
             sanitized_data = self._sanitize_for_json(scenario_data)
 
-            # Save scenario to file
-            with open(file_path, 'w') as f:
-                json.dump(sanitized_data, f, indent=2)
+            # Save scenario to the database
+            self.store.save(scenario_name, sanitized_data, tags)
 
             logger.info(f"Saved scenario '{scenario_name}'")
 
@@ -154,22 +140,24 @@ class ScenarioManager:
         # Sanitize scenario name to prevent directory traversal
         scenario_name = os.path.basename(scenario_name)
 
-        # Construct path to scenario file
-        file_path = os.path.join(self.scenarios_dir, f"{scenario_name}.json")
-
-        # Check if file exists
-        if not os.path.exists(file_path):
-            return False
-
         try:
-            # Delete the file
-            os.remove(file_path)
+            # Delete the row
+            if not self.store.delete(scenario_name):
+                return False
             logger.info(f"Deleted scenario '{scenario_name}'")
             return True
 
         except Exception as e:
             raise ScenarioError(f"Error deleting scenario: {e}")
 
+    def search_scenarios(self, prefix=None, tag=None, order='updated', limit=None, offset=0):
+        """
+        Search saved scenarios by name prefix and/or tag in one indexed query.
+
+        Returns: List of dicts with name, updated_at and tags
+        """
+        return self.store.search(prefix=prefix, tag=tag, order=order, limit=limit, offset=offset)
+
     def _validate_scenario(self, scenario_data):
         """
         Validate scenario data.
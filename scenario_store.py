@@ -0,0 +1,347 @@
+"""
+SQLite repository for every kind of saved scenario.
+
+Deal Split scenarios, ScenarioManager portfolios and Multi-Product Buying
+Calculator scenarios all live in one database (scenarios/scenarios.db by
+default), one row per scenario with its data kept as a JSON payload. Rows
+are keyed by kind plus the trimmed, lower-cased name, so saving or deleting
+a scenario touches only that row, and listing or searching is a single
+query over the (kind, key), (kind, name), (kind, updated_at) and tag
+indexes without reading any payloads. The database runs in WAL mode and
+every write is its own transaction, so readers never wait on a save and
+concurrent savers are serialized by SQLite instead of clobbering each other.
+The first time a kind is opened, its legacy files are imported.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import closing, contextmanager
+from datetime import datetime
+
+from migrate_scenarios import migrate_product
+from scenario_utils import load_all_scenarios
+
+logger = logging.getLogger(__name__)
+
+SCENARIOS_DB = 'scenarios.db'
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scenarios', SCENARIOS_DB)
+
+BUSY_TIMEOUT_SECONDS = 10
+
+SEARCH_ORDERS = {
+    'name': 's.key',
+    'updated': 's.updated_at DESC, s.key',
+}
+
+# Separates tags in the group_concat of a search result (tags cannot contain it)
+TAG_SEPARATOR = '\x1f'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scenarios (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    name TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    UNIQUE (kind, key)
+);
+CREATE INDEX IF NOT EXISTS scenarios_kind_name ON scenarios (kind, name);
+CREATE INDEX IF NOT EXISTS scenarios_kind_updated ON scenarios (kind, updated_at);
+CREATE TABLE IF NOT EXISTS scenario_tags (
+    scenario_id INTEGER NOT NULL REFERENCES scenarios (id) ON DELETE CASCADE,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (tag, scenario_id)
+);
+CREATE INDEX IF NOT EXISTS scenario_tags_scenario ON scenario_tags (scenario_id);
+CREATE TABLE IF NOT EXISTS seeded_kinds (kind TEXT PRIMARY KEY);
+"""
+
+UPSERT = ("INSERT INTO scenarios (kind, key, name, payload, updated_at) VALUES (?, ?, ?, ?, ?) "
+          "ON CONFLICT (kind, key) DO UPDATE SET name = excluded.name, payload = excluded.payload, "
+          "updated_at = excluded.updated_at")
+INSERT_NEW = "INSERT OR IGNORE INTO scenarios (kind, key, name, payload, updated_at) VALUES (?, ?, ?, ?, ?)"
+CLEAR_TAGS = "DELETE FROM scenario_tags WHERE scenario_id = (SELECT id FROM scenarios WHERE kind = ? AND key = ?)"
+ADD_TAG = "INSERT OR IGNORE INTO scenario_tags (scenario_id, tag) SELECT id, ? FROM scenarios WHERE kind = ? AND key = ?"
+
+
+def scenario_key(name):
+    """Names match case-insensitively and ignoring surrounding whitespace."""
+    return name.strip().lower()
+
+
+def normalize_tags(tags):
+    """Trimmed, lower-cased, de-duplicated tags in their original order."""
+    normalized = []
+    for tag in tags:
+        tag = str(tag).replace(TAG_SEPARATOR, '').strip().lower()
+        if tag and tag not in normalized:
+            normalized.append(tag)
+    return normalized
+
+
+def _timestamp(seconds=None):
+    moment = datetime.now() if seconds is None else datetime.fromtimestamp(seconds)
+    return moment.isoformat(timespec='seconds')
+
+
+def json_file_records(file_path):
+    """Import records for a single-file {name: data} store such as the old scenarios.json."""
+    if not os.path.exists(file_path):
+        return []
+    updated_at = _timestamp(os.path.getmtime(file_path))
+    return [{'name': name, 'data': data, 'updated_at': updated_at}
+            for name, data in load_all_scenarios(file_path).items()]
+
+
+def sqlite_records(db_path, kind):
+    """
+    Import records for one kind from an older scenario database, such as the
+    Deal Split store that lived in ./scenarios.db.
+    """
+    if not os.path.exists(db_path):
+        return []
+    with closing(sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True)) as conn:
+        rows = conn.execute("SELECT name, payload, updated_at FROM scenarios WHERE kind = ? ORDER BY id",
+                            (kind,)).fetchall()
+    return [{'name': name, 'data': json.loads(payload), 'updated_at': updated_at}
+            for name, payload, updated_at in rows]
+
+
+def directory_records(directory):
+    """
+    Import records for a directory of <name>.json scenario files.
+
+    Files that are not valid JSON are logged and skipped. A "tags" list in
+    a scenario's data becomes its tags.
+    """
+    if not os.path.isdir(directory):
+        return []
+    records = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.json'):
+            continue
+        file_path = os.path.join(directory, filename)
+        try:
+            with open(file_path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Skipping scenario file {file_path}: {e}")
+            continue
+        tags = data.get('tags') if isinstance(data, dict) else None
+        records.append({'name': filename[:-5], 'data': data,
+                        'tags': tags if isinstance(tags, list) else None,
+                        'updated_at': _timestamp(os.path.getmtime(file_path))})
+    return records
+
+
+def multi_product_records(directory):
+    """Import records for Multi-Product scenario files, with old product keys renamed."""
+    records = directory_records(directory)
+    for record in records:
+        data = record['data']
+        if isinstance(data, dict) and isinstance(data.get('products'), list):
+            data['products'] = [migrate_product(p) for p in data['products']]
+    return records
+
+
+def deal_split_records(db_path, file_path):
+    """
+    Import records for Deal Split scenarios from the first database at db_path,
+    or from the single-file store at file_path if that database never existed
+    (the database was seeded from the file, so it is the newer of the two).
+    """
+    if os.path.exists(db_path):
+        return sqlite_records(db_path, 'deal_split')
+    return json_file_records(file_path)
+
+
+class ScenarioStore:
+    """Saved scenarios of one kind in the shared SQLite repository."""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, kind='deal_split', legacy=None):
+        """
+        Parameters:
+        - db_path: SQLite database file (created on first use)
+        - kind: Which calculator's scenarios this store holds
+        - legacy: Optional callable returning import records, used to seed an empty kind
+        """
+        self.db_path = os.path.abspath(db_path)
+        self.kind = kind
+        self.legacy = legacy
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # isolation_level=None leaves transactions to the explicit BEGIN IMMEDIATE in _transaction
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    def _open(self):
+        """Create the schema, switch to WAL and import legacy files on first use."""
+        if self._ready:
+            return
+        with self._lock:
+            if self._ready:
+                return
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            with closing(self._connect()) as conn:
+                conn.execute("PRAGMA journal_mode = WAL")
+                conn.executescript(SCHEMA)
+            self._ready = True
+            if self.legacy is not None:
+                self._seed()
+
+    def _seed(self):
+        self.seed(self.legacy)
+
+    def seed(self, load, force=False):
+        """
+        Import legacy scenarios the first time this kind is seeded.
+
+        Seeding happens once per kind, whether on first open or by a
+        migration, so deleting a scenario does not bring the legacy one back.
+        Existing scenarios are never overwritten.
+
+        Parameters:
+        - load: Callable returning import records (only called when seeding)
+        - force: Add missing legacy scenarios even if the kind was seeded before
+
+        Returns: Number of scenarios inserted
+        """
+        with self._transaction() as conn:
+            first = conn.execute("INSERT OR IGNORE INTO seeded_kinds (kind) VALUES (?)", (self.kind,)).rowcount > 0
+            if not first and not force:
+                return 0
+            return self._import(conn, load(), replace=False)
+
+    @contextmanager
+    def _transaction(self):
+        """A connection inside one write transaction, committed on success."""
+        self._open()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _read(self, sql, params):
+        self._open()
+        with closing(self._connect()) as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def _import(self, conn, records, replace):
+        now = _timestamp()
+        if replace:
+            existing = set()
+        else:
+            # Scenarios that are already saved (or earlier in records) are left alone, tags included
+            existing = {row['key'] for row in conn.execute("SELECT key FROM scenarios WHERE kind = ?", (self.kind,))}
+        rows, tag_keys, tag_rows = [], [], []
+        for record in records:
+            key = scenario_key(record['name'])
+            if key in existing:
+                continue
+            if not replace:
+                existing.add(key)
+            rows.append((self.kind, key, record['name'].strip(), json.dumps(record['data']),
+                         record.get('updated_at') or now))
+            if record.get('tags') is not None:
+                tag_keys.append((self.kind, key))
+                tag_rows.extend((tag, self.kind, key) for tag in normalize_tags(record['tags']))
+        imported = conn.executemany(UPSERT if replace else INSERT_NEW, rows).rowcount
+        conn.executemany(CLEAR_TAGS, tag_keys)
+        conn.executemany(ADD_TAG, tag_rows)
+        return imported
+
+    def import_many(self, records, replace=True):
+        """
+        Save many scenarios in one transaction with prepared statements.
+
+        Parameters:
+        - records: Iterable of dicts with name and data, and optionally tags and updated_at
+        - replace: Overwrite scenarios that already exist (otherwise they are left alone)
+
+        Returns: Number of scenarios inserted or replaced
+        """
+        with self._transaction() as conn:
+            return self._import(conn, records, replace)
+
+    def save(self, name, data, tags=None):
+        """Insert or replace the scenario called name (tags=None keeps its current tags)."""
+        self.import_many([{'name': name, 'data': data, 'tags': tags}])
+
+    def get(self, name):
+        """
+        Returns:
+            The saved data, or None if there is no such scenario
+        """
+        rows = self._read("SELECT payload FROM scenarios WHERE kind = ? AND key = ?", (self.kind, scenario_key(name)))
+        return json.loads(rows[0]['payload']) if rows else None
+
+    def delete(self, name):
+        """
+        Returns:
+            bool: True if a scenario was deleted
+        """
+        with self._transaction() as conn:
+            return conn.execute("DELETE FROM scenarios WHERE kind = ? AND key = ?",
+                                (self.kind, scenario_key(name))).rowcount > 0
+
+    def names(self):
+        """Scenario names in the order they were first saved, read from the index alone."""
+        return [row['name'] for row in
+                self._read("SELECT name FROM scenarios INDEXED BY scenarios_kind_name WHERE kind = ? ORDER BY id",
+                           (self.kind,))]
+
+    def all(self):
+        """
+        Returns:
+            dict: Scenario name -> saved data, in the order they were first saved
+        """
+        rows = self._read("SELECT name, payload FROM scenarios WHERE kind = ? ORDER BY id", (self.kind,))
+        return {row['name']: json.loads(row['payload']) for row in rows}
+
+    def search(self, prefix=None, tag=None, order='updated', limit=None, offset=0):
+        """
+        List scenarios without loading their data.
+
+        Parameters:
+        - prefix: Only names starting with this (case-insensitive)
+        - tag: Only scenarios with this tag
+        - order: 'updated' (most recent first) or 'name'
+        - limit, offset: Page through the results
+
+        Returns: List of dicts with name, updated_at and tags
+        """
+        if order not in SEARCH_ORDERS:
+            raise ValueError(f"order must be one of {', '.join(SEARCH_ORDERS)}")
+
+        clauses, params = ["s.kind = ?"], [TAG_SEPARATOR, self.kind]
+        if prefix:
+            # A key range rather than LIKE, so the (kind, key) index serves it
+            start = scenario_key(prefix)
+            clauses.append("s.key >= ? AND s.key < ?")
+            params += [start, start + '\U0010ffff']
+        if tag:
+            clauses.append("s.id IN (SELECT scenario_id FROM scenario_tags WHERE tag = ?)")
+            params += normalize_tags([tag]) or ['']
+        params += [limit if limit is not None else -1, offset]
+
+        rows = self._read(
+            f"SELECT s.name, s.updated_at, "
+            f"(SELECT group_concat(t.tag, ?) FROM scenario_tags t WHERE t.scenario_id = s.id) AS tags "
+            f"FROM scenarios s WHERE {' AND '.join(clauses)} ORDER BY {SEARCH_ORDERS[order]} LIMIT ? OFFSET ?",
+            params)
+        return [{'name': row['name'], 'updated_at': row['updated_at'],
+                 'tags': sorted(row['tags'].split(TAG_SEPARATOR)) if row['tags'] else []}
+                for row in rows]
@@ -39,7 +39,7 @@ def list_scenario_files(scenarios_dir):
             scenarios.append(scenario_name)
     return scenarios
 
-# Single-file scenario management for DealSplitCalculator
+# Single-file scenarios.json that DealSplitCalculator used before scenario_store.py
 
 def load_all_scenarios(scenarios_file):
     if not os.path.exists(scenarios_file):
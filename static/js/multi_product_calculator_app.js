@@ -976,6 +976,7 @@ document.addEventListener('DOMContentLoaded', function() {
             const minDaysStock = parseInt(document.getElementById('minDaysStock').value);
             const paymentTermsDays = parseInt(document.getElementById('paymentTermsDays').value);
             const iterations = document.getElementById('iterations').value;
+            const optimizationMode = (iterations === 'exact' || iterations === 'multistart') ? iterations : 'iterative';
             const params = {
                 // Backend validation keys
                 small_deal_minimum: smallDealCases,
@@ -987,7 +988,11 @@ document.addEventListener('DOMContentLoaded', function() {
                 dealSizeCases: dealSizeCases,
                 minDaysStock: minDaysStock,
                 paymentTermsDays: paymentTermsDays,
-                iterations: iterations
+                // The exact and multi-start modes share the iterations dropdown
+                iterations: optimizationMode === 'iterative' ? iterations : 'auto',
+                optimizationMode: optimizationMode,
+                // Only swap deltas plus periodic checkpoints; replayed client-side
+                historyMode: 'compact'
             };
 
             console.log('Optimization products:', products);
@@ -1053,6 +1058,45 @@ document.addEventListener('DOMContentLoaded', function() {
         console.error('iterateBtn not found!');
     }
 
+    // Replay a compact optimization history into the bulk allocation after each entry.
+    // Entries carry either a checkpoint (full list of bulk quantities), a product
+    // snapshot (full history mode), or a swap delta applied to the previous entry.
+    function replayOptimizationHistory(history) {
+        let current = null;
+        return history.map(entry => {
+            if (entry.separator) {
+                current = null;
+                return null;
+            }
+            if (entry.products) {
+                current = entry.products.map(p => p.bulk_quantity || 0);
+            } else if (entry.checkpoint) {
+                current = entry.checkpoint.slice();
+            } else if (current) {
+                current = current.slice();
+                const swap = entry.swapped;
+                if (swap && swap.fromIndex !== undefined && swap.toIndex !== undefined) {
+                    const cases = swap.cases || 1;
+                    current[swap.fromIndex] -= cases;
+                    current[swap.toIndex] += cases;
+                }
+            }
+            return current;
+        });
+    }
+
+    // Restore the bulk cases from a replayed history allocation into the input table
+    function restoreHistoryAllocation(allocation) {
+        const rows = productsTableBody.querySelectorAll('tr:not(#productRowTemplate):not(#totalRow)');
+        rows.forEach((row, index) => {
+            const bulkCasesInput = row.querySelector('.product-bulk-cases');
+            if (bulkCasesInput && allocation[index] !== undefined) {
+                bulkCasesInput.value = allocation[index];
+            }
+        });
+        validateBulkCasesTotals();
+    }
+
     // Function to update optimization history
     function updateOptimizationHistory(history) {
         const historyBody = document.getElementById('optimizationHistoryBody');
@@ -1069,6 +1113,7 @@ document.addEventListener('DOMContentLoaded', function() {
         let prevRoi = 0;
         let runNumber = 1;
         let isVeryFirstOptimization = true; // Track if this is the very first optimization overall
+        const allocations = replayOptimizationHistory(history);
 
         history.forEach((iteration, index) => {
             const row = document.createElement('tr');
@@ -1126,6 +1171,13 @@ document.addEventListener('DOMContentLoaded', function() {
                 </td>
             `;
 
+            // Clicking a row restores the allocation at that point in the run
+            if (allocations[index]) {
+                row.style.cursor = 'pointer';
+                row.title = 'Click to restore this allocation';
+                row.addEventListener('click', () => restoreHistoryAllocation(allocations[index]));
+            }
+
             historyBody.appendChild(row);
             if (!iteration.separator) {
                 prevRoi = roi;
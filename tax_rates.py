@@ -0,0 +1,154 @@
+"""
+Jurisdiction sales tax rate table, loaded from sales_tax_rates.csv.
+
+Each row of the file is one version of a jurisdiction's rates, effective from
+effective_from (inclusive) up to effective_to (exclusive); a blank date leaves
+that end open. A jurisdiction is identified by its code and city name, since
+several unincorporated areas share code 040206. The first city listed for a
+code is its default, used when a row's city name is not in the table.
+
+Lookups go through a hash on (code, city) and, per jurisdiction, an interval
+index on the effective dates. The file is reloaded only when its modification
+time or size changes, so rates can be edited without restarting the app.
+"""
+
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+DEFAULT_RATES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sales_tax_rates.csv')
+
+RATE_COLUMNS = ['city_tax', 'county_tax', 'rta_tax', 'state_tax', 'total_tax',
+                'state_service_fee', 'city_service_fee']
+TEXT_COLUMNS = ['code', 'city_name', 'name', 'county', 'city_collection']
+
+
+def _as_dates(value, size=None):
+    """Normalize a date, list of dates or None (today) to a datetime64 array."""
+    if value is None:
+        value = pd.Timestamp.today().normalize()
+    dates = pd.to_datetime(pd.Series(value) if np.ndim(value) else pd.Series([value])).to_numpy()
+    if size is not None and len(dates) == 1:
+        dates = np.repeat(dates, size)
+    return dates
+
+
+class _LoadedRates:
+    """One loaded version of the rate file and its indexes."""
+
+    def __init__(self, rates):
+        self.rates = rates
+        keys = rates[['code', 'city_name']].drop_duplicates()
+        self.by_city = pd.MultiIndex.from_frame(keys)
+        # Default jurisdiction for each code: its first listed city
+        first_per_code = keys.drop_duplicates('code')
+        self.by_code = pd.Index(first_per_code['code'])
+        self.code_defaults = self.by_city.get_indexer(pd.MultiIndex.from_frame(first_per_code))
+
+        # Interval index of effective dates per jurisdiction, with the matching rate rows
+        key_ids = self.by_city.get_indexer(pd.MultiIndex.from_frame(rates[['code', 'city_name']]))
+        self.versions = []
+        for key_id, (code, city) in enumerate(self.by_city):
+            rows = np.flatnonzero(key_ids == key_id)
+            rows = rows[np.argsort(rates['effective_from'].to_numpy()[rows], kind='stable')]
+            intervals = pd.IntervalIndex.from_arrays(rates['effective_from'].to_numpy()[rows],
+                                                     rates['effective_to'].to_numpy()[rows], closed='left')
+            if intervals.is_overlapping:
+                raise ValueError(f"Overlapping effective dates for {code} {city}")
+            self.versions.append((intervals, rows))
+
+    def jurisdiction_ids(self, codes, cities):
+        """Hash (code, city) pairs to jurisdiction ids, falling back to the code's default; -1 if unknown."""
+        matches = self.by_city.get_indexer(pd.MultiIndex.from_arrays([codes, cities]))
+        code_matches = self.by_code.get_indexer(codes)
+        defaults = np.where(code_matches >= 0, self.code_defaults[code_matches], -1)
+        return np.where(matches >= 0, matches, defaults)
+
+    def positions(self, key_ids, dates):
+        """Rate row effective on each date for each jurisdiction id; -1 where none applies."""
+        positions = np.full(len(key_ids), -1)
+        # Filings share a handful of dates, so search each distinct date once
+        unique_dates, date_ids = np.unique(dates, return_inverse=True)
+        for key_id in np.unique(key_ids[key_ids >= 0]):
+            selected = key_ids == key_id
+            intervals, rows = self.versions[key_id]
+            found = intervals.get_indexer(unique_dates)[date_ids[selected]]
+            positions[selected] = np.where(found >= 0, rows[found], -1)
+        return positions
+
+
+class TaxRateTable:
+    """Versioned jurisdiction rates, reloaded when the data file changes."""
+
+    def __init__(self, path=DEFAULT_RATES_PATH):
+        """
+        Args:
+            path (str): CSV file of jurisdiction rates
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._signature = None
+        self._loaded = None
+
+    def _read(self):
+        """Read and validate the rate file."""
+        rates = pd.read_csv(self.path, dtype={column: str for column in TEXT_COLUMNS}, keep_default_na=False)
+        missing = [column for column in TEXT_COLUMNS + RATE_COLUMNS if column not in rates]
+        if missing:
+            raise ValueError(f"Rate file {self.path} is missing columns: {', '.join(missing)}")
+
+        rates[RATE_COLUMNS] = rates[RATE_COLUMNS].apply(pd.to_numeric).astype(float)
+        for column, open_end in (('effective_from', pd.Timestamp.min), ('effective_to', pd.Timestamp.max)):
+            values = rates[column] if column in rates else pd.Series('', index=rates.index)
+            rates[column] = pd.to_datetime(values.replace('', pd.NaT)).fillna(open_end)
+        return rates[TEXT_COLUMNS + RATE_COLUMNS + ['effective_from', 'effective_to']]
+
+    def _current(self):
+        """Return the loaded rates, reloading them if the file has changed."""
+        stat = os.stat(self.path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature != self._signature:
+            with self._lock:
+                if signature != self._signature:
+                    self._loaded = _LoadedRates(self._read())
+                    self._signature = signature
+        return self._loaded
+
+    def resolve(self, codes, cities, as_of=None):
+        """
+        Find the rates in effect for many rows at once.
+
+        Args:
+            codes: Jurisdiction codes as strings
+            cities: City names as strings
+            as_of: Date (or one date per row) the rates apply to; today by default
+
+        Returns:
+            tuple: (rates DataFrame, array of row positions in it, -1 where no
+                   jurisdiction or version matches)
+        """
+        loaded = self._current()
+        codes = np.asarray(codes, dtype=object)
+        key_ids = loaded.jurisdiction_ids(codes, np.asarray(cities, dtype=object))
+        return loaded.rates, loaded.positions(key_ids, _as_dates(as_of, len(codes)))
+
+    def lookup(self, code, city_name, as_of=None):
+        """
+        Returns:
+            dict: Rates for one jurisdiction on a date, or None if unknown
+        """
+        rates, positions = self.resolve([code], [city_name], as_of)
+        if positions[0] < 0:
+            return None
+        return rates.iloc[positions[0]].to_dict()
+
+    def effective(self, as_of=None):
+        """
+        Returns:
+            DataFrame: Every jurisdiction's rates in effect on a date, in file order
+        """
+        loaded = self._current()
+        rates = loaded.rates
+        date = _as_dates(as_of)[0]
+        return rates[(rates['effective_from'] <= date) & (date < rates['effective_to'])].reset_index(drop=True)
@@ -0,0 +1,134 @@
+import itertools
+import unittest
+import allocation_solver
+import roi_engine
+import app as app_module
+from multi_product_calculator import MultiProductBuyingCalculator
+
+class TestAllocationSolver(unittest.TestCase):
+    def setUp(self):
+        self.calc = MultiProductBuyingCalculator()
+        self.params = {
+            'dealSizeCases': 10,
+            'minDaysStock': 30,
+            'paymentTermsDays': 15,
+            'smallDealCases': 5,
+            'optimizationMode': 'exact'
+        }
+        self.products = [
+            {'product_name': 'Fast', 'current_price': 19.99, 'bulk_price': 15.99, 'on_hand': 4,
+             'annual_cases': 400, 'bottles_per_case': 12, 'bulk_quantity': 4},
+            {'product_name': 'Medium', 'current_price': 24.99, 'bulk_price': 21.49, 'on_hand': 2,
+             'annual_cases': 150, 'bottles_per_case': 12, 'bulk_quantity': 3},
+            {'product_name': 'Slow', 'current_price': 32.5, 'bulk_price': 26.0, 'on_hand': 1,
+             'annual_cases': 40, 'bottles_per_case': 6, 'bulk_quantity': 3},
+        ]
+
+    def annualized(self, products):
+        metrics = self.calc.calculate_portfolio_roi(products, self.params)
+        return metrics['roi'] * metrics['annualROIMultiplier']
+
+    def brute_force_best(self, lower, upper):
+        best = None
+        for allocation in itertools.product(*(range(lo, hi + 1) for lo, hi in zip(lower, upper))):
+            if sum(allocation) != self.params['dealSizeCases']:
+                continue
+            value = self.annualized([dict(p, bulk_quantity=q) for p, q in zip(self.products, allocation)])
+            best = value if best is None else max(best, value)
+        return best
+
+    def test_exact_mode_finds_best_allocation(self):
+        result = self.calc.optimize({'products': self.products, 'parameters': dict(self.params)})
+        self.assertEqual(sum(p['bulk_quantity'] for p in result['products']), 10)
+        self.assertAlmostEqual(result['portfolioROI'] * result['portfolioROIMultiplier'],
+                               self.brute_force_best([0, 0, 0], [10, 10, 10]), places=9)
+        self.assertTrue(result['solver']['exact'])
+        self.assertAlmostEqual(result['solver']['optimalityGap'], 0, places=6)
+        self.assertGreaterEqual(result['solver']['solveTimeMs'], 0)
+
+    def test_per_sku_bounds(self):
+        self.products[0]['max_bulk_quantity'] = 3
+        self.products[2]['min_bulk_quantity'] = 2
+        result = self.calc.optimize({'products': self.products, 'parameters': dict(self.params)})
+        quantities = [p['bulk_quantity'] for p in result['products']]
+        self.assertLessEqual(quantities[0], 3)
+        self.assertGreaterEqual(quantities[2], 2)
+        self.assertAlmostEqual(result['portfolioROI'] * result['portfolioROIMultiplier'],
+                               self.brute_force_best([0, 0, 2], [3, 10, 10]), places=9)
+
+    def test_negative_delta_investment_allocations_are_considered(self):
+        # With no payment terms the best allocation gives Medium and Slow one case each,
+        # and at one case each their bulk buy ties up less than the small deal
+        self.params.update(dealSizeCases=6, smallDealCases=3, minDaysStock=14, paymentTermsDays=0)
+        best = self.brute_force_best([0, 0, 0], [6, 6, 6])
+        result = self.calc.optimize({'products': self.products, 'parameters': dict(self.params)})
+        self.assertEqual([p['bulk_quantity'] for p in result['products']], [4, 1, 1])
+        self.assertAlmostEqual(result['portfolioROI'] * result['portfolioROIMultiplier'], best, places=9)
+        self.assertTrue(result['solver']['exact'])
+
+    def test_large_problems_with_negative_delta_investment_are_not_called_exact(self):
+        self.params.update(dealSizeCases=6, smallDealCases=3, minDaysStock=14, paymentTermsDays=0)
+        limit = allocation_solver.ENUMERATION_LIMIT
+        allocation_solver.ENUMERATION_LIMIT = 0
+        try:
+            result = self.calc.optimize({'products': self.products, 'parameters': dict(self.params)})
+        finally:
+            allocation_solver.ENUMERATION_LIMIT = limit
+        self.assertFalse(result['solver']['exact'])
+        self.assertIsNone(result['solver']['optimalityGap'])
+        # The local search still reaches the optimum here
+        self.assertAlmostEqual(result['portfolioROI'] * result['portfolioROIMultiplier'],
+                               self.brute_force_best([0, 0, 0], [6, 6, 6]), places=9)
+
+    def test_zero_return_beats_a_loss(self):
+        # Bulk prices above current prices make every saving negative, so the best
+        # allocation is one that ties up no extra money
+        self.params.update(smallDealCases=10)
+        for product in self.products:
+            product['bulk_price'] = round(product['current_price'] * 1.05, 2)
+        result = self.calc.optimize({'products': self.products, 'parameters': dict(self.params)})
+        annualized = result['portfolioROI'] * result['portfolioROIMultiplier']
+        self.assertAlmostEqual(annualized, self.brute_force_best([0, 0, 0], [10, 10, 10]), places=9)
+        self.assertGreaterEqual(annualized, 0)
+
+    def test_infeasible_bounds(self):
+        self.products[0]['min_bulk_quantity'] = 11
+        with self.assertRaises(ValueError):
+            self.calc.optimize({'products': self.products, 'parameters': dict(self.params)})
+
+    def test_problems_over_the_cell_limit_are_refused(self):
+        self.params['dealSizeCases'] = 2000
+        build_tables = allocation_solver.contribution_tables
+        # The limit is checked before any table is built
+        allocation_solver.contribution_tables = None
+        try:
+            with self.assertRaises(allocation_solver.SolverLimitError):
+                self.calc.optimize({'products': self.products, 'parameters': dict(self.params)})
+        finally:
+            allocation_solver.contribution_tables = build_tables
+
+        # Capping the products' quantities brings the same deal under the limit
+        for product in self.products:
+            product['max_bulk_quantity'] = 700
+        allocation_solver.check_problem_size(*allocation_solver.allocation_bounds(self.products, 2000), 2000)
+
+    def test_tables_cover_only_each_products_bounds(self):
+        arrays, numeric = roi_engine.products_to_arrays(self.products)
+        lower, upper = allocation_solver.allocation_bounds(
+            [dict(p, min_bulk_quantity=2, max_bulk_quantity=4) for p in self.products], 10)
+        tables = allocation_solver.contribution_tables(arrays, numeric, self.params, lower, upper, 10)
+        self.assertEqual(tables['savings'].shape, (3, 11))
+        for q in range(11):
+            expected = self.calc.compute_line_item_roi(dict(self.products[1], bulk_quantity=q), self.params)['savings']
+            self.assertEqual(tables['savings'][1, q], expected if 2 <= q <= 4 else 0.0)
+
+    def test_optimize_endpoint_reports_the_limit_as_a_bad_request(self):
+        self.params['dealSizeCases'] = 2000
+        client = app_module.app.test_client()
+        response = client.post('/api/optimize-multi-product-deal',
+                               json={'products': self.products, 'parameters': self.params})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('max_bulk_quantity', response.get_json()['error'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import tempfile
+import time
+import unittest
+from backup_store import BackupStore
+from report_processor import APReportProcessor
+from test_report_processor import write_aging_report
+
+
+class TestBackupStore(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmpdir.name)
+        self.store = BackupStore("backups", max_age_days=30, max_count=3)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmpdir.cleanup()
+
+    def write(self, name, content):
+        with open(name, "wb") as f:
+            f.write(content)
+        return name
+
+    def test_identical_uploads_share_one_backup(self):
+        first = self.store.store(self.write("report.xlsx", b"same bytes"))
+        self.assertIn(first['method'], ('reflink', 'hardlink', 'copy'))
+        self.assertEqual(first['bytes'], 10)
+
+        second = self.store.store(self.write("renamed.xlsx", b"same bytes"))
+        self.assertEqual(second['method'], 'existing')
+        self.assertEqual(second['path'], first['path'])
+        self.assertEqual(os.listdir("backups"), [os.path.basename(first['path'])])
+        self.assertTrue(os.path.basename(first['path']).startswith("report_Backup_"))
+
+    def test_backup_survives_the_upload_being_replaced(self):
+        backup = self.store.store(self.write("report.xlsx", b"original"))
+        os.replace(self.write("incoming.xlsx", b"new upload"), "report.xlsx")
+        with open(backup['path'], "rb") as f:
+            self.assertEqual(f.read(), b"original")
+
+    def test_count_and_age_limits(self):
+        paths = []
+        for i in range(5):
+            paths.append(self.store.store(self.write(f"report{i}.xlsx", f"upload {i}".encode()))['path'])
+            time.sleep(0.01)
+        self.assertEqual(sorted(os.listdir("backups")), sorted(os.path.basename(p) for p in paths[2:]))
+
+        # Age out the oldest remaining backup
+        old = time.time() - 31 * 86400
+        os.utime(paths[2], (old, old))
+        self.store.store(self.write("report3.xlsx", b"upload 3"))
+        self.assertFalse(os.path.exists(paths[2]))
+        self.assertEqual(len(os.listdir("backups")), 2)
+
+    def test_backup_cost_is_reported_in_the_timings(self):
+        os.makedirs("reports")
+        write_aging_report("aging.xlsx")
+        processor = APReportProcessor("aging.xlsx", backup_store=self.store)
+        processor.generate_report()
+        self.assertIn('backup', processor.timings)
+        self.assertEqual(processor.backup['path'], os.path.join("backups", os.listdir("backups")[0]))
+        # Nothing is written next to the upload any more
+        self.assertEqual(sorted(os.listdir(".")), ["aging.xlsx", "backups", "reports"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import random
+import unittest
+from candidate_heap import IndexedHeap
+from multi_product_calculator import MultiProductBuyingCalculator
+
+class TestIndexedHeap(unittest.TestCase):
+    def test_updates_and_removals_keep_heap_order(self):
+        rng = random.Random(11)
+        heap = IndexedHeap()
+        expected = {}
+        for _ in range(500):
+            key = f"product-{rng.randint(0, 30)}"
+            if rng.random() < 0.2:
+                heap.remove(key)
+                expected.pop(key, None)
+            else:
+                priority = (rng.uniform(-5, 5), int(key.split('-')[1]))
+                heap.update(key, priority)
+                expected[key] = priority
+            self.assertEqual(len(heap), len(expected))
+            if expected:
+                best_key = min(expected, key=expected.get)
+                self.assertEqual(heap.peek(), (expected[best_key], best_key))
+            else:
+                self.assertIsNone(heap.peek())
+
+class TestOptimizerCandidates(unittest.TestCase):
+    def test_duplicate_product_names_are_swapped_by_id(self):
+        calc = MultiProductBuyingCalculator()
+        products = [
+            {'id': 'product-0', 'product_name': 'Same', 'current_price': 20.0, 'bulk_price': 16.0, 'on_hand': 2,
+             'annual_cases': 300, 'bottles_per_case': 12, 'bulk_quantity': 10},
+            {'id': 'product-1', 'product_name': 'Same', 'current_price': 20.0, 'bulk_price': 16.0, 'on_hand': 2,
+             'annual_cases': 30, 'bottles_per_case': 12, 'bulk_quantity': 10},
+        ]
+        params = {'dealSizeCases': 20, 'minDaysStock': 30, 'paymentTermsDays': 0, 'smallDealCases': 10}
+        result = calc.run_iterations(products, params)
+        self.assertEqual([p['bulk_quantity'] for p in result['products']], [11, 9])
+        self.assertEqual(result['history'][1]['swapped'], {'from': 'Same', 'to': 'Same'})
+        self.assertGreaterEqual(result['finalAnnualizedROI'], result['history'][0]['totalAnnualizedROI'])
+        self.assertEqual([p['bulk_quantity'] for p in products], [10, 10])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+import numpy as np
+from deal_split_processor import DealSplitCalculator
+from scenario_store import ScenarioStore
+import app as app_module
+
+VARIETIES = [
+    {'variety': 'Cabernet', 'annual_sales': 365, 'inventory_on_hand': 4},
+    {'variety': 'Merlot', 'annual_sales': 182, 'inventory_on_hand': 0},
+    {'variety': 'Rose', 'annual_sales': 73, 'inventory_on_hand': 2},
+]
+
+
+class TestDealSplit(unittest.TestCase):
+    def setUp(self):
+        self.calculator = DealSplitCalculator()
+
+    def test_largest_remainders_get_the_missing_units(self):
+        df = self.calculator.calculate_split(VARIETIES, 10)
+        np.testing.assert_allclose(df['calculated_split'], [5.887, 2.935, 1.177], atol=1e-3)
+        # Floors are 5, 2, 1; Merlot (0.935) then Cabernet (0.887) get the two missing units
+        self.assertEqual(list(df['rounded_split']), [6, 3, 1])
+        self.assertEqual(list(df['days_to_sell']), [6, 6, 5])
+        self.assertEqual(list(df.columns), ['variety', 'annual_sales', 'inventory_on_hand',
+                                            'calculated_split', 'rounded_split', 'days_to_sell'])
+
+    def test_ties_go_to_earlier_varieties(self):
+        data = [{'variety': str(i), 'annual_sales': 100} for i in range(20)]
+        df = self.calculator.calculate_split(data, 7)
+        self.assertEqual(list(df['rounded_split']), [1] * 7 + [0] * 13)
+        self.assertEqual(list(df['inventory_on_hand']), [0] * 20)
+
+    def test_many_desired_totals_in_one_call(self):
+        totals = list(range(1, 201))
+        df = self.calculator.calculate_splits(VARIETIES, totals)
+        self.assertEqual(len(df), 600)
+        sums = df.groupby('desired_total')['rounded_split'].sum()
+        self.assertEqual(list(sums), totals)
+        for total in (7, 55, 200):
+            block = df[df['desired_total'] == total].drop('desired_total', axis=1).reset_index(drop=True)
+            self.assertTrue(block.equals(self.calculator.calculate_split(VARIETIES, total)))
+
+    def test_no_sales(self):
+        df = self.calculator.calculate_split([{'variety': 'New', 'annual_sales': 0}], 5)
+        self.assertEqual(list(df['rounded_split']), [0])
+        self.assertEqual(list(df['days_to_sell']), [0])
+
+    def test_endpoint_accepts_several_totals(self):
+        client = app_module.app.test_client()
+        data = client.post('/api/calculate-deal', json={'varieties': VARIETIES, 'desired_totals': [10, 20]}).get_json()
+        self.assertTrue(data['success'])
+        self.assertEqual([split['total_rounded_split'] for split in data['splits']], [10, 20])
+        self.assertEqual(data['splits'][0]['results'][0]['rounded_split'], 6)
+        self.assertEqual(data['total_annual_sales'], 620)
+
+        response = client.post('/api/calculate-deal', json={'varieties': VARIETIES, 'desired_totals': [0]})
+        self.assertEqual(response.status_code, 400)
+
+
+class TestScenarioStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, 'scenarios.db')
+        self.legacy_path = os.path.join(self.tmpdir.name, 'scenarios.json')
+        self.old_db_path = os.path.join(self.tmpdir.name, 'old_scenarios.db')
+        self.calculator = DealSplitCalculator(self.db_path, self.legacy_path, self.old_db_path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_lookups_ignore_case_and_whitespace(self):
+        self.calculator.save_scenario('Red Wines', VARIETIES)
+        self.assertEqual(self.calculator.get_scenario('  red wines '), VARIETIES)
+        self.calculator.save_scenario('RED WINES', VARIETIES[:1])
+        self.assertEqual(self.calculator.get_all_scenarios(), {'RED WINES': VARIETIES[:1]})
+        self.assertTrue(self.calculator.delete_scenario('red wines'))
+        self.assertFalse(self.calculator.delete_scenario('red wines'))
+        self.assertIsNone(self.calculator.get_scenario('Red Wines'))
+
+    def test_legacy_file_is_imported_once(self):
+        with open(self.legacy_path, 'w') as f:
+            json.dump({'Cuervo': VARIETIES, 'Rose': VARIETIES[2:]}, f)
+        self.assertEqual(self.calculator.list_scenarios(), ['Cuervo', 'Rose'])
+        self.calculator.delete_scenario('Cuervo')
+
+        reopened = DealSplitCalculator(self.db_path, self.legacy_path, self.old_db_path)
+        self.assertEqual(reopened.list_scenarios(), ['Rose'])
+
+    def test_first_database_is_imported_instead_of_the_file(self):
+        with open(self.legacy_path, 'w') as f:
+            json.dump({'Cuervo': VARIETIES}, f)
+        old_store = ScenarioStore(self.old_db_path, kind='deal_split')
+        old_store.import_many([{'name': 'Cuervo', 'data': VARIETIES[:1]}, {'name': 'Saved Later', 'data': VARIETIES}])
+        old_store.delete('Cuervo')
+        self.assertEqual(self.calculator.list_scenarios(), ['Saved Later'])
+        self.assertEqual(self.calculator.get_scenario('saved later'), VARIETIES)
+
+    def test_concurrent_saves_keep_every_scenario(self):
+        def save(i):
+            DealSplitCalculator(self.db_path, self.legacy_path, self.old_db_path).save_scenario(f'Scenario {i}', VARIETIES[:i % 3 + 1])
+
+        threads = [threading.Thread(target=save, args=(i,)) for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(self.calculator.list_scenarios()), sorted(f'Scenario {i}' for i in range(20)))
+        self.assertEqual(self.calculator.get_scenario('scenario 4'), VARIETIES[:2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+import io
+import json
+import unittest
+import numpy as np
+import pandas as pd
+from margin_calculator import MarginCalculator
+import app as app_module
+
+
+class TestSensitivityAnalysis(unittest.TestCase):
+    def setUp(self):
+        self.calc = MarginCalculator()
+
+    def test_default_range_without_a_current_price(self):
+        df = self.calc.perform_sensitivity_analysis(70.0)
+        np.testing.assert_allclose(df['margin'], np.arange(0.23, 0.36, 0.01))
+        np.testing.assert_allclose(df['price'], 70.0 / (1 - df['margin']))
+        np.testing.assert_allclose(df['markup'], df['profit'] / 70.0)
+        self.assertFalse(df['is_current'].any())
+
+    def test_current_price_row_is_inserted_in_margin_order(self):
+        df = self.calc.perform_sensitivity_analysis(35.50, 53.40)
+        current = df[df['is_current']]
+        self.assertEqual(len(current), 1)
+        self.assertAlmostEqual(current['price'].iloc[0], 53.40)
+        self.assertTrue(df['margin'].is_monotonic_increasing)
+        self.assertEqual(list(df.index), list(range(len(df))))
+
+        # The range widens to the current margin (33.5%) plus a 5% buffer
+        self.assertAlmostEqual(df['margin'].iloc[0], 0.23)
+        self.assertGreaterEqual(df['margin'].iloc[-1], 0.38)
+
+    def test_grid_matches_single_product_analysis(self):
+        costs = [10.0, 35.50, 80.0, 12.0]
+        prices = [0, 52.99, 100.0, 12.0 / 0.7]
+        grid = self.calc.sensitivity_grid(costs, prices)
+        self.assertEqual(sorted(grid['product'].unique()), [0, 1, 2, 3])
+        for product, (cost, price) in enumerate(zip(costs, prices)):
+            single = self.calc.perform_sensitivity_analysis(cost, price)
+            rows = grid[grid['product'] == product].drop(columns='product').reset_index(drop=True)
+            pd.testing.assert_frame_equal(rows, single)
+
+        # A current price on the grid flags the matching margin row too
+        self.assertEqual(int(grid[grid['product'] == 3]['is_current'].sum()), 2)
+
+    def test_many_products_in_one_call(self):
+        rng = np.random.default_rng(0)
+        costs = rng.uniform(1, 80, 2000)
+        prices = costs / (1 - rng.uniform(0.1, 0.5, 2000))
+        grid = self.calc.sensitivity_grid(costs, prices)
+        self.assertGreaterEqual(int(grid['is_current'].sum()), 2000)
+        self.assertTrue((grid.groupby('product')['margin'].apply(lambda m: m.is_monotonic_increasing)).all())
+
+
+class TestBatchAnalysis(unittest.TestCase):
+    def setUp(self):
+        self.calc = MarginCalculator()
+        self.products = [
+            {'name': 'Bourbon', 'cost': 35.50, 'current_price': 52.99},
+            {'name': 'Lager 12pk', 'cost': '14.00', 'current_price': None},
+            {'cost': 8.0, 'current_price': ''},
+        ]
+
+    def test_wide_form_keeps_the_per_product_columns(self):
+        df = self.calc.perform_batch_analysis(self.products)
+        self.assertEqual(list(df.columns[:6]), ['name', 'cost', 'current_price', 'current_margin',
+                                                'current_markup', 'current_profit'])
+        self.assertEqual([c for c in df.columns if c.startswith('price_at_')],
+                         ['price_at_20pct', 'price_at_25pct', 'price_at_30pct', 'price_at_35pct', 'price_at_40pct'])
+        self.assertAlmostEqual(df.loc[0, 'price_at_30pct'], 35.50 / 0.7)
+        self.assertAlmostEqual(df.loc[1, 'profit_at_20pct'], 3.5)
+        self.assertAlmostEqual(df.loc[0, 'current_margin'], (52.99 - 35.50) / 52.99)
+        self.assertTrue(np.isnan(df.loc[1, 'current_price']))
+        self.assertEqual(df.loc[2, 'name'], 'Unnamed')
+
+    def test_price_matrix_broadcasts_costs_against_margins(self):
+        prices, profits = self.calc.price_matrix([10.0, 20.0], [0.0, 0.5, 1.0])
+        np.testing.assert_allclose(prices, [[10.0, 20.0, np.nan], [20.0, 40.0, np.nan]])
+        np.testing.assert_allclose(profits, [[0.0, 10.0, np.nan], [0.0, 20.0, np.nan]])
+
+    def test_long_form_has_a_row_per_product_and_margin(self):
+        df = self.calc.perform_batch_analysis(self.products, margins=[0.275, 0.3], form='long')
+        self.assertEqual(len(df), 6)
+        self.assertEqual(list(df['margin']), [0.275, 0.3] * 3)
+        self.assertAlmostEqual(df.loc[3, 'price'], 20.0)
+
+        wide = self.calc.perform_batch_analysis(self.products, margins=[0.275])
+        self.assertIn('price_at_27.5pct', wide.columns)
+
+    def test_invalid_cost_is_reported(self):
+        with self.assertRaises(ValueError):
+            self.calc.perform_batch_analysis([{'name': 'Bad', 'cost': 'n/a'}])
+
+    def test_upload_endpoint(self):
+        client = app_module.app.test_client()
+        csv = b"Name,Cost,Price\nBourbon,35.50,52.99\nLager,14.00,\n"
+        response = client.post('/api/margin-batch-analysis',
+                               data={'file': (io.BytesIO(csv), 'catalog.csv'), 'margins': '0.25,0.3'},
+                               content_type='multipart/form-data')
+        data = response.get_json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['count'], 2)
+        self.assertIsNone(data['results'][1]['current_price'])
+        self.assertAlmostEqual(data['results'][1]['price_at_25pct'], 14.0 / 0.75)
+
+        workbook = io.BytesIO()
+        pd.DataFrame({'name': ['Bourbon'], 'cost': [35.5]}).to_excel(workbook, index=False)
+        workbook.seek(0)
+        response = client.post('/api/margin-batch-analysis',
+                               data={'file': (workbook, 'catalog.xlsx'), 'form': 'long', 'output': 'csv'},
+                               content_type='multipart/form-data')
+        self.assertEqual(response.mimetype, 'text/csv')
+        self.assertEqual(len(pd.read_csv(io.BytesIO(response.data))), 5)
+
+        response = client.post('/api/margin-batch-analysis',
+                               data={'file': (io.BytesIO(b"name\nBourbon\n"), 'catalog.csv')},
+                               content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 400)
+
+
+class TestBulkFeedback(unittest.TestCase):
+    def setUp(self):
+        self.calc = MarginCalculator()
+        # optimal, increase_needed, above_target, no feedback (price equals cost), bad cost
+        self.products = [
+            {'name': 'A', 'cost': 70.0, 'current_price': 100.0},
+            {'name': 'B', 'cost': 35.5, 'current_price': 40.0},
+            {'name': 'C', 'cost': 10.0, 'current_price': 25.0, 'target_margin': 0.5},
+            {'name': 'D', 'cost': 10.0, 'current_price': 10.0},
+            {'name': 'E', 'cost': 'n/a', 'current_price': 10.0},
+        ]
+
+    def test_classification_matches_single_feedback(self):
+        feedback = self.calc.bulk_pricing_feedback(self.products, target_margin=0.3)
+        self.assertEqual(list(feedback['feedback_type']), ['optimal', 'increase_needed', 'above_target', None, None])
+        for row, product in enumerate(self.products[:4]):
+            single = self.calc.generate_pricing_feedback(product['cost'], product['current_price'],
+                                                         product.get('target_margin', 0.3))
+            if single is None:
+                self.assertTrue(feedback.loc[row].drop(['name', 'feedback_type']).isna().all())
+                continue
+            metrics = feedback.loc[row].drop(['name', 'feedback_type']).to_dict()
+            self.assertEqual(metrics, single['metrics'])
+            self.assertEqual(self.calc.feedback_messages(single['feedback_type'], metrics),
+                             (single['summary'], single['recommendations']))
+
+    def test_target_margin_is_required(self):
+        with self.assertRaises(ValueError):
+            self.calc.bulk_pricing_feedback([{'cost': 1.0, 'current_price': 2.0}])
+
+    def read_ndjson(self, response):
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    def test_endpoint_streams_pages(self):
+        client = app_module.app.test_client()
+        lines = self.read_ndjson(client.post('/api/margin-feedback/bulk', json={
+            'products': self.products, 'target_margin': 0.3, 'limit': 2, 'include_text': False}))
+        summary, rows = lines[0], lines[1:]
+        self.assertEqual(summary['total'], 5)
+        self.assertEqual(summary['counts'], {'optimal': 1, 'increase_needed': 1, 'above_target': 1, 'invalid': 2})
+        self.assertEqual(summary['next_offset'], 2)
+        self.assertEqual([row['name'] for row in rows], ['A', 'B'])
+        self.assertNotIn('summary', rows[0])
+
+        lines = self.read_ndjson(client.post('/api/margin-feedback/bulk', json={
+            'products': self.products, 'target_margin': 0.3, 'feedback_type': 'increase_needed'}))
+        self.assertEqual(lines[0]['matched'], 1)
+        self.assertIsNone(lines[0]['next_offset'])
+        self.assertEqual(lines[1]['row'], 1)
+        self.assertTrue(lines[1]['summary'].startswith('Current pricing is below target'))
+
+        csv = b"name,cost,current_price\nA,70,100\nD,10,10\n"
+        lines = self.read_ndjson(client.post('/api/margin-feedback/bulk', data={
+            'file': (io.BytesIO(csv), 'prices.csv'), 'target_margin': '0.3', 'offset': '1'},
+            content_type='multipart/form-data'))
+        self.assertEqual(len(lines), 2)
+        self.assertIsNone(lines[1]['feedback_type'])
+        self.assertIsNone(lines[1]['metrics'])
+
+        response = client.post('/api/margin-feedback/bulk', json={'products': self.products, 'limit': 0,
+                                                                  'target_margin': 0.3})
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
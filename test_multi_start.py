@@ -0,0 +1,65 @@
+import unittest
+import multi_product_calculator
+from multi_product_calculator import MultiProductBuyingCalculator
+
+class TestMultiStart(unittest.TestCase):
+    def setUp(self):
+        self.calc = MultiProductBuyingCalculator()
+        self.products = [
+            {'id': f'product-{i}', 'product_name': f'Product {i}', 'current_price': 18.0 + 2 * i,
+             'bulk_price': 15.0 + 1.7 * i, 'on_hand': (3 * i) % 7, 'annual_cases': 30 + 45 * i,
+             'bottles_per_case': 12, 'bulk_quantity': 10}
+            for i in range(6)
+        ]
+        self.params = {'dealSizeCases': 60, 'minDaysStock': 30, 'paymentTermsDays': 15,
+                       'smallDealCases': 30, 'optimizationMode': 'multistart', 'randomStarts': 3}
+
+    def optimize(self, **overrides):
+        return self.calc.optimize({'products': [p.copy() for p in self.products],
+                                   'parameters': dict(self.params, **overrides)})
+
+    def test_best_seed_is_returned(self):
+        result = self.optimize(maxWorkers=1)
+        summary = result['multiStart']
+        names = [seed['seed'] for seed in summary['seeds']]
+        self.assertEqual(names, ['current', 'proportional', 'need', 'roi_ranked', 'random_1', 'random_2', 'random_3'])
+
+        best = max(summary['seeds'], key=lambda seed: seed['finalAnnualizedROI'])
+        self.assertEqual(summary['bestSeed'], best['seed'])
+        self.assertAlmostEqual(result['portfolioROI'] * result['portfolioROIMultiplier'], best['finalAnnualizedROI'], places=6)
+        self.assertEqual(sum(p['bulk_quantity'] for p in result['products']), 60)
+        for seed in summary['seeds']:
+            self.assertGreaterEqual(seed['finalAnnualizedROI'], seed['initialAnnualizedROI'])
+
+    def test_process_pool_matches_sequential(self):
+        sequential = self.optimize(maxWorkers=1)
+        parallel = self.optimize(maxWorkers=2)
+        self.assertEqual(parallel['multiStart']['bestSeed'], sequential['multiStart']['bestSeed'])
+        self.assertEqual([p['bulk_quantity'] for p in parallel['products']],
+                         [p['bulk_quantity'] for p in sequential['products']])
+
+    def test_requests_are_clamped_and_share_one_pool(self):
+        seeds = self.calc.build_seed_allocations(self.products, dict(self.params, randomStarts=10_000))
+        self.assertEqual(len([name for name, _ in seeds if name.startswith('random_')]),
+                         multi_product_calculator.MAX_RANDOM_STARTS)
+
+        max_workers = multi_product_calculator.MAX_MULTI_START_WORKERS
+        multi_product_calculator.MAX_MULTI_START_WORKERS = 2
+        try:
+            first = self.optimize(maxWorkers=1000)
+            pool = multi_product_calculator._seed_pool
+            second = self.optimize(maxWorkers=1000)
+            self.assertIs(multi_product_calculator._seed_pool, pool)
+        finally:
+            multi_product_calculator.MAX_MULTI_START_WORKERS = max_workers
+        self.assertEqual(first['multiStart']['workers'], 2)
+        self.assertEqual(second['multiStart']['bestSeed'], self.optimize(maxWorkers=1)['multiStart']['bestSeed'])
+
+    def test_seed_order_is_preserved(self):
+        self.products[2]['annual_cases'] = 0
+        for name, seed_products in self.calc.build_seed_allocations(self.products, self.params):
+            self.assertEqual([p['id'] for p in seed_products], [p['id'] for p in self.products], name)
+            self.assertEqual(sum(p['bulk_quantity'] for p in seed_products), 60, name)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import json
+import unittest
+from multi_product_calculator import MultiProductBuyingCalculator
+from optimization_history import HistoryRecorder, reconstruct_allocations, reconstruct_products
+
+class TestCompactHistory(unittest.TestCase):
+    def setUp(self):
+        self.calc = MultiProductBuyingCalculator()
+        self.products = [
+            {'id': f'product-{i}', 'product_name': f'Product {i}', 'current_price': 20.0 + i,
+             'bulk_price': 16.0 + i * 0.9, 'on_hand': i % 4, 'annual_cases': 40 + 35 * i,
+             'bottles_per_case': 12, 'bulk_quantity': 12}
+            for i in range(10)
+        ]
+        self.products[0]['bulk_quantity'] = 30
+        self.products[5]['bulk_quantity'] = 3
+        self.products[9]['bulk_quantity'] = 3
+        self.params = {'dealSizeCases': 120, 'minDaysStock': 30, 'paymentTermsDays': 0, 'smallDealCases': 30}
+
+    def run_mode(self, mode):
+        params = dict(self.params, historyMode=mode, historyCheckpointInterval=4)
+        return self.calc.run_iterations(self.products, params)
+
+    def test_compact_replay_matches_full_snapshots(self):
+        full = self.run_mode('full')
+        compact = self.run_mode('compact')
+        self.assertGreater(len(full['history']), 5)
+        self.assertEqual(len(full['history']), len(compact['history']))
+
+        expected = [[p['bulk_quantity'] for p in entry['products']] for entry in full['history']]
+        self.assertEqual(reconstruct_allocations(compact['history']), expected)
+        self.assertEqual(reconstruct_products(self.products, compact['history']), full['products'])
+        self.assertNotIn('products', compact['history'][1])
+        self.assertLess(len(json.dumps(compact['history'])), len(json.dumps(full['history'])))
+
+    def test_checkpoint_interval(self):
+        history = self.run_mode('compact')['history']
+        checkpoints = [i for i, entry in enumerate(history) if 'checkpoint' in entry]
+        self.assertEqual(checkpoints[:3], [0, 4, 8])
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            HistoryRecorder('everything')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+import roi_engine
+from multi_product_calculator import MultiProductBuyingCalculator
+from app import app
+
+class TestParameterGrid(unittest.TestCase):
+    def setUp(self):
+        self.calc = MultiProductBuyingCalculator()
+        self.params = {'dealSizeCases': 60, 'minDaysStock': 30, 'paymentTermsDays': 30, 'smallDealCases': 30}
+        self.products = [
+            {'product_name': 'Fast', 'current_price': 19.99, 'bulk_price': 15.99, 'on_hand': 15,
+             'annual_cases': 180, 'bottles_per_case': 12, 'bulk_quantity': 30},
+            {'product_name': 'Slow', 'current_price': 21.99, 'bulk_price': 17.99, 'on_hand': 8,
+             'annual_cases': 60, 'bottles_per_case': 12, 'bulk_quantity': 20},
+            {'product_name': 'No Sales', 'current_price': 21.99, 'bulk_price': 17.99, 'on_hand': 2,
+             'annual_cases': 0, 'bottles_per_case': 12, 'bulk_quantity': 5},
+            {'product_name': 'Steady', 'current_price': 30.0, 'bulk_price': 26.5, 'on_hand': 0,
+             'annual_cases': 95, 'bottles_per_case': 6, 'bulk_quantity': 5},
+        ]
+        self.grid = {'dealSizeCases': [30, 60, 90, 300], 'paymentTermsDays': [0, 15, 30, 90]}
+
+    def test_fixed_allocation_matches_point_calls(self):
+        result = self.calc.evaluate_grid({'products': self.products, 'parameters': self.params, 'grid': self.grid})
+        self.assertEqual(result['shape'], [4, 4])
+        for i, deal_size in enumerate(self.grid['dealSizeCases']):
+            for j, terms in enumerate(self.grid['paymentTermsDays']):
+                params = dict(self.params, dealSizeCases=deal_size, paymentTermsDays=terms)
+                expected = self.calc.calculate_portfolio_roi(self.products, params)
+                self.assertEqual(result['metrics']['roi'][i][j], expected['roi'])
+                self.assertEqual(result['metrics']['totalSavings'][i][j], expected['totalSavings'])
+                self.assertEqual(result['metrics']['annualizedRoi'][i][j],
+                                 expected['roi'] * expected['annualROIMultiplier'])
+
+    def test_rescaled_allocation_fills_each_deal(self):
+        products = [dict(p, bulk_quantity=0) for p in self.products]
+        result = self.calc.evaluate_grid({'products': products, 'parameters': self.params,
+                                          'grid': {'dealSizeCases': [45, 120]}, 'rescaleAllocation': True})
+        for i, deal_size in enumerate([45, 120]):
+            allocated = self.calc.allocate_proportional(products, deal_size)
+            expected = self.calc.calculate_portfolio_roi(allocated, dict(self.params, dealSizeCases=deal_size))
+            self.assertEqual(result['metrics']['totalDeltaInvestment'][i], expected['totalDeltaInvestment'])
+
+    def test_chunked_evaluation_matches_one_batch(self):
+        data = {'products': self.products, 'parameters': self.params, 'grid': self.grid, 'rescaleAllocation': True}
+        whole = self.calc.evaluate_grid(data)
+        chunk_cells = roi_engine.GRID_CHUNK_CELLS
+        # Three points per batch, so the 16-point grid ends on a partial batch
+        roi_engine.GRID_CHUNK_CELLS = 3 * len(self.products)
+        try:
+            chunked = self.calc.evaluate_grid(data)
+        finally:
+            roi_engine.GRID_CHUNK_CELLS = chunk_cells
+        self.assertEqual(chunked['metrics'], whole['metrics'])
+
+    def test_rejects_too_many_points(self):
+        grid = {'dealSizeCases': list(range(1, 1001)), 'paymentTermsDays': list(range(101))}
+        with self.assertRaises(ValueError):
+            self.calc.evaluate_grid({'products': self.products[:1], 'parameters': self.params, 'grid': grid})
+
+    def test_rejects_unknown_parameter(self):
+        with self.assertRaises(ValueError):
+            self.calc.evaluate_grid({'products': self.products, 'parameters': self.params, 'grid': {'iterations': [1, 2]}})
+
+    def test_endpoint(self):
+        client = app.test_client()
+        response = client.post('/api/evaluate-multi-product-grid', json={
+            'products': self.products, 'parameters': self.params, 'grid': {'paymentTermsDays': [0, 30, 60]}
+        })
+        body = response.get_json()
+        self.assertTrue(body['success'])
+        self.assertEqual(len(body['results']['metrics']['roi']), 3)
+
+if __name__ == '__main__':
+    unittest.main()
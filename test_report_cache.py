@@ -0,0 +1,92 @@
+import os
+import tempfile
+import time
+import unittest
+import openpyxl
+from report_cache import ReportCache, link_or_copy
+from report_processor import APReportProcessor
+from test_report_processor import write_aging_report
+
+
+class TestReportCache(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmpdir.name)
+        os.makedirs("reports")
+        self.cache = ReportCache(os.path.join("reports", "cache"))
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmpdir.cleanup()
+
+    def write(self, name, size):
+        with open(name, "wb") as f:
+            f.write(b"x" * size)
+        return name
+
+    def test_key_covers_bytes_and_options(self):
+        self.write("a.xlsx", 10)
+        self.write("b.xlsx", 11)
+        key = ReportCache.make_key("a.xlsx", {'forwardWeeks': 4})
+        self.assertEqual(key, ReportCache.make_key("a.xlsx", {'forwardWeeks': 4}))
+        self.assertNotEqual(key, ReportCache.make_key("a.xlsx", {'forwardWeeks': 13}))
+        self.assertNotEqual(key, ReportCache.make_key("b.xlsx", {'forwardWeeks': 4}))
+
+    def test_least_recently_used_entries_are_evicted_by_size(self):
+        cache = ReportCache(os.path.join("reports", "small"), max_bytes=250)
+        for name in ("one", "two", "three"):
+            cache.put(name, self.write(f"{name}.xlsx", 100))
+            time.sleep(0.01)
+        self.assertIsNone(cache.get("one"))
+
+        # A hit makes "two" the most recently used, so "three" goes next
+        self.assertEqual(cache.get("two")[1], "two.xlsx")
+        time.sleep(0.01)
+        cache.put("four", self.write("four.xlsx", 100))
+        self.assertIsNone(cache.get("three"))
+        self.assertIsNotNone(cache.get("two"))
+        self.assertEqual(cache.stats()['entries'], 2)
+        self.assertEqual(cache.stats()['bytes'], 200)
+
+    def test_link_or_copy_replaces_the_destination(self):
+        self.write("source.xlsx", 5)
+        self.write("destination.xlsx", 50)
+        link_or_copy("source.xlsx", "destination.xlsx")
+        self.assertEqual(os.path.getsize("destination.xlsx"), 5)
+        self.assertEqual(sorted(os.listdir(".")), ["destination.xlsx", "reports", "source.xlsx"])
+
+    def test_repeat_report_is_served_from_the_cache(self):
+        write_aging_report("aging.xlsx")
+        first = APReportProcessor("aging.xlsx", cache=self.cache)
+        output_path = first.generate_report()
+        self.assertFalse(first.cache_hit)
+        os.remove(output_path)
+
+        second = APReportProcessor("aging.xlsx", cache=self.cache)
+        cached_path = second.generate_report()
+        self.assertTrue(second.cache_hit)
+        self.assertEqual(list(second.timings), ['backup', 'cache'])
+        # A cache hit gets its own file rather than the first job's
+        self.assertEqual(os.path.basename(cached_path), f"Upcoming Bills Report 20250501 {second.report_id}.xlsx")
+        self.assertNotEqual(cached_path, output_path)
+        self.assertEqual(openpyxl.load_workbook(cached_path).sheetnames,
+                         ["WeeklySummary", "WeeklyBill", "VendorSubtotals", "RawData"])
+
+        # Different options mean a different report
+        third = APReportProcessor("aging.xlsx", forward_weeks=13, cache=self.cache)
+        third.generate_report()
+        self.assertFalse(third.cache_hit)
+
+    def test_reports_without_an_as_of_date_are_not_cached(self):
+        workbook = openpyxl.Workbook()
+        workbook.active.append(["Vendor", "Due Date", "Amount"])
+        workbook.active.append(["Acme", "2030-01-07", 10.0])
+        workbook.save("plain.xlsx")
+
+        APReportProcessor("plain.xlsx", cache=self.cache).generate_report()
+        self.assertEqual(self.cache.stats()['entries'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
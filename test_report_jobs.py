@@ -0,0 +1,120 @@
+import io
+import os
+import re
+import tempfile
+import unittest
+from report_jobs import ReportJobQueue, JOB_DONE, JOB_FAILED
+from report_processor import APReportProcessor
+from test_report_processor import write_aging_report
+import app as app_module
+
+
+class TestReportJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmpdir.name)
+        os.makedirs("reports")
+        os.makedirs("uploads")
+        write_aging_report("aging.xlsx")
+        self.queue = ReportJobQueue(max_workers=2)
+
+    def tearDown(self):
+        self.queue.shutdown()
+        os.chdir(self.cwd)
+        self.tmpdir.cleanup()
+
+    def test_job_reports_stages_and_output(self):
+        stages_seen = []
+        processor = APReportProcessor("aging.xlsx")
+        job_id = self.queue.submit(processor)
+        job = self.queue.wait(job_id, timeout=60)
+
+        self.assertEqual(job['status'], JOB_DONE)
+        self.assertEqual(job['progress'], 1.0)
+        self.assertEqual(job['filename'], f"Upcoming Bills Report 20250501 {processor.report_id}.xlsx")
+        self.assertTrue(os.path.exists(os.path.join("reports", job['filename'])))
+        self.assertEqual(list(job['timings']), ['backup'] + list(APReportProcessor.REPORT_STAGES))
+        self.assertGreaterEqual(job['elapsedMs'], 0)
+
+        processor.generate_report(progress=stages_seen.append)
+        self.assertEqual(stages_seen, list(APReportProcessor.REPORT_STAGES))
+
+    def test_failed_job_keeps_the_error(self):
+        with open("broken.xlsx", "wb") as f:
+            f.write(b"not a workbook")
+        job = self.queue.wait(self.queue.submit(APReportProcessor("broken.xlsx")), timeout=60)
+        self.assertEqual(job['status'], JOB_FAILED)
+        self.assertIn("Error generating report", job['error'])
+        self.assertEqual(job['stage'], 'ingest')
+        self.assertIsNone(self.queue.get("unknown"))
+
+    def test_finished_jobs_are_pruned(self):
+        queue = ReportJobQueue(max_workers=1, max_finished=1)
+        try:
+            first = queue.submit(APReportProcessor("aging.xlsx"))
+            queue.wait(first, timeout=60)
+            second = queue.submit(APReportProcessor("aging.xlsx"))
+            queue.wait(second, timeout=60)
+            third = queue.submit(APReportProcessor("aging.xlsx"))
+            queue.wait(third, timeout=60)
+            self.assertIsNone(queue.get(first))
+            self.assertIsNotNone(queue.get(third))
+        finally:
+            queue.shutdown()
+
+    def test_upload_returns_a_job_to_poll(self):
+        client = app_module.app.test_client()
+        with open("aging.xlsx", "rb") as f:
+            response = client.post('/upload', data={'file': (io.BytesIO(f.read()), 'aging.xlsx'), 'forward_weeks': '13'},
+                                   content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 200)
+        job_id = re.search(r'/jobs/([0-9a-f]{32})', response.get_data(as_text=True)).group(1)
+
+        app_module.report_jobs.wait(job_id, timeout=60)
+        data = client.get(f'/jobs/{job_id}').get_json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['job']['status'], JOB_DONE)
+        self.assertRegex(data['job']['downloadUrl'], r'^/download/Upcoming%20Bills%20Report%2020250501%20[0-9a-f]{12}\.xlsx$')
+
+        self.assertEqual(client.get('/jobs/missing').status_code, 404)
+
+    def test_upload_rejects_too_many_forward_weeks(self):
+        client = app_module.app.test_client()
+        with open("aging.xlsx", "rb") as f:
+            response = client.post('/upload', data={'file': (io.BytesIO(f.read()), 'aging.xlsx'),
+                                                    'forward_weeks': '1000000'},
+                                   content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual([name for name in os.listdir("uploads") if name.endswith(".xlsx")], [])
+
+    def test_failed_upload_is_deleted_too(self):
+        client = app_module.app.test_client()
+        response = client.post('/upload', data={'file': (io.BytesIO(b"not a workbook"), 'broken.xlsx')},
+                               content_type='multipart/form-data')
+        job_id = re.search(r'/jobs/([0-9a-f]{32})', response.get_data(as_text=True)).group(1)
+        app_module.report_jobs.wait(job_id, timeout=60)
+        self.assertEqual(client.get(f'/jobs/{job_id}').get_json()['job']['status'], JOB_FAILED)
+        self.assertEqual([name for name in os.listdir("uploads") if name.endswith(".xlsx")], [])
+
+    def test_uploads_with_the_same_name_are_kept_apart(self):
+        client = app_module.app.test_client()
+        job_ids = []
+        for _ in range(2):
+            with open("aging.xlsx", "rb") as f:
+                response = client.post('/upload', data={'file': (io.BytesIO(f.read()), 'aging.xlsx')},
+                                       content_type='multipart/form-data')
+            job_ids.append(re.search(r'/jobs/([0-9a-f]{32})', response.get_data(as_text=True)).group(1))
+        for job_id in job_ids:
+            app_module.report_jobs.wait(job_id, timeout=60)
+            self.assertEqual(client.get(f'/jobs/{job_id}').get_json()['job']['status'], JOB_DONE)
+
+        # Each upload is deleted once its job finishes
+        self.assertEqual([name for name in os.listdir("uploads") if name.endswith(".xlsx")], [])
+        # Reports for the same date are kept apart too
+        filenames = {client.get(f'/jobs/{job_id}').get_json()['job']['filename'] for job_id in job_ids}
+        self.assertEqual(len(filenames), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
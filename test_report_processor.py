@@ -0,0 +1,215 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+import openpyxl
+import pandas as pd
+from report_processor import APReportProcessor
+
+HEADERS = [None, "Date", "Transaction Type", "Num", "Vendor Display Name", "Due Date", "Past Due", "Amount", "Open Balance"]
+BILLS = [
+    (datetime(2025, 4, 1), "Bill", "1001", "Acme", datetime(2025, 4, 28), 3, 100.0),
+    (datetime(2025, 4, 2), "Bill", "1002", "Beta Wines", datetime(2025, 5, 6), 0, 250.5),
+    (datetime(2025, 4, 3), "Vendor Credit", "1003", "Acme", datetime(2025, 5, 7), 0, -40.0),
+    (datetime(2025, 4, 4), "Bill", "1004", "Acme", datetime(2025, 5, 14), 0, 75.25),
+    (datetime(2025, 4, 5), "Bill", "1005", "Cask Co", datetime(2025, 7, 1), 0, 500.0),
+]
+
+
+def write_aging_report(path, bills=BILLS, sheet_title="Sheet1"):
+    """Write a QuickBooks-style A/P Aging Detail export."""
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = sheet_title
+    sheet["A1"] = "Victory Spirits LLC"
+    sheet["A2"] = "A/P Aging Detail Report"
+    sheet["A3"] = "As of May 1, 2025"
+    for j, header in enumerate(HEADERS):
+        sheet.cell(5, j + 1, header)
+    sheet.append(["Current"])
+    for date, kind, num, vendor, due, past_due, amount in bills:
+        sheet.append([None, date, kind, num, vendor, due, past_due, amount, amount])
+    sheet.append(["Total for Current", None, None, None, None, None, None, 885.75, 885.75])
+    workbook.save(path)
+
+
+class TestReportIngestion(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "aging.xlsx")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_aging_export_is_read_in_one_pass(self):
+        write_aging_report(self.path)
+        processor = APReportProcessor(self.path)
+        processor._find_source_sheet()
+
+        self.assertEqual(processor.src_sheet, "Sheet1")
+        self.assertEqual(processor.source_date, pd.Timestamp(2025, 5, 1))
+        self.assertEqual(processor.src_data.columns.tolist(), ["Unnamed: 0"] + HEADERS[1:])
+        self.assertEqual(len(processor.src_data), len(BILLS) + 2)
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(processor.src_data["Due Date"]))
+        self.assertTrue(pd.api.types.is_float_dtype(processor.src_data["Amount"]))
+        self.assertEqual(processor.src_data["Num"].iloc[1], "1001")
+
+    def test_chunked_reads_match_a_single_chunk(self):
+        write_aging_report(self.path)
+        whole = APReportProcessor(self.path)
+        whole._find_source_sheet()
+        chunked = APReportProcessor(self.path)
+        chunked.INGEST_CHUNK_ROWS = 2
+        chunked._find_source_sheet()
+        pd.testing.assert_frame_equal(whole.src_data, chunked.src_data)
+
+    def test_plain_sheet_uses_first_row_headers(self):
+        workbook = openpyxl.Workbook()
+        workbook.active.title = "Notes"
+        sheet = workbook.create_sheet(APReportProcessor.SHEET_RAW_DATA)
+        sheet.append(["Vendor", "Due Date", "Amount", "Amount"])
+        sheet.append(["Acme", datetime(2025, 5, 6), 10, 1])
+        sheet.append(["Beta", "not a date", "n/a", 2])
+        workbook.save(self.path)
+
+        processor = APReportProcessor(self.path)
+        processor._find_source_sheet()
+
+        self.assertEqual(processor.src_sheet, APReportProcessor.SHEET_RAW_DATA)
+        self.assertEqual(processor.src_data.columns.tolist(), ["Vendor", "Due Date", "Amount", "Amount.1"])
+        self.assertTrue(pd.isna(processor.src_data["Due Date"].iloc[1]))
+        self.assertTrue(pd.isna(processor.src_data["Amount"].iloc[1]))
+        # No "As of" line: the report is dated today
+        self.assertEqual(processor.source_date, datetime.now().date())
+
+
+class TestWeekBuckets(unittest.TestCase):
+    def make_processor(self, forward_weeks=None):
+        processor = APReportProcessor("unused.xlsx", forward_weeks=forward_weeks)
+        processor.source_date = pd.Timestamp(2025, 5, 1)
+        processor._calculate_next_monday()
+        return processor
+
+    def bills(self):
+        return pd.DataFrame({
+            "Vendor Display Name": ["Acme", "Beta", "Acme", "Cask", "Beta", "Delta"],
+            "Due Date": ["2025-05-04", "2025-05-05", None, "2025-05-11", "2025-05-12", "2025-08-01"],
+            "Amount": [10.0, 20.0, 99.0, 30.0, 40.0, 50.0],
+        })
+
+    def test_boundaries_fall_on_mondays(self):
+        processor = self.make_processor()
+        buckets = processor._assign_week_buckets(pd.to_datetime(self.bills()["Due Date"]))
+        self.assertEqual(buckets.tolist(), [0, 1, -1, 1, 2, 5])
+
+    def insert_subtotals(self, processor):
+        return processor._insert_subtotals(*processor._build_week_buckets(self.bills()))
+
+    def test_subtotal_rows_follow_each_week(self):
+        result = self.insert_subtotals(self.make_processor())
+        self.assertEqual(result["Vendor Display Name"].tolist(), [
+            "Acme", "TOTAL FOR CURRENT WEEK: UP TO 05/05/2025",
+            "Beta", "Cask", "TOTAL FOR 05/05/2025 - 05/11/2025",
+            "Beta", "TOTAL FOR 05/12/2025 - 05/18/2025",
+            "Delta", "TOTAL FOR AFTER 06/02/2025",
+        ])
+        self.assertEqual(result["Amount"].tolist(), [10.0, 10.0, 20.0, 30.0, 50.0, 40.0, 40.0, 50.0, 50.0])
+
+    def test_forward_weeks_is_configurable(self):
+        processor = self.make_processor(forward_weeks=13)
+        self.assertEqual(len(processor._week_labels()), 15)
+        result = self.insert_subtotals(processor)
+        self.assertIn("TOTAL FOR 07/28/2025 - 08/03/2025", result["Vendor Display Name"].tolist())
+        self.assertEqual(result["Vendor Display Name"].iloc[-1], "TOTAL FOR 07/28/2025 - 08/03/2025")
+
+        with self.assertRaises(ValueError):
+            APReportProcessor("unused.xlsx", forward_weeks=0)
+        with self.assertRaises(ValueError):
+            APReportProcessor("unused.xlsx", forward_weeks=APReportProcessor.MAX_FORWARD_WEEKS + 1)
+
+    def test_week_model_drives_vendor_subtotals_and_summary(self):
+        processor = self.make_processor()
+        bills = self.bills()
+        # A vendor name that looks like a subtotal label must not split the week
+        bills.loc[3, "Vendor Display Name"] = "TOTAL FOR Cask"
+        _, buckets = processor._build_week_buckets(bills)
+        self.assertEqual(buckets["week"].tolist(), [0, 1, 1, 2, 5])
+        self.assertEqual(buckets["vendor"].tolist(), ["Acme", "Beta", "TOTAL FOR Cask", "Beta", "Delta"])
+
+        summary = processor._create_weekly_summary(buckets)
+        self.assertEqual(summary["PAYMENT PERIOD"].tolist()[3:], [
+            "CURRENT WEEK: UP TO 05/05/2025", "05/05/2025 - 05/11/2025",
+            "05/12/2025 - 05/18/2025", "AFTER 06/02/2025", "TOTAL PAYMENTS",
+        ])
+        self.assertEqual(summary["TOTAL AMOUNT"].tolist()[3:], [10.0, 50.0, 40.0, 50.0, 150.0])
+        self.assertEqual(summary["# OF INVOICES"].tolist()[3:], [1, 2, 1, 1, 5])
+
+        vendors = processor._create_vendor_subtotals(buckets)
+        self.assertEqual(vendors["WEEK"].dropna().tolist(), summary["PAYMENT PERIOD"].tolist()[3:7])
+        week_one = vendors.iloc[9:11]
+        self.assertEqual(week_one["VENDOR"].tolist(), ["TOTAL FOR Cask", "Beta"])
+        self.assertEqual(week_one["% OF WEEK"].tolist(), [0.6, 0.4])
+        grand_total = vendors.iloc[-1]
+        self.assertEqual((grand_total["VENDOR"], grand_total["# OF BILLS"], grand_total["TOTAL AMOUNT"]),
+                         ("ALL WEEKS TOTAL", 5, 150.0))
+
+
+class TestReportOutput(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmpdir.name)
+        os.makedirs("reports")
+        write_aging_report("aging.xlsx")
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmpdir.cleanup()
+
+    def test_sheets_are_written_with_column_formats(self):
+        output_path = APReportProcessor("aging.xlsx").generate_report()
+        workbook = openpyxl.load_workbook(output_path)
+        self.assertEqual(workbook.sheetnames, ["WeeklySummary", "WeeklyBill", "VendorSubtotals", "RawData"])
+
+        bills = workbook["WeeklyBill"]
+        self.assertEqual([cell.value for cell in bills[1]],
+                         ["Unnamed: 0", "Date", "Num", "Vendor Display Name", "Due Date", "Amount"])
+        self.assertEqual(bills["D2"].value, "Acme")
+        self.assertEqual(bills["E2"].number_format, "mm/dd/yyyy")
+        self.assertEqual((bills["F2"].value, bills["F2"].number_format), (100.0, "$#,##0.00"))
+        self.assertEqual(bills["A3"].value, "TOTAL FOR CURRENT WEEK: UP TO 05/05/2025")
+        self.assertTrue(bills["A3"].font.b)
+        self.assertEqual(bills.freeze_panes, "B2")
+
+        summary = workbook["WeeklySummary"]
+        totals = [row for row in summary.iter_rows(min_row=2) if row[1].value == "TOTAL PAYMENTS"]
+        self.assertEqual(len(totals), 1)
+        self.assertEqual((totals[0][2].value, totals[0][3].value), (925.75, 4))
+        self.assertTrue(totals[0][2].font.b)
+
+        raw = workbook["RawData"]
+        self.assertEqual(raw.max_row, len(BILLS) + 3)
+        self.assertEqual(raw["H3"].number_format, "$#,##0.00")
+
+
+class TestColumnWidths(unittest.TestCase):
+    def test_widths_follow_the_longest_value(self):
+        processor = APReportProcessor("unused.xlsx")
+        df = pd.DataFrame({
+            "Vendor": ["Acme", None, "A much longer vendor name"],
+            "Due Date": pd.to_datetime(["2025-05-06", None, "2025-05-13"]),
+            "Amount": [1.5, float("nan"), 123456.75],
+            "Memo": ["x" * 80, "", None],
+        })
+        self.assertEqual(processor._column_widths(df), [27, 12, 11, 50])
+
+    def test_widths_are_cached_per_frame(self):
+        processor = APReportProcessor("unused.xlsx")
+        df = pd.DataFrame({"Vendor": ["Acme"]})
+        widths = processor._column_widths(df)
+        self.assertIs(processor._column_widths(df), widths)
+        self.assertIsNot(processor._column_widths(df.copy()), widths)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import threading
+import unittest
+from multi_product_calculator import MultiProductBuyingCalculator
+from roi_cache import LineItemCache
+
+class TestLineItemCache(unittest.TestCase):
+    def setUp(self):
+        self.calc = MultiProductBuyingCalculator()
+        self.calc.line_item_cache.clear()
+        self.params = {'dealSizeCases': 60, 'minDaysStock': 30, 'paymentTermsDays': 30, 'smallDealCases': 30}
+        self.product = {'product_name': 'Fast', 'current_price': 19.99, 'bulk_price': 15.99, 'on_hand': 15,
+                        'annual_cases': 180, 'bottles_per_case': 12, 'bulk_quantity': 40}
+
+    def test_repeat_calls_hit_the_cache(self):
+        first = self.calc.compute_line_item_roi(self.product, self.params)
+        second = self.calc.compute_line_item_roi(dict(self.product, product_name='Renamed'), self.params)
+        self.assertEqual(first, second)
+        self.assertEqual(first, self.calc._compute_line_item_roi(self.product, self.params))
+        stats = self.calc.roi_cache_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+        self.calc.compute_line_item_roi(dict(self.product, bulk_quantity=41), self.params)
+        self.calc.compute_line_item_roi(self.product, dict(self.params, paymentTermsDays=45))
+        self.assertEqual(self.calc.roi_cache_stats()['misses'], 3)
+
+    def test_int_and_float_inputs_are_distinct(self):
+        as_int = self.calc.compute_line_item_roi(self.product, self.params)
+        as_float = self.calc.compute_line_item_roi(dict(self.product, bulk_quantity=40.0), self.params)
+        self.assertIsInstance(as_int['debug']['Q2'], int)
+        self.assertIsInstance(as_float['debug']['Q2'], float)
+
+    def test_results_are_copies(self):
+        result = self.calc.compute_line_item_roi(self.product, self.params)
+        result['roi'] = -1
+        result['debug']['Q2'] = -1
+        cached = self.calc.compute_line_item_roi(self.product, self.params)
+        self.assertNotEqual(cached['roi'], -1)
+        self.assertEqual(cached['debug']['Q2'], 40)
+
+    def test_lru_eviction(self):
+        cache = LineItemCache(max_entries=2)
+        for key in ('a', 'b', 'a', 'c'):
+            cache.get_or_compute(key, lambda: {'value': key})
+        self.assertEqual(cache.stats()['size'], 2)
+        cache.get_or_compute('a', lambda: {'value': 'recomputed'})
+        cache.get_or_compute('b', lambda: {'value': 'recomputed'})
+        self.assertEqual((cache.hits, cache.misses), (2, 4))
+
+    def test_unhashable_inputs_bypass_cache(self):
+        self.assertIsNone(LineItemCache.make_key([[1, 2]]))
+
+    def test_concurrent_access(self):
+        cache = LineItemCache(max_entries=8)
+
+        def worker(offset):
+            for i in range(500):
+                key = (i + offset) % 16
+                self.assertEqual(cache.get_or_compute(key, lambda: {'value': key})['value'], key)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(cache.hits + cache.misses, 4000)
+        self.assertLessEqual(cache.stats()['size'], 8)
+
+if __name__ == '__main__':
+    unittest.main()
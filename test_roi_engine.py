@@ -0,0 +1,66 @@
+import unittest
+from multi_product_calculator import MultiProductBuyingCalculator
+import roi_engine
+
+class TestRoiEngine(unittest.TestCase):
+    def setUp(self):
+        self.calc = MultiProductBuyingCalculator()
+        self.params = {
+            'dealSizeCases': 120,
+            'minDaysStock': 30,
+            'paymentTermsDays': 30,
+            'smallDealCases': 30
+        }
+        self.products = [
+            {'product_name': 'Fast', 'current_price': 19.99, 'bulk_price': 15.99, 'on_hand': 15,
+             'annual_cases': 180, 'bottles_per_case': 12, 'bulk_quantity': 40},
+            {'product_name': 'Slow', 'current_price': 21.99, 'bulk_price': 17.99, 'on_hand': 8,
+             'annual_cases': 60, 'bottles_per_case': 12, 'bulk_quantity': 35},
+            {'product_name': 'No Sales', 'current_price': 21.99, 'bulk_price': 17.99, 'on_hand': 2,
+             'annual_cases': 0, 'bottles_per_case': 12, 'bulk_quantity': 5},
+            {'product_name': 'No Bulk', 'current_price': 24.99, 'bulk_price': 20.99, 'on_hand': 0,
+             'annual_cases': 90, 'bottles_per_case': 6, 'bulk_quantity': 0},
+            {'product_name': 'Understocked', 'current_price': 30.0, 'bulk_price': 26.5, 'on_hand': 0,
+             'annual_cases': 730, 'bottles_per_case': 6, 'bulk_quantity': 1},
+        ]
+
+    def test_batch_matches_scalar(self):
+        batch = self.calc.compute_line_items(self.products, self.params, include_debug=True)
+        for product, metrics in zip(self.products, batch):
+            self.assertEqual(metrics, self.calc.compute_line_item_roi(product, self.params))
+
+    def test_debug_is_opt_in(self):
+        batch = self.calc.compute_line_items(self.products, self.params)
+        self.assertNotIn('debug', batch[0])
+        self.assertIn('warning', batch[4])
+
+    def test_non_numeric_product_uses_scalar_path(self):
+        products = [dict(self.products[0], on_hand=None)] + self.products[1:]
+        _, columns = self.calc.compute_roi_columns(products, self.params)
+        self.assertIn(0, columns['scalar'])
+        self.assertEqual(columns['status'][0], roi_engine.STATUS_ERROR)
+        self.assertIn('error', self.calc.compute_line_items(products, self.params)[0])
+
+    def test_portfolio_matches_line_items(self):
+        portfolio = self.calc.calculate_portfolio_roi(self.products, self.params)
+        metrics = [self.calc.compute_line_item_roi(p, self.params) for p in self.products]
+        savings = sum(m['savings'] for m in metrics if 'error' not in m)
+        investment = sum(m['deltaInvestment'] for m in metrics if 'error' not in m)
+        self.assertEqual(portfolio['roi'], savings / investment)
+
+    def test_incremental_move_matches_full_recompute(self):
+        arrays, columns = self.calc.compute_roi_columns(self.products, self.params)
+        state = roi_engine.PortfolioState(arrays, columns, self.params)
+        metrics, pending = state.score_move(1, 4)
+        state.apply_move(pending)
+
+        moved = [dict(p) for p in self.products]
+        moved[1]['bulk_quantity'] -= 1
+        moved[4]['bulk_quantity'] += 1
+        expected = self.calc.calculate_portfolio_roi(moved, self.params)
+        for key, value in expected.items():
+            self.assertAlmostEqual(metrics[key], value, places=9)
+            self.assertAlmostEqual(state.metrics()[key], value, places=9)
+
+if __name__ == '__main__':
+    unittest.main()
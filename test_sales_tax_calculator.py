@@ -0,0 +1,134 @@
+import io
+import os
+import tempfile
+import unittest
+import zipfile
+import openpyxl
+import pandas as pd
+import sales_tax_calculator
+from sales_tax_calculator import SalesTaxCalculator
+import app as app_module
+
+
+class TestSalesFromTax(unittest.TestCase):
+    def setUp(self):
+        self.calculator = SalesTaxCalculator()
+
+    def test_components_are_worked_back_from_the_tax_collected(self):
+        results = self.calculator.calculate_sales_from_tax([
+            {'jurisdiction_code': '040017', 'city_name': 'COLORADO SPRINGS', 'standard_tax': 82.0},
+            {'jurisdiction_code': '040057', 'city_name': 'MONUMENT', 'standard_tax': '38.15', 'soda_tax': None},
+        ])
+        sales = results['sales_calculations']
+        taxes = results['tax_calculations']
+
+        self.assertAlmostEqual(sales.loc[0, 'total_sales'], 1000.0)
+        self.assertAlmostEqual(taxes.loc[0, 'calculated_city_tax'], 30.7)
+        self.assertAlmostEqual(taxes.loc[0, 'calculated_state_svc_fee'], 1.16)
+        self.assertAlmostEqual(taxes.loc[0, 'calculated_state_net_tax'], 50.14)
+
+        # Monument collects its own city tax and charges a city service fee
+        self.assertAlmostEqual(sales.loc[1, 'total_sales'], 500.0)
+        self.assertAlmostEqual(taxes.loc[1, 'calculated_city_svc_fee'], 17.5 * 0.033)
+        self.assertAlmostEqual(sales.loc[1, 'calculated_city_tax'], 17.5)
+
+        # Totals row
+        self.assertEqual(len(sales), 3)
+        self.assertEqual(sales.loc[2, 'jurisdiction_code'], '')
+        self.assertAlmostEqual(sales.loc[2, 'total_tax_collected'], 120.15)
+        self.assertAlmostEqual(taxes.loc[2, 'calculated_total_tax'], 120.15)
+
+    def test_shared_code_is_resolved_by_city_name(self):
+        frame = self.calculator.calculate_tax_frame([
+            {'jurisdiction_code': '040206', 'city_name': 'PEYTON', 'standard_tax': 51.3},
+            {'jurisdiction_code': '040206', 'city_name': 'NOWHERE', 'standard_tax': 51.3},
+            {'jurisdiction_code': '040031', 'city_name': 'ANY NAME', 'standard_tax': 75.3},
+            {'jurisdiction_code': '123456', 'city_name': 'FALCON', 'standard_tax': 10.0},
+        ])
+        # The unknown code is skipped; unmatched 040206 cities use the default rates
+        self.assertEqual(list(frame['jurisdiction_name']), ['UNINCORPORATED', 'UNINCORPORATED', 'FOUNTAIN'])
+        self.assertEqual(list(frame['total_sales'].round(6)), [1000.0, 1000.0, 1000.0])
+
+    def test_many_periods_in_one_call(self):
+        months = pd.period_range('2025-01', periods=12, freq='M').astype(str)
+        tax_data = pd.DataFrame({
+            'period': list(months) * 2,
+            'jurisdiction_code': ['040017'] * 12 + ['040052'] * 12,
+            'city_name': ['COLORADO SPRINGS'] * 12 + ['MANITOU SPRINGS'] * 12,
+            'standard_tax': [82.0] * 12 + [90.3] * 12,
+            'cigarette_tax': [-1.0] * 24,
+        })
+        frame = self.calculator.calculate_tax_frame(tax_data)
+        self.assertEqual(len(frame), 24)
+        # Negative collections do not produce sales
+        self.assertEqual(frame['cigarette_sales'].abs().sum(), 0.0)
+        by_period = frame.groupby('period')['total_sales'].sum()
+        self.assertEqual(len(by_period), 12)
+        self.assertAlmostEqual(by_period['2025-06'], 2000.0)
+
+    def test_no_rows(self):
+        results = self.calculator.calculate_sales_from_tax([])
+        self.assertEqual(len(results['sales_calculations']), 1)
+        self.assertEqual(results['tax_calculations'].loc[0, 'calculated_total_net_tax'], 0)
+
+
+class TestBatchReports(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmpdir.name)
+        os.makedirs("reports")
+        self.filings = [
+            {'period': '2025-01', 'location': 'Main St', 'tax_data': [
+                {'jurisdiction_code': '040017', 'city_name': 'COLORADO SPRINGS', 'standard_tax': 82.0}]},
+            {'period': '2025-02', 'location': 'Main St', 'tax_data': [
+                {'jurisdiction_code': '040206', 'city_name': 'PEYTON', 'standard_tax': 25.65},
+                {'jurisdiction_code': '040031', 'city_name': 'FOUNTAIN', 'soda_tax': 7.53}]},
+            {'period': '2025-02', 'location': 'Main St', 'tax_data': [
+                {'jurisdiction_code': '999999', 'city_name': 'NOWHERE', 'standard_tax': 1.0}]},
+        ]
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmpdir.cleanup()
+
+    def test_filings_are_written_in_parallel_into_one_zip(self):
+        batch = SalesTaxCalculator().generate_reports(self.filings, "reports", max_workers=2)
+
+        names = [entry['filename'] for entry in batch['files']]
+        self.assertEqual(names, ["sales_tax_2025-01_Main_St.xlsx", "sales_tax_2025-02_Main_St.xlsx",
+                                 "sales_tax_2025-02_Main_St_2.xlsx"])
+        self.assertAlmostEqual(batch['files'][1]['total_sales'], 600.0)
+        self.assertEqual(batch['files'][2]['total_sales'], 0.0)
+        self.assertEqual(set(batch['timings']), {'compute_ms', 'write_ms', 'zip_ms', 'total_ms'})
+
+        # Only the zip is left behind
+        self.assertEqual(os.listdir("reports"), [os.path.basename(batch['zip_path'])])
+        with zipfile.ZipFile(batch['zip_path']) as archive:
+            self.assertEqual(archive.namelist(), names)
+            sheet = openpyxl.load_workbook(io.BytesIO(archive.read(names[0]))).active
+            self.assertEqual(sheet['H7'].value, 1000)
+
+    def test_batches_share_one_pool_and_never_share_a_zip(self):
+        calculator = SalesTaxCalculator()
+        first = calculator.generate_reports(self.filings, "reports", max_workers=2)
+        pool = sales_tax_calculator._report_pool
+        second = calculator.generate_reports(self.filings, "reports", max_workers=2)
+        self.assertIs(sales_tax_calculator._report_pool, pool)
+        self.assertNotEqual(first['zip_path'], second['zip_path'])
+        self.assertEqual(len(os.listdir("reports")), 2)
+
+    def test_batch_endpoint(self):
+        client = app_module.app.test_client()
+        response = client.post('/api/generate-sales-tax-reports', json={'filings': self.filings[:2]})
+        data = response.get_json()
+        self.assertTrue(data['success'])
+        self.assertTrue(data['download_url'].endswith('.zip'))
+        self.assertEqual(len(data['files']), 2)
+
+        response = client.post('/api/generate-sales-tax-reports', json={'filings': [{'tax_data': [{}]}]})
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
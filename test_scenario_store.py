@@ -0,0 +1,177 @@
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+import migrate_scenario_store
+import app as app_module
+from multi_product_calculator import MultiProductBuyingCalculator
+from scenario_manager import ScenarioManager
+from scenario_store import ScenarioStore, directory_records
+
+
+class TestScenarioStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, 'scenarios.db')
+        self.store = ScenarioStore(self.db_path, kind='multi_product')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_bulk_import_and_search(self):
+        count = self.store.import_many([
+            {'name': 'Premium Whiskey', 'data': {'products': [1]}, 'tags': ['Whiskey', ' premium '],
+             'updated_at': '2025-01-02T00:00:00'},
+            {'name': 'Premium Vodka', 'data': {'products': [2]}, 'tags': ['vodka', 'premium'],
+             'updated_at': '2025-03-01T00:00:00'},
+            {'name': 'Wine Bundle', 'data': {'products': [3]}, 'updated_at': '2025-02-01T00:00:00'},
+        ])
+        self.assertEqual(count, 3)
+
+        self.assertEqual([s['name'] for s in self.store.search()], ['Premium Vodka', 'Wine Bundle', 'Premium Whiskey'])
+        self.assertEqual([s['name'] for s in self.store.search(prefix='PREM', order='name')],
+                         ['Premium Vodka', 'Premium Whiskey'])
+        self.assertEqual(self.store.search(tag='Premium', limit=1, offset=1),
+                         [{'name': 'Premium Whiskey', 'updated_at': '2025-01-02T00:00:00',
+                           'tags': ['premium', 'whiskey']}])
+        self.assertEqual(self.store.search(prefix='wine')[0]['tags'], [])
+        with self.assertRaises(ValueError):
+            self.store.search(order='size')
+
+    def test_import_keeps_or_replaces_existing_scenarios(self):
+        self.store.save('Smirnoff', {'v': 1}, tags=['vodka'])
+        self.store.import_many([{'name': 'smirnoff', 'data': {'v': 2}}], replace=False)
+        self.assertEqual(self.store.get('Smirnoff'), {'v': 1})
+
+        self.store.import_many([{'name': 'smirnoff', 'data': {'v': 2}}])
+        self.assertEqual(self.store.get('SMIRNOFF'), {'v': 2})
+        self.assertEqual(self.store.names(), ['smirnoff'])
+        # No tags given: the existing ones are kept
+        self.assertEqual(self.store.search()[0]['tags'], ['vodka'])
+
+        self.store.save('Smirnoff', {'v': 3}, tags=[])
+        self.assertEqual(self.store.search(tag='vodka'), [])
+
+    def test_names_are_stored_trimmed(self):
+        self.store.import_many([{'name': '  Premium Whiskey ', 'data': {}}])
+        self.store.save(' Wine Bundle', {})
+        self.assertEqual(self.store.names(), ['Premium Whiskey', 'Wine Bundle'])
+        self.assertEqual(self.store.search(prefix='premium')[0]['name'], 'Premium Whiskey')
+
+    def test_kinds_share_one_database(self):
+        deal_split = ScenarioStore(self.db_path, kind='deal_split')
+        deal_split.save('Cuervo', [{'variety': 'Cuervo 50 mL', 'annual_sales': 400}], tags=['tequila'])
+        self.store.save('Cuervo', {'products': []})
+
+        self.assertTrue(deal_split.delete('cuervo'))
+        self.assertEqual(self.store.names(), ['Cuervo'])
+        with sqlite3.connect(self.db_path) as conn:
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], 'wal')
+            # Deleting a scenario removes its tags
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM scenario_tags").fetchone()[0], 0)
+
+    def test_legacy_files_seed_an_empty_kind(self):
+        legacy_dir = os.path.join(self.tmpdir.name, 'legacy')
+        os.makedirs(legacy_dir)
+        with open(os.path.join(legacy_dir, 'Old Portfolio.json'), 'w') as f:
+            json.dump({'name': 'Old Portfolio', 'tags': ['gin'], 'products': []}, f)
+        with open(os.path.join(legacy_dir, 'broken.json'), 'w') as f:
+            f.write('{')
+
+        store = ScenarioStore(self.db_path, kind='multi_product', legacy=lambda: directory_records(legacy_dir))
+        self.assertEqual(store.search(tag='gin')[0]['name'], 'Old Portfolio')
+        store.delete('Old Portfolio')
+        reopened = ScenarioStore(self.db_path, kind='multi_product', legacy=lambda: directory_records(legacy_dir))
+        self.assertEqual(reopened.names(), [])
+
+
+class TestScenarioManagerStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.scenario = {
+            "params": {"small_deal_minimum": 30, "bulk_deal_minimum": 60, "payment_terms": 30},
+            "products": [{"product_name": "Test Product", "current_price": 25.0, "bulk_price": 20.0,
+                          "on_hand": 10, "annual_cases": 100, "bottles_per_case": 12}],
+        }
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_portfolios_are_saved_and_searched_in_the_database(self):
+        manager = ScenarioManager(scenarios_dir=self.tmpdir.name)
+        self.assertTrue(manager.save_scenario("Summer Order", self.scenario, tags=["summer"]))
+        self.assertEqual(os.listdir(self.tmpdir.name), ["scenarios.db"])
+        self.assertEqual(manager.load_scenario("summer order")["products"][0]["annual_cases"], 100)
+        self.assertEqual([s['name'] for s in manager.search_scenarios(tag="SUMMER")], ["Summer Order"])
+        self.assertTrue(manager.delete_scenario("Summer Order"))
+        self.assertEqual(manager.list_scenarios(), [])
+
+
+class TestMigration(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmpdir.name)
+        os.makedirs("scenarios/multi_product")
+        with open("scenarios.json", "w") as f:
+            json.dump({"Cuervo": [{"variety": "Cuervo 50 mL", "annual_sales": 400}]}, f)
+        with open("scenarios/tequila_example.json", "w") as f:
+            json.dump({"params": {}, "products": []}, f)
+        with open("scenarios/multi_product/Premium Spirits.json", "w") as f:
+            json.dump({"name": "Premium Spirits", "products": [{"name": "Scotch", "priceSmall": 49.99}]}, f)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmpdir.cleanup()
+
+    def test_deal_splits_come_from_the_first_database(self):
+        ScenarioStore("scenarios.db", kind="deal_split").save("Saved Later", [{"variety": "Rose", "annual_sales": 73}])
+        db_path = migrate_scenario_store.DB_PATH
+        ScenarioStore(db_path, kind="deal_split").save("saved later", [])
+
+        migrate_scenario_store.main()
+        # Rows already in the new database are newer, so they are kept
+        self.assertEqual(ScenarioStore(db_path, kind="deal_split").all(), {"saved later": []})
+
+        migrate_scenario_store.main("fresh.db")
+        self.assertEqual(ScenarioStore("fresh.db", kind="deal_split").names(), ["Saved Later"])
+
+    def test_first_open_seeds_the_same_payloads_as_the_migration(self):
+        store = MultiProductBuyingCalculator().scenario_store
+        self.assertEqual(store.get('premium spirits')['products'][0], {"product_name": "Scotch", "current_price": 49.99})
+
+    def test_all_legacy_files_are_migrated(self):
+        self.assertEqual(migrate_scenario_store.main(), {'deal_split': 1, 'portfolio': 1, 'multi_product': 1})
+
+        db_path = migrate_scenario_store.DB_PATH
+        self.assertEqual(ScenarioStore(db_path, kind='deal_split').names(), ['Cuervo'])
+        self.assertEqual(ScenarioStore(db_path, kind='portfolio').names(), ['tequila_example'])
+        multi_product = ScenarioStore(db_path, kind='multi_product')
+        self.assertEqual(multi_product.get('premium spirits')['products'][0],
+                         {"product_name": "Scotch", "current_price": 49.99})
+
+        # Running it again after the app has been used neither reverts edits nor revives deletions
+        multi_product.save('Premium Spirits', {'products': []}, tags=['edited'])
+        ScenarioStore(db_path, kind='portfolio').delete('tequila_example')
+        self.assertEqual(migrate_scenario_store.main(), {'deal_split': 0, 'portfolio': 0, 'multi_product': 0})
+        self.assertEqual(multi_product.get('premium spirits'), {'products': []})
+        self.assertEqual(multi_product.search()[0]['tags'], ['edited'])
+        self.assertEqual(ScenarioStore(db_path, kind='portfolio').names(), [])
+
+        self.assertEqual(migrate_scenario_store.main(force=True)['portfolio'], 1)
+        self.assertEqual(multi_product.get('premium spirits'), {'products': []})
+
+
+class TestSearchEndpoint(unittest.TestCase):
+    def test_search_validates_its_arguments(self):
+        client = app_module.app.test_client()
+        data = client.get('/api/search-scenarios?kind=deal_split&q=zz-no-such-scenario&order=name').get_json()
+        self.assertEqual(data, {'success': True, 'scenarios': []})
+        self.assertEqual(client.get('/api/search-scenarios?kind=margin').status_code, 400)
+        self.assertEqual(client.get('/api/search-scenarios?order=size').status_code, 400)
+        self.assertEqual(client.get('/api/search-scenarios?limit=0').status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from sales_tax_calculator import SalesTaxCalculator
+from tax_rates import TaxRateTable
+
+HEADER = ("code,city_name,name,county,city_tax,county_tax,rta_tax,state_tax,total_tax,"
+          "state_service_fee,city_service_fee,city_collection,effective_from,effective_to\n")
+FOUNTAIN_2024 = "040031,FOUNTAIN,FOUNTAIN,EL PASO,0.0300,0.0123,0.0000,0.0290,0.0713,0.0400,0.0000,State Collected,,2025-01-01\n"
+FOUNTAIN_2025 = "040031,FOUNTAIN,FOUNTAIN,EL PASO,0.0340,0.0123,0.0000,0.0290,0.0753,0.0400,0.0000,State Collected,2025-01-01,\n"
+FALCON = "040206,FALCON,UNINCORPORATED,EL PASO,0.0000,0.0123,0.0100,0.0290,0.0513,0.0400,0.0000,State Collected,,\n"
+PEYTON = "040206,PEYTON,UNINCORPORATED,EL PASO,0.0000,0.0123,0.0100,0.0290,0.0513,0.0400,0.0000,State Collected,,\n"
+
+
+class TestTaxRateTable(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "rates.csv")
+        self.write(FALCON + PEYTON + FOUNTAIN_2024 + FOUNTAIN_2025)
+        self.table = TaxRateTable(self.path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, rows, mtime=None):
+        with open(self.path, "w") as f:
+            f.write(HEADER + rows)
+        if mtime is not None:
+            os.utime(self.path, (mtime, mtime))
+
+    def test_rates_are_versioned_by_effective_date(self):
+        self.assertEqual(self.table.lookup("040031", "FOUNTAIN", "2024-12-31")['city_tax'], 0.03)
+        self.assertEqual(self.table.lookup("040031", "FOUNTAIN", "2025-01-01")['city_tax'], 0.034)
+        self.assertEqual(len(self.table.effective("2024-06-30")), 3)
+
+    def test_city_picks_the_sub_area_and_unknown_cities_use_the_first(self):
+        rates, positions = self.table.resolve(["040206", "040206", "040031", "999999"],
+                                              ["PEYTON", "NOWHERE", "ANY", "FALCON"], "2025-03-31")
+        self.assertEqual(list(rates['city_name'].to_numpy()[positions[:3]]), ["PEYTON", "FALCON", "FOUNTAIN"])
+        self.assertEqual(positions[3], -1)
+
+    def test_reloaded_only_when_the_file_changes(self):
+        self.table.lookup("040206", "FALCON")
+        loaded = self.table._loaded
+        self.table.lookup("040206", "FALCON")
+        self.assertIs(self.table._loaded, loaded)
+
+        self.write(FALCON.replace("0.0123", "0.0150"), mtime=os.path.getmtime(self.path) + 10)
+        self.assertEqual(self.table.lookup("040206", "FALCON")['county_tax'], 0.015)
+        self.assertIsNone(self.table.lookup("040031", "FOUNTAIN"))
+
+    def test_overlapping_versions_are_rejected(self):
+        self.write(FOUNTAIN_2025 + FOUNTAIN_2025)
+        with self.assertRaises(ValueError):
+            self.table.lookup("040031", "FOUNTAIN")
+
+    def test_historical_periods_use_their_own_rates(self):
+        calculator = SalesTaxCalculator(self.path)
+        frame = calculator.calculate_tax_frame([
+            {'jurisdiction_code': '040031', 'city_name': 'FOUNTAIN', 'standard_tax': 71.3, 'as_of': '2024-12-31'},
+            {'jurisdiction_code': '040031', 'city_name': 'FOUNTAIN', 'standard_tax': 75.3, 'as_of': '2025-01-31'},
+        ])
+        np.testing.assert_allclose(frame['total_sales'], [1000.0, 1000.0])
+        np.testing.assert_allclose(frame['calculated_city_tax'], [30.0, 34.0])
+
+
+if __name__ == '__main__':
+    unittest.main()